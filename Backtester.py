@@ -0,0 +1,250 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from TradeAdvisor import TradeAdvisor
+
+BUY = 1
+SELL = -1
+
+# Words in signal 'type' strings that mark a buy or sell
+_BUY_WORDS = ('BUY', 'bullish', 'Oversold')
+_SELL_WORDS = ('SELL', 'bearish', 'Overbought')
+
+
+@dataclass
+class BacktestResult:
+    """Output of a single backtest run"""
+    equity: pd.Series
+    returns: pd.Series
+    trades: pd.DataFrame
+    stats: Dict[str, float] = field(default_factory=dict)
+
+
+def signals_from_events(index: pd.Index, events: Iterable[Dict]) -> pd.Series:
+    """Turns a list of {'date', 'type'} signal dicts into a +1/-1/0 series.
+
+    Accepts the output of MarketAnalyzer.get_trading_signals and the
+    'ma_signals' list from PatternDetector.get_all_signals. When a bar has
+    both a buy and a sell event the later one in the list wins. Events dated
+    outside index are skipped rather than added as new bars.
+    """
+    events = list(events)
+    values = np.zeros(len(index), dtype=np.int8)
+    positions = index.get_indexer([event['date'] for event in events]) if events else []
+    for event, position in zip(events, positions):
+        if position < 0:
+            continue
+        kind = event['type']
+        if any(word in kind for word in _BUY_WORDS):
+            values[position] = BUY
+        elif any(word in kind for word in _SELL_WORDS):
+            values[position] = SELL
+    return pd.Series(values, index=index)
+
+
+def signals_from_recommendations(recommendations: pd.Series) -> pd.Series:
+    """Maps StockScreener._get_recommendation labels to +1/-1/0"""
+    mapping = {'STRONG BUY': BUY, 'BUY': BUY, 'STRONG SELL': SELL, 'SELL': SELL}
+    return recommendations.map(mapping).fillna(0).astype(np.int8)
+
+
+def advisor_exit_rules(var_95: float) -> Tuple[float, float]:
+    """Stop-loss and target as fractions of entry price, as TradeAdvisor sets them"""
+    stop_loss, target_price = TradeAdvisor.calculate_exit_levels(1.0, var_95)
+    return stop_loss - 1.0, target_price - 1.0
+
+
+class Backtester:
+    """Long-only backtester working on whole price and signal arrays.
+
+    A buy signal opens a position at that bar's close when flat. The position
+    closes at the first later bar where the low reaches the stop, the high
+    reaches the target, or a sell signal appears; if the stop and target are
+    both touched in one bar the stop is assumed to have hit first.
+    """
+
+    def __init__(self, initial_capital: float = 10000, commission: float = 0.0,
+                 position_size: float = 1.0, periods_per_year: int = 252):
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.position_size = position_size
+        self.periods_per_year = periods_per_year
+
+    def run(self, data: pd.DataFrame, signals: pd.Series,
+            stop_loss_pct: Optional[float] = None,
+            target_pct: Optional[float] = None) -> BacktestResult:
+        """Backtests one symbol. stop_loss_pct is negative (e.g. var_95), target_pct positive."""
+        close = data['Close'].to_numpy(dtype=float)
+        high = data['High'].to_numpy(dtype=float) if 'High' in data else close
+        low = data['Low'].to_numpy(dtype=float) if 'Low' in data else close
+        sig = signals.reindex(data.index).fillna(0).to_numpy()
+
+        entries, exits, exit_prices, reasons = _simulate_trades(
+            close, high, low, sig, stop_loss_pct, target_pct)
+
+        bar_returns = self._bar_returns(close, entries, exits, exit_prices)
+        equity = self.initial_capital * np.cumprod(1 + bar_returns)
+
+        index = data.index
+        trade_returns = exit_prices / close[entries] - 1 if len(entries) else np.array([])
+        trades = pd.DataFrame({
+            'entry_date': index[entries],
+            'exit_date': index[exits],
+            'entry_price': close[entries],
+            'exit_price': exit_prices,
+            'return': trade_returns,
+            'bars_held': exits - entries,
+            'exit_reason': reasons
+        })
+
+        returns = pd.Series(bar_returns, index=index)
+        equity = pd.Series(equity, index=index)
+        return BacktestResult(equity=equity, returns=returns, trades=trades,
+                              stats=self._stats(equity, returns, trades))
+
+    def run_batch(self, jobs: List[Dict], max_workers: Optional[int] = None) -> Dict[str, BacktestResult]:
+        """Runs many backtests, spread across a process pool.
+
+        Each job is a dict with 'name', 'data', 'signals' and optionally
+        'stop_loss_pct' and 'target_pct', so one call can cover many symbols
+        or many strategy variants of the same symbol.
+        """
+        tasks = [(self, job) for job in jobs]
+        if max_workers == 1 or len(jobs) <= 1:
+            results = [_run_job(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(_run_job, tasks, chunksize=max(1, len(jobs) // 32)))
+
+        return {job['name']: result for job, result in zip(jobs, results)}
+
+    def _bar_returns(self, close: np.ndarray, entries: np.ndarray,
+                     exits: np.ndarray, exit_prices: np.ndarray) -> np.ndarray:
+        """Per-bar strategy returns built from trade intervals without a bar loop"""
+        n = len(close)
+        price_returns = np.zeros(n)
+        price_returns[1:] = close[1:] / close[:-1] - 1
+
+        # Held through bar t when entry < t <= exit
+        marks = np.zeros(n + 1)
+        np.add.at(marks, entries + 1, 1)
+        np.add.at(marks, exits + 1, -1)
+        held = np.cumsum(marks[:n]) > 0
+
+        returns = np.where(held, price_returns, 0.0)
+        returns[exits] = np.where(exits > entries, exit_prices / close[exits - 1] - 1, 0.0)
+        returns *= self.position_size
+
+        if self.commission:
+            costs = np.zeros(n)
+            np.add.at(costs, entries, self.commission * self.position_size)
+            np.add.at(costs, exits, self.commission * self.position_size)
+            returns = (1 + returns) * (1 - costs) - 1
+
+        return returns
+
+    def _stats(self, equity: pd.Series, returns: pd.Series, trades: pd.DataFrame) -> Dict[str, float]:
+        values = equity.to_numpy()
+        total_return = values[-1] / self.initial_capital - 1 if len(values) else 0.0
+        years = len(values) / self.periods_per_year
+        cagr = (1 + total_return) ** (1 / years) - 1 if years > 0 and total_return > -1 else np.nan
+
+        std = returns.std()
+        sharpe = returns.mean() / std * np.sqrt(self.periods_per_year) if std > 0 else np.nan
+
+        running_max = np.maximum.accumulate(values) if len(values) else values
+        max_drawdown = (values / running_max - 1).min() if len(values) else 0.0
+
+        trade_returns = trades['return'].to_numpy()
+        gains = trade_returns[trade_returns > 0].sum()
+        losses = -trade_returns[trade_returns < 0].sum()
+
+        return {
+            'total_return': total_return,
+            'cagr': cagr,
+            'sharpe': sharpe,
+            'max_drawdown': max_drawdown,
+            'trades': len(trades),
+            'win_rate': (trade_returns > 0).mean() if len(trades) else np.nan,
+            'avg_trade_return': trade_returns.mean() if len(trades) else np.nan,
+            'profit_factor': gains / losses if losses > 0 else np.nan,
+            'exposure': (trades['bars_held'].sum() / len(values)) if len(values) else 0.0
+        }
+
+
+def _run_job(task):
+    backtester, job = task
+    return backtester.run(job['data'], job['signals'],
+                          stop_loss_pct=job.get('stop_loss_pct'),
+                          target_pct=job.get('target_pct'))
+
+
+def _first_hit(mask_fn, start: int, end: int) -> int:
+    """Index of the first True in mask_fn(lo, hi) over [start, end), or end.
+
+    Searches in doubling blocks so short trades only look at a few bars.
+    """
+    block = 64
+    lo = start
+    while lo < end:
+        hi = min(end, lo + block)
+        hits = mask_fn(lo, hi)
+        if hits.any():
+            return lo + int(np.argmax(hits))
+        lo = hi
+        block *= 2
+    return end
+
+
+def _simulate_trades(close, high, low, sig, stop_loss_pct, target_pct):
+    """Walks entry to exit one trade at a time; each step is an array search"""
+    n = len(close)
+    buy_positions = np.flatnonzero(sig > 0)
+
+    # next_sell[t] = first bar >= t with a sell signal (n if none)
+    sell_at = np.where(sig < 0, np.arange(n), n)
+    next_sell = np.minimum.accumulate(sell_at[::-1])[::-1]
+
+    entries, exits, exit_prices, reasons = [], [], [], []
+    cursor = 0
+    while True:
+        k = np.searchsorted(buy_positions, cursor)
+        if k >= len(buy_positions):
+            break
+        entry = int(buy_positions[k])
+        price = close[entry]
+        first = entry + 1
+
+        sell_bar = int(next_sell[first]) if first < n else n
+        stop_bar = target_bar = n
+        stop = target = None
+        if stop_loss_pct is not None:
+            stop = price * (1 + stop_loss_pct)
+            stop_bar = _first_hit(lambda lo, hi: low[lo:hi] <= stop, first, min(n, sell_bar + 1))
+        if target_pct is not None:
+            target = price * (1 + target_pct)
+            target_bar = _first_hit(lambda lo, hi: high[lo:hi] >= target, first,
+                                    min(n, sell_bar + 1, stop_bar + 1))
+
+        exit_bar = min(stop_bar, target_bar, sell_bar)
+        if exit_bar >= n:
+            exit_bar, exit_price, reason = n - 1, close[n - 1], 'end'
+        elif exit_bar == stop_bar:
+            exit_price, reason = stop, 'stop_loss'
+        elif exit_bar == target_bar:
+            exit_price, reason = target, 'target'
+        else:
+            exit_price, reason = close[exit_bar], 'signal'
+
+        entries.append(entry)
+        exits.append(exit_bar)
+        exit_prices.append(exit_price)
+        reasons.append(reason)
+        cursor = exit_bar + 1
+
+    return (np.array(entries, dtype=np.int64), np.array(exits, dtype=np.int64),
+            np.array(exit_prices, dtype=float), reasons)
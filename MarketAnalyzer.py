@@ -1,65 +1,132 @@
 from PatternDetector import PatternDetector
 from analysis_components import VolumeAnalyzer, TechnicalAnalyzer, RiskAnalyzer
 from TradeAdvisor import TradeAdvisor
-import yfinance as yf
+from indicator_cache import rolling_mean
+from data_providers import YFinanceProvider
+from profiling import profiler as default_profiler, frame_bytes
+from compact_frames import LazyResults, downcast_ohlcv, to_float32
+from chunked_analysis import ChunkedAnalysis
+from Visualizer import Visualizer
 import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime
 import time
 
 class MarketAnalyzer:
-    def __init__(self, symbol, start_date, end_date, interval):
+    def __init__(self, symbol, start_date, end_date, interval, cache=None, provider=None,
+                 profiler=None, compact=False, rolling_risk_window=None):
         self.symbol = symbol
         self.start_date = start_date
         self.end_date = end_date
         self.interval = interval
         self.data = None
 
+        # Optional BarCache; when set only bars missing from disk are downloaded
+        self.cache = cache
+        # DataProvider the bars come from; Yahoo Finance unless told otherwise
+        self.provider = provider or YFinanceProvider()
+        # Profiler receiving per-stage spans; the shared one is off unless enabled
+        self.profiler = profiler or default_profiler
+
+        # Compact mode stores bars as float32/uint32, keeps derived series in
+        # self.derived instead of adding columns to self.data, and computes
+        # indicator results only when they are first read
+        self.compact = compact
+        self.derived = {}
+
         # Initialize analysis components
-        self.volume_analyzer = VolumeAnalyzer()
-        self.technical_analyzer = TechnicalAnalyzer()
-        self.risk_analyzer = RiskAnalyzer()
+        self.volume_analyzer = VolumeAnalyzer(compact=compact)
+        self.technical_analyzer = TechnicalAnalyzer(compact=compact)
+        # rolling_risk_window adds per-bar risk metrics, so advice reflects the current regime
+        self.risk_analyzer = RiskAnalyzer(rolling_window=rolling_risk_window)
 
         # Analysis results storage
         self.analysis_results = {}
+        # ChunkedResult from analyze_chunked, which get_trading_signals reads from
+        self.chunked_result = None
+        # Visualizer kept across plot_data calls so its downsampling caches get reused
+        self.visualizer = None
 
     def get_data(self, max_retries=3):
         """Fetches data with retry mechanism and proper error handling"""
-        for attempt in range(max_retries):
-            try:
-                ticker = yf.Ticker(self.symbol)
-                self.data = ticker.history(
-                    start=self.start_date,
-                    end=self.end_date,
-                    interval=self.interval
-                )
-
-                if self.data.empty:
-                    raise ValueError(f"No data retrieved for {self.symbol}")
-
-                print(f"Successfully downloaded data for {self.symbol} from {self.start_date} to {self.end_date}")
-                return self.data
-
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"Attempt {attempt + 1} failed. Retrying in 2 seconds...")
-                    time.sleep(2)
-                else:
-                    raise Exception(f"Failed to download data for {self.symbol} after {max_retries} attempts: {str(e)}")
+        with self.profiler.span('get_data', self.symbol) as span:
+            for attempt in range(max_retries):
+                try:
+                    if self.cache is not None:
+                        self.data = self.cache.get_history(
+                            self.symbol, self.start_date, self.end_date,
+                            self.interval, self._download
+                        )
+                    else:
+                        self.data = self._download(self.start_date, self.end_date)
+
+                    if self.data.empty:
+                        raise ValueError(f"No data retrieved for {self.symbol}")
+                    if self.compact:
+                        self.data = downcast_ohlcv(self.data)
+
+                    span.annotate(frame=self.data)
+                    print(f"Successfully downloaded data for {self.symbol} from {self.start_date} to {self.end_date}")
+                    return self.data
+
+                except Exception as e:
+                    if attempt < max_retries - 1:
+                        print(f"Attempt {attempt + 1} failed. Retrying in 2 seconds...")
+                        time.sleep(2)
+                    else:
+                        raise Exception(f"Failed to download data for {self.symbol} after {max_retries} attempts: {str(e)}")
+
+    def _download(self, start, end):
+        """Downloads bars for [start, end) from the data provider"""
+        with self.profiler.span('download', self.symbol) as span:
+            data = self.provider.get_history(self.symbol, start, end, self.interval)
+            span.annotate(fetched=data)
+            return data
 
     def analyze_all(self):
         """Runs all analysis components"""
         if self.data is None:
             raise ValueError("No data available. Use get_data() first.")
 
-        # Run moving averages (existing functionality)
-        self.moving_averages()
+        self.chunked_result = None
+        with self.profiler.span('analyze_all', self.symbol) as span:
+            # Run moving averages (existing functionality)
+            with self.profiler.span('moving_averages'):
+                self.moving_averages()
 
-        # Run new analysis components
-        self.analysis_results['volume'] = self.volume_analyzer.analyze(self.data)
-        self.analysis_results['technical'] = self.technical_analyzer.analyze(self.data)
-        self.analysis_results['risk'] = self.risk_analyzer.analyze(self.data)
+            # Run new analysis components
+            for key, component in (('volume', self.volume_analyzer),
+                                   ('technical', self.technical_analyzer),
+                                   ('risk', self.risk_analyzer)):
+                with self.profiler.span(f"analyze.{type(component).__name__}"):
+                    self.analysis_results[key] = component.analyze(self.data)
 
+            span.annotate(frame=self.data)
+        return self.analysis_results
+
+    def analyze_chunked(self, chunk_size=100_000, collect=True, compact_divergence=False):
+        """Runs all analysis components over the history in fixed-size blocks.
+
+        For histories too long to hold in memory (e.g. years of 1-minute
+        bars). Bars are streamed from the provider twice and never loaded
+        whole; afterwards self.data holds only the last block, with its
+        derived columns. See ChunkedAnalysis for what collect controls.
+        """
+        def source():
+            return self.provider.iter_history(self.symbol, self.start_date, self.end_date,
+                                              self.interval)
+
+        with self.profiler.span('analyze_chunked', self.symbol) as span:
+            result = ChunkedAnalysis(chunk_size=chunk_size, collect=collect,
+                                     compact_divergence=compact_divergence).run(source)
+            span.annotate(frame=result.last_block)
+
+        self.data = result.last_block
+        if result.derived is not None:
+            self.derived = dict(result.derived.items())
+        self.analysis_results = result.analysis_results
+        self.chunked_result = result
+        print(f"Analyzed {result.bars} bars for {self.symbol} in {result.chunks} chunks")
         return self.analysis_results
 
     def moving_averages(self):
@@ -70,47 +137,90 @@ class MarketAnalyzer:
         if len(self.data) < 50:
             raise ValueError('Not enough data points for 50-day moving average')
 
-        self.data['20_avg'] = self.data['Close'].rolling(window=20).mean()
-        self.data['50_avg'] = self.data['Close'].rolling(window=50).mean()
+        if self.compact:
+            self.derived['20_avg'] = to_float32(rolling_mean(self.data['Close'], 20))
+            self.derived['50_avg'] = to_float32(rolling_mean(self.data['Close'], 50))
+        else:
+            self.data['20_avg'] = rolling_mean(self.data['Close'], 20)
+            self.data['50_avg'] = rolling_mean(self.data['Close'], 50)
 
         print('Successfully calculated 20-day and 50-day moving averages.')
         return self.data
 
+    def get_series(self, name):
+        """A column of self.data or a derived series kept beside it in compact mode"""
+        if name in self.derived:
+            return self.derived[name]
+        if name in self.data.columns:
+            return self.data[name]
+        volume = self.analysis_results.get('volume', {})
+        if name in volume:
+            return volume[name]
+        raise KeyError(name)
+
+    def memory_usage(self):
+        """Bytes held by the bars, derived series and computed indicator results.
+
+        Derived series share the bars' index, so it is only counted once.
+        """
+        def held(value):
+            if isinstance(value, pd.Series):
+                return int(value.memory_usage(index=False))
+            if isinstance(value, pd.DataFrame):
+                return int(value.memory_usage(index=False).sum())
+            if isinstance(value, LazyResults):
+                value = value.materialized()
+            if isinstance(value, dict):
+                return sum(held(item) for item in value.values())
+            return 0
+
+        usage = {
+            'data': frame_bytes(self.data),
+            'derived': held(self.derived),
+            'results': held(self.analysis_results)
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
     def get_trading_signals(self):
         """Generates trading signals based on all analysis components"""
         if not self.analysis_results:
             self.analyze_all()
-
-        signals = []
-
-        # Volume-based signals
-        for divergence in self.analysis_results['volume']['volume_price_divergence']:
-            signals.append({
-                'date': divergence['date'],
-                'type': f"Volume-Price {divergence['type']} divergence",
-                'price': divergence['price']
-            })
-
-        # Technical signals (example with RSI)
-        rsi = self.analysis_results['technical']['rsi']
-        overbought = rsi[rsi > 70].index
-        oversold = rsi[rsi < 30].index
-
-        for date in overbought:
-            signals.append({
-                'date': date,
-                'type': 'RSI Overbought',
-                'price': self.data.loc[date, 'Close']
-            })
-
-        for date in oversold:
-            signals.append({
-                'date': date,
-                'type': 'RSI Oversold',
-                'price': self.data.loc[date, 'Close']
-            })
-
-        return signals
+        with self.profiler.span('get_trading_signals', self.symbol):
+            if self.chunked_result is not None:
+                # Signal dates can lie outside the last block kept in self.data
+                return self.chunked_result.trading_signals()
+
+            signals = []
+
+            # Volume-based signals
+            for divergence in self.analysis_results['volume']['volume_price_divergence']:
+                signals.append({
+                    'date': divergence['date'],
+                    'type': f"Volume-Price {divergence['type']} divergence",
+                    'price': divergence['price']
+                })
+
+            # Technical signals (example with RSI)
+            rsi = self.analysis_results['technical']['rsi']
+            overbought = rsi[rsi > 70].index
+            oversold = rsi[rsi < 30].index
+
+            for date in overbought:
+                signals.append({
+                    'date': date,
+                    'type': 'RSI Overbought',
+                    'price': self.data.loc[date, 'Close']
+                })
+
+            for date in oversold:
+                signals.append({
+                    'date': date,
+                    'type': 'RSI Oversold',
+                    'price': self.data.loc[date, 'Close']
+                })
+
+            return signals
 
     def get_trade_advice(self, portfolio_value: float = 10000, risk_tolerance: str = 'moderate'):
         """Get trading advice for amateur investors"""
@@ -149,31 +259,34 @@ class MarketAnalyzer:
 
         return advice
 
-    def plot_data(self, comparison_data=None, comparison_symbol=None, show_volume=True):
-        """Enhanced plotting with volume and additional indicators"""
+    def plot_data(self, comparison_data=None, comparison_symbol=None, show_volume=True,
+                  output_path=None, start=None, end=None):
+        """Enhanced plotting with volume and additional indicators.
+
+        Series are downsampled to the figure's pixel width, so long intraday
+        histories draw quickly. With output_path the chart is rendered
+        headless to that file (PNG, SVG, ...) instead of shown.
+        """
         if self.data is None or self.data.empty:
             raise ValueError('No data available for plotting')
 
-        # Create figure with subplots
-        fig = plt.figure(figsize=(15, 10))
+        overlays = {}
+        if '20_avg' in self.data.columns or '20_avg' in self.derived:
+            overlays['20-day MA'] = self.get_series('20_avg')
+        if '50_avg' in self.data.columns or '50_avg' in self.derived:
+            overlays['50-day MA'] = self.get_series('50_avg')
+
+        if self.visualizer is None:
+            self.visualizer = Visualizer()
+        visualizer = self.visualizer
+        if output_path:
+            visualizer.plot_market(self.data, self.symbol, output_path, overlays,
+                                   show_volume, start, end)
+            print(f'Saved chart to {output_path}')
+            return output_path
 
-        # Price plot
-        ax1 = plt.subplot2grid((3, 1), (0, 0), rowspan=2)
-        ax1.plot(self.data.index, self.data['Close'], label=f'{self.symbol} Price')
-        if '20_avg' in self.data.columns:
-            ax1.plot(self.data.index, self.data['20_avg'],
-                     label='20-day MA', linestyle='--')
-        if '50_avg' in self.data.columns:
-            ax1.plot(self.data.index, self.data['50_avg'],
-                     label='50-day MA', linestyle='--')
-
-        # Volume plot
-        if show_volume:
-            ax2 = plt.subplot2grid((3, 1), (2, 0), sharex=ax1)
-            ax2.bar(self.data.index, self.data['Volume'], alpha=0.5)
-            ax2.set_ylabel('Volume')
-
-        plt.tight_layout()
+        fig = plt.figure(figsize=(15, 10))
+        visualizer.draw_market(fig, self.data, self.symbol, overlays, show_volume, start, end)
         plt.show()
         print('Successfully plotted stock data with indicators.')
 
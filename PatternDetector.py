@@ -1,3 +1,10 @@
+import numpy as np
+import pandas as pd
+from indicator_cache import pct_change
+from signal_engine import (CROSS_UP, SMT_BULLISH, detect_crossovers, scan_ma_pairs,
+                           scan_smt_pairs, smt_divergence_codes)
+
+
 class PatternDetector:
     def __init__(self, data):
         self.data = data
@@ -13,31 +20,79 @@ class PatternDetector:
 
     def ma_crossover(self):
         """Simplified moving average crossover detection"""
+        codes = detect_crossovers(self.data['20_avg'].to_numpy(), self.data['50_avg'].to_numpy())
+        positions = np.flatnonzero(codes)
+
         signals = []
-        prev_row = None
-
-        for index, row in self.data.iterrows():
-            if prev_row is not None:
-                if prev_row['20_avg'] < prev_row['50_avg'] and row['20_avg'] > row['50_avg']:
-                    signals.append({
-                        'date': index,
-                        'type': 'BUY',
-                        'strength': 'Strong',
-                        'reason': 'Bullish MA Crossover'
-                    })
-                elif prev_row['20_avg'] > prev_row['50_avg'] and row['20_avg'] < row['50_avg']:
-                    signals.append({
-                        'date': index,
-                        'type': 'SELL',
-                        'strength': 'Strong',
-                        'reason': 'Bearish MA Crossover'
-                    })
-            prev_row = row
+        for date, code in zip(self.data.index[positions], codes[positions]):
+            if code == CROSS_UP:
+                signals.append({
+                    'date': date,
+                    'type': 'BUY',
+                    'strength': 'Strong',
+                    'reason': 'Bullish MA Crossover'
+                })
+            else:
+                signals.append({
+                    'date': date,
+                    'type': 'SELL',
+                    'strength': 'Strong',
+                    'reason': 'Bearish MA Crossover'
+                })
         return signals
 
+    def scan_ma_pairs(self, pairs):
+        """Crossover codes for many (fast, slow) MA windows over the close series.
+
+        Returns a DataFrame with one column per pair, indexed like self.data.
+        """
+        codes = scan_ma_pairs(self.data['Close'].to_numpy(), pairs)
+        return pd.DataFrame(codes.T, index=self.data.index,
+                            columns=[f"{fast}/{slow}" for fast, slow in pairs])
+
+    def smt_divergence(self, comparison_data, start=None, end=None):
+        """SMT divergences between this asset and a comparison asset.
+
+        The closes are aligned on their common dates and compared day by day,
+        optionally within [start, end]. Bullish: the primary closes higher than
+        the day before while the comparison closes lower. Bearish: the reverse.
+        Returns one dict per divergence day.
+        """
+        closes = pd.concat([self.data['Close'], comparison_data['Close']],
+                           axis=1, join='inner').loc[start:end]
+        values = closes.to_numpy(dtype=float)
+        codes = smt_divergence_codes(values[:, 0], values[:, 1])
+        positions = np.flatnonzero(codes)
+
+        return [{
+            'date': date,
+            'type': 'Bullish Divergence' if code == SMT_BULLISH else 'Bearish Divergence',
+            'price': price,
+            'comparison_price': comparison_price
+        } for date, code, price, comparison_price in zip(
+            closes.index[positions], codes[positions].tolist(),
+            values[positions, 0].tolist(), values[positions, 1].tolist())]
+
+    @staticmethod
+    def scan_smt_divergence(closes, pairs):
+        """SMT divergences for many (primary, comparison) symbol pairs at once.
+
+        closes is a (time x symbol) frame of closing prices, such as
+        build_panel(histories)['Close']; pairs lists (primary, comparison)
+        column names, e.g. signal_engine.smt_pairs(symbols) for every stock
+        against SPY/QQQ/IWM/DIA. Returns a dict of parallel arrays: 'pair'
+        (index into pairs), 'date' and 'type' (SMT_BULLISH/SMT_BEARISH codes).
+        """
+        columns = closes.columns
+        pairs = list(pairs)
+        indexes = np.array([[columns.get_loc(primary), columns.get_loc(comparison)]
+                            for primary, comparison in pairs], dtype=np.intp).reshape(-1, 2)
+        pair, positions, codes = scan_smt_pairs(closes.to_numpy(dtype=float).T, indexes)
+        return {'pair': pair, 'date': closes.index[positions], 'type': codes}
+
     def calculate_momentum(self):
         """Calculate price momentum"""
-        return (self.data['Close'].pct_change(5) * 100).iloc[-1]  # 5-day momentum
+        return (pct_change(self.data['Close'], 5) * 100).iloc[-1]  # 5-day momentum
 
     def calculate_trend_strength(self):
         """Calculate trend strength using moving averages"""
@@ -1,35 +1,88 @@
 import streamlit as st
 import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
 import numpy as np
+from typing import List, Union
+
+Opportunities = Union[pd.DataFrame, List[dict]]
+
+RECOMMENDATION_COLORS = {
+    'STRONG BUY': 'green',
+    'BUY': 'lightgreen',
+    'HOLD': 'gray',
+    'SELL': 'pink',
+    'STRONG SELL': 'red'
+}
+
+
+def screen_frame(opportunities: Opportunities) -> pd.DataFrame:
+    """Columnar view of a screen result.
+
+    A StockScreener.screen_panel DataFrame is used as is; the list of dicts
+    screen_stocks and quick_screen return is converted once.
+    """
+    if isinstance(opportunities, pd.DataFrame):
+        return opportunities
+    return pd.DataFrame(list(opportunities))
+
+
+def _column(df: pd.DataFrame, name: str, dtype=float) -> np.ndarray:
+    return df[name].to_numpy(dtype=dtype)
+
 
 class ScreenerVisualization:
+    """Plotly views of a screen result that stay responsive for thousands of symbols.
+
+    Figures are built from whole columns: the scatter is WebGL (one trace per
+    recommendation, not per point) and the histogram and heatmap are binned
+    with numpy before plotting, so their size depends on the bin count rather
+    than the universe. Per-point arrays are handed to plotly as float32 numpy
+    arrays, which it serializes as compact binary blocks instead of JSON lists.
+    """
+
     @staticmethod
-    def plot_opportunities(opportunities: list):
+    def plot_opportunities(opportunities: Opportunities):
         """Create interactive scatter plot of opportunities"""
-        df = pd.DataFrame(opportunities)
-
-        # Create scatter plot
-        fig = px.scatter(df,
-                         x='market_cap',
-                         y='score',
-                         color='recommendation',
-                         size='avg_volume',
-                         hover_data=['symbol', 'price'],
-                         title='Trading Opportunities Overview',
-                         labels={'market_cap': 'Market Cap ($)',
-                                 'score': 'Opportunity Score',
-                                 'recommendation': 'Recommendation'},
-                         color_discrete_map={
-                             'STRONG BUY': 'green',
-                             'BUY': 'lightgreen',
-                             'HOLD': 'gray',
-                             'SELL': 'pink',
-                             'STRONG SELL': 'red'
-                         })
+        df = screen_frame(opportunities)
+        # Market cap only exists once fundamentals are merged into the result
+        x_name = 'market_cap' if 'market_cap' in df.columns else 'price'
+        x_label = 'Market Cap ($)' if x_name == 'market_cap' else 'Price ($)'
+
+        if 'avg_volume' in df.columns and len(df):
+            # Marker area proportional to average volume, 4-20 px across
+            root = np.sqrt(np.nan_to_num(_column(df, 'avg_volume')))
+            span = root.max() - root.min()
+            sizes = 4 + 16 * (root - root.min()) / span if span > 0 else np.full(len(df), 8.0)
+        else:
+            sizes = np.full(len(df), 8.0)
+        sizes = sizes.astype(np.float32)
+
+        fig = go.Figure()
+        recommendations = df['recommendation'].to_numpy() if len(df) else np.array([])
+        for recommendation, color in RECOMMENDATION_COLORS.items():
+            rows = np.flatnonzero(recommendations == recommendation)
+            if not len(rows):
+                continue
+            part = df.iloc[rows]
+            # With price on the x axis the hover reads it from there
+            price = '%{x:.2f}' if x_name == 'price' else '%{customdata:.2f}'
+            fig.add_trace(go.Scattergl(
+                x=_column(part, x_name, np.float32),
+                y=_column(part, 'score', np.float32),
+                mode='markers',
+                name=recommendation,
+                text=part['symbol'].to_numpy(dtype=str),
+                customdata=None if x_name == 'price' else _column(part, 'price', np.float32),
+                marker=dict(color=color, size=sizes[rows], line=dict(width=0)),
+                hovertemplate=(f'<b>%{{text}}</b><br>Price: ${price}<br>'
+                               f'Score: %{{y:.0f}}<extra>{recommendation}</extra>')
+            ))
 
         fig.update_layout(
+            title='Trading Opportunities Overview',
+            xaxis_title=x_label,
+            yaxis_title='Opportunity Score',
+            legend_title='Recommendation',
             xaxis_type='log',
             height=600,
             width=800
@@ -38,33 +91,56 @@ class ScreenerVisualization:
         return fig
 
     @staticmethod
-    def create_indicator_heatmap(opportunities: list):
-        """Create heatmap of technical indicators"""
-        # Extract indicator data
-        indicator_data = []
-        for opp in opportunities[:20]:  # Top 20 opportunities
-            indicators = {
-                'symbol': opp['symbol'],
-                'RSI': opp['indicators']['rsi'],
-                'MACD': opp['indicators']['macd'],
-                'ADX': opp['indicators']['adx'],
-                'Volume Trend': opp['signals']['volume']['volume_trend']
-            }
-            indicator_data.append(indicators)
-
-        df = pd.DataFrame(indicator_data)
-        df.set_index('symbol', inplace=True)
-
-        # Create heatmap
+    def create_indicator_heatmap(opportunities: Opportunities, x: str = 'rsi',
+                                 y: str = 'momentum', bins: int = 30):
+        """Mean opportunity score over a grid of two indicators.
+
+        Every symbol lands in one (x, y) cell; each cell shows the mean score of
+        its symbols, with the count in the hover, and empty cells stay blank.
+        """
+        df = screen_frame(opportunities)
+        labels = {'rsi': 'RSI', 'momentum': 'Momentum (%)', 'macd': 'MACD',
+                  'atr': 'ATR', 'price': 'Price ($)', 'avg_volume': 'Average Volume'}
+
+        x_values, y_values, scores = (_column(df, name) if len(df) else np.empty(0)
+                                      for name in (x, y, 'score'))
+        valid = ~(np.isnan(x_values) | np.isnan(y_values) | np.isnan(scores))
+        x_values, y_values, scores = x_values[valid], y_values[valid], scores[valid]
+
+        if len(x_values):
+            x_range = (0.0, 100.0) if x == 'rsi' else (x_values.min(), x_values.max())
+            y_range = (0.0, 100.0) if y == 'rsi' else (y_values.min(), y_values.max())
+            # A degenerate range would give zero-width bins
+            x_range = x_range if x_range[1] > x_range[0] else (x_range[0] - 0.5, x_range[0] + 0.5)
+            y_range = y_range if y_range[1] > y_range[0] else (y_range[0] - 0.5, y_range[0] + 0.5)
+            counts, x_edges, y_edges = np.histogram2d(x_values, y_values, bins=bins,
+                                                      range=[x_range, y_range])
+            totals, _, _ = np.histogram2d(x_values, y_values, bins=[x_edges, y_edges],
+                                          weights=scores)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean_score = np.where(counts > 0, totals / counts, np.nan)
+        else:
+            counts = mean_score = np.empty((0, 0))
+            x_edges = y_edges = np.empty(1)
+
         fig = go.Figure(data=go.Heatmap(
-            z=df.values,
-            x=df.columns,
-            y=df.index,
-            colorscale='RdYlGn'
+            # histogram2d puts x on the first axis; Heatmap rows are y
+            z=mean_score.T,
+            x=(x_edges[:-1] + x_edges[1:]) / 2,
+            y=(y_edges[:-1] + y_edges[1:]) / 2,
+            customdata=counts.T,
+            colorscale='RdYlGn',
+            zmin=0,
+            zmax=100,
+            colorbar=dict(title='Mean Score'),
+            hovertemplate=(f"{labels.get(x, x)}: %{{x:.1f}}<br>{labels.get(y, y)}: %{{y:.2f}}<br>"
+                           "Mean score: %{z:.1f}<br>Stocks: %{customdata:.0f}<extra></extra>")
         ))
 
         fig.update_layout(
             title='Technical Indicator Heatmap',
+            xaxis_title=labels.get(x, x),
+            yaxis_title=labels.get(y, y),
             height=500,
             width=800
         )
@@ -72,36 +148,36 @@ class ScreenerVisualization:
         return fig
 
     @staticmethod
-    def display_top_opportunities(opportunities: list, n: int = 10):
+    def display_top_opportunities(opportunities: Opportunities, n: int = 10):
         """Display detailed cards for top opportunities"""
-        for i, opp in enumerate(opportunities[:n]):
+        df = screen_frame(opportunities)
+        for i, opp in enumerate(df.head(n).to_dict('records')):
             with st.expander(f"#{i+1} {opp['symbol']} (Score: {opp['score']:.0f}/100)"):
                 col1, col2 = st.columns(2)
 
                 with col1:
                     st.markdown("### Key Metrics")
-                    st.markdown(f"""
-                    - Price: ${opp['price']:.2f}
-                    - Market Cap: ${opp['market_cap']:,.0f}
-                    - Volume: {opp['avg_volume']:,.0f}
-                    """)
+                    metrics = [f"- Price: ${opp['price']:.2f}"]
+                    if 'market_cap' in opp:
+                        metrics.append(f"- Market Cap: ${opp['market_cap']:,.0f}")
+                    if 'avg_volume' in opp:
+                        metrics.append(f"- Volume: {opp['avg_volume']:,.0f}")
+                    metrics.append(f"- Momentum: {opp['momentum']:.1f}%")
+                    st.markdown("\n".join(metrics))
 
                 with col2:
                     st.markdown("### Technical Indicators")
-                    st.markdown(f"""
-                    - RSI: {opp['indicators']['rsi']:.1f}
-                    - MACD: {opp['indicators']['macd']:.3f}
-                    - ADX: {opp['indicators']['adx']:.1f}
-                    """)
+                    indicators = [f"- RSI: {opp['rsi']:.1f}"]
+                    if 'macd' in opp:
+                        indicators.append(f"- MACD: {opp['macd']:.3f}")
+                    if 'atr' in opp:
+                        indicators.append(f"- ATR: {opp['atr']:.2f}")
+                    trend = 'Rising' if opp['volume_trend'] > 0 else 'Falling'
+                    indicators.append(f"- Volume Trend: {trend}")
+                    st.markdown("\n".join(indicators))
 
                 # Add recommendation with color
-                rec_color = {
-                    'STRONG BUY': 'green',
-                    'BUY': 'lightgreen',
-                    'HOLD': 'gray',
-                    'SELL': 'pink',
-                    'STRONG SELL': 'red'
-                }[opp['recommendation']]
+                rec_color = RECOMMENDATION_COLORS[opp['recommendation']]
 
                 st.markdown(f"### Recommendation: "
                             f"<span style='color: {rec_color}'>"
@@ -109,18 +185,31 @@ class ScreenerVisualization:
                             unsafe_allow_html=True)
 
     @staticmethod
-    def plot_score_distribution(opportunities: list):
-        """Plot distribution of opportunity scores"""
-        scores = [opp['score'] for opp in opportunities]
-        fig = px.histogram(scores,
-                           nbins=20,
-                           title='Distribution of Opportunity Scores',
-                           labels={'value': 'Score', 'count': 'Number of Stocks'})
+    def plot_score_distribution(opportunities: Opportunities, nbins: int = 20):
+        """Plot distribution of opportunity scores, stacked by recommendation"""
+        df = screen_frame(opportunities)
+        edges = np.linspace(0, 100, nbins + 1)
+        centers = (edges[:-1] + edges[1:]) / 2
+
+        fig = go.Figure()
+        recommendations = df['recommendation'].to_numpy() if len(df) else np.array([])
+        scores = _column(df, 'score') if len(df) else np.empty(0)
+        for recommendation, color in RECOMMENDATION_COLORS.items():
+            selected = scores[recommendations == recommendation]
+            if not len(selected):
+                continue
+            counts, _ = np.histogram(selected, bins=edges)
+            fig.add_trace(go.Bar(x=centers, y=counts, width=np.diff(edges),
+                                 name=recommendation, marker_color=color))
 
         fig.update_layout(
-            showlegend=False,
+            title='Distribution of Opportunity Scores',
+            xaxis_title='Score',
+            yaxis_title='Number of Stocks',
+            barmode='stack',
+            bargap=0,
             height=400,
             width=800
         )
 
-        return fig
\ No newline at end of file
+        return fig
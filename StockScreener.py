@@ -1,10 +1,18 @@
-import yfinance as yf
+import heapq
 import pandas as pd
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import ta
+import time
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Union
+from data_providers import DataProvider, YFinanceProvider, period_to_range
+from fundamentals import FundamentalsStore
+from rate_limit import TokenBucket
+from indicator_cache import indicator_cache
+from panel_analysis import build_panel, screen_panel
+from profiling import profiler as default_profiler
+from universe import SnapshotStore, average_volume, ewm_volatility, load_universe
 
 @dataclass
 class ScreenerConfig:
@@ -13,6 +21,7 @@ class ScreenerConfig:
     max_price: float = 1000.0
     min_volume: int = 500000
     min_market_cap: float = 100_000_000  # 100M minimum
+    min_volatility: float = 0.0  # daily return volatility, 0.03 = 3%
     indicator_weights: Dict[str, float] = None
 
     def __post_init__(self):
@@ -25,8 +34,45 @@ class ScreenerConfig:
             }
 
 class StockScreener:
-    def __init__(self):
-        self.all_stocks = self._get_tradable_stocks()
+    def __init__(self, cache=None,
+                 data_source: Optional[Callable[[str], pd.DataFrame]] = None,
+                 max_workers: int = 8,
+                 rate_limit: Optional[float] = None,
+                 symbol_timeout: float = 30.0,
+                 provider: Optional[DataProvider] = None,
+                 profiler=None,
+                 universe: Optional[Union[str, List[str]]] = None,
+                 snapshots: Optional[SnapshotStore] = None,
+                 fundamentals: Optional[FundamentalsStore] = None):
+        # Universe file (see load_universe), list of symbols, or the default list
+        if isinstance(universe, str):
+            self.universe = load_universe(universe)
+        else:
+            self.universe = pd.DataFrame(index=pd.Index(universe or self._get_tradable_stocks(),
+                                                        name='symbol'))
+        self.all_stocks = list(self.universe.index)
+        # Optional SnapshotStore used to prefilter symbols before fetching history
+        self.snapshots = snapshots
+        if snapshots is not None and 'market_cap' in self.universe.columns:
+            snapshots.set_market_caps(self.universe['market_cap'])
+        # Optional FundamentalsStore supplying market cap and sector
+        self.fundamentals = fundamentals
+        # Optional BarCache shared across screens
+        self.cache = cache
+        self.history_period = '3mo'
+        # DataProvider behind the default data source
+        self.provider = provider or YFinanceProvider(timeout=symbol_timeout)
+        # Profiler receiving per-stage spans; the shared one is off unless enabled
+        self.profiler = profiler or default_profiler
+
+        # Fetch pipeline settings. data_source(symbol) returns daily history and
+        # can be swapped for a fake source to benchmark screening offline.
+        self.data_source = data_source or self._get_history
+        self.max_workers = max_workers
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        if fundamentals is not None and fundamentals.rate_limiter is None:
+            fundamentals.rate_limiter = self.rate_limiter
+        self.symbol_timeout = symbol_timeout
         self.filter_presets = {
             'High Volume': {
                 'min_volume': 1000000,
@@ -65,86 +111,277 @@ class StockScreener:
         }
         return list(default_stocks)
 
-    def quick_screen(self, preset: str, limit: int = 50) -> List[Dict]:
-        """Quick screen based on preset filters"""
+    def config_from_preset(self, preset: str) -> ScreenerConfig:
+        """Build a ScreenerConfig from one of the filter presets"""
         filters = self.filter_presets[preset]
-        config = ScreenerConfig(
+        return ScreenerConfig(
             min_price=filters.get('min_price', 5.0),
             max_price=filters.get('max_price', 1000.0),
             min_volume=filters.get('min_volume', 500000),
-            min_market_cap=filters.get('market_cap_min', 100_000_000)
+            min_market_cap=filters.get('market_cap_min', 100_000_000),
+            min_volatility=filters.get('min_volatility', 0.0)
         )
 
-        return self.screen_stocks(config)[:limit]
+    def quick_screen(self, preset: str, limit: int = 50) -> List[Dict]:
+        """Quick screen based on preset filters"""
+        top = []
+        for top in self.quick_screen_iter(preset, limit):
+            pass
+        return top
+
+    def quick_screen_iter(self, preset: str, limit: int = 50,
+                          symbols: Optional[List[str]] = None) -> Iterator[List[Dict]]:
+        """Quick screen that only keeps the best `limit` results while scanning.
 
-    def screen_stocks(self, config: ScreenerConfig) -> List[Dict]:
-        """Screen stocks based on configuration"""
-        opportunities = []
-        for symbol in self.all_stocks:
-            try:
-                result = self._analyze_stock(symbol, config)
-                if result:
-                    opportunities.append(result)
-            except Exception as e:
-                print(f"Error screening {symbol}: {str(e)}")
+        Yields the provisional top `limit`, best first, each time it changes,
+        so the last list yielded is the final result (the same one a full
+        sort of screen_stocks would give). Once `limit` results are in, a
+        symbol whose highest possible score cannot beat the worst of them
+        skips the indicator computation.
+        """
+        if limit <= 0:
+            return
+        config = self.config_from_preset(preset)
+        symbols = self.prefilter(config, symbols)
+
+        # Min-heap of (score, -arrival, result): the root is the result to
+        # evict next, and on equal scores earlier arrivals are kept
+        top = []
+        floor = [float('-inf')]
+        results = self._run_pipeline(symbols, self._analyze_stock, config, lambda: floor[0])
+        for arrival, (_, result) in enumerate(results):
+            if not result:
                 continue
+            entry = (result['score'], -arrival, result)
+            if len(top) < limit:
+                heapq.heappush(top, entry)
+            elif entry[:2] > top[0][:2]:
+                heapq.heapreplace(top, entry)
+            else:
+                continue
+            if len(top) == limit:
+                floor[0] = top[0][0]
+            yield [result for _, _, result in sorted(top, reverse=True)]
 
+    def screen_stocks(self, config: ScreenerConfig) -> List[Dict]:
+        """Screen stocks based on configuration"""
+        opportunities = list(self.screen_stocks_iter(config))
         return sorted(opportunities, key=lambda x: x['score'], reverse=True)
 
-    def _analyze_stock(self, symbol: str, config: ScreenerConfig) -> Optional[Dict]:
-        """Analyze a single stock"""
+    def screen_stocks_iter(self, config: ScreenerConfig,
+                           symbols: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Screen stocks concurrently, yielding each result as soon as it is ready"""
+        symbols = self.prefilter(config, symbols)
+        for _, result in self._run_pipeline(symbols, self._analyze_stock, config):
+            if result:
+                yield result
+
+    def screen_panel(self, config: ScreenerConfig,
+                     symbols: Optional[List[str]] = None) -> pd.DataFrame:
+        """Screen the universe as one (time x symbol) panel.
+
+        Histories are downloaded through the same concurrent pipeline, then
+        filters, indicators and scores are computed for every symbol at once.
+        Returns a DataFrame sorted by score with one row per opportunity.
+        """
+        symbols = self.prefilter(config, symbols)
+        if self.data_source == self._get_history and self.cache is None:
+            # Nothing to intercept per symbol, so let the provider fetch in bulk
+            histories = self.provider.get_bulk_history(symbols, period=self.history_period)
+        else:
+            histories = dict(self._run_pipeline(symbols, self.data_source))
+        panel = build_panel(histories)
+        if not panel['Close'].empty:
+            lookback = self._lookback()
+            keep = ~(average_volume(panel['Volume'].to_numpy(), lookback) < config.min_volume)
+            if config.min_volatility > 0:
+                keep &= ~(ewm_volatility(panel['Close'].to_numpy(), lookback) < config.min_volatility)
+            panel = {name: frame.loc[:, keep] for name, frame in panel.items()}
+        # min_volume is already applied above, measured as in _analyze_stock
+        result = screen_panel(panel, config.min_price, config.max_price, 0)
+        if self.fundamentals is None:
+            return result
+
+        symbols = result['symbol'].to_numpy()
+        result['market_cap'] = self.fundamentals.market_caps(symbols, result['price'].to_numpy()).to_numpy()
+        result['sector'] = self.fundamentals.column('sector', symbols).to_numpy()
+        return result[~(result['market_cap'] < config.min_market_cap)].reset_index(drop=True)
+
+    def prefilter(self, config: ScreenerConfig,
+                  symbols: Optional[List[str]] = None) -> List[str]:
+        """Symbols worth fetching full history for.
+
+        With a SnapshotStore its rows are refreshed (only stale ones, in bulk)
+        and the config's price, volume, market cap and volatility limits are
+        applied to them. A FundamentalsStore supplies the market caps (or on
+        its own applies min_market_cap); it only blocks the screen to fetch
+        symbols it has never seen and renews aged rows in the background.
+        Without either every symbol is kept.
+        """
+        symbols = self.all_stocks if symbols is None else symbols
+        if self.snapshots is None and self.fundamentals is None:
+            return symbols
+
+        with self.profiler.span('prefilter'):
+            if self.fundamentals is not None:
+                self.fundamentals.refresh_for_screen(symbols)
+            if self.snapshots is None:
+                return self.fundamentals.prefilter(symbols, config.min_market_cap)
+
+            self.snapshots.refresh(self.provider, symbols)
+            if self.fundamentals is not None:
+                self.snapshots.set_market_caps(
+                    self.fundamentals.market_caps(symbols, self.snapshots.table['price']))
+            return self.snapshots.prefilter(
+                symbols, config.min_price, config.max_price, config.min_volume,
+                config.min_market_cap, config.min_volatility)
+
+    def _run_pipeline(self, symbols: List[str], task: Callable, *args) -> Iterator:
+        """Runs task(symbol, *args) on the worker pool, yielding (symbol, result) as each finishes"""
+        started = {}
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {executor.submit(self._run_task, task, symbol, args, started): symbol
+                   for symbol in symbols}
+        pending = set(futures)
+
         try:
-            stock = yf.Ticker(symbol)
-            hist = stock.history(period='3mo')
+            while pending:
+                done, pending = wait(pending, timeout=min(0.5, self.symbol_timeout),
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    symbol = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Error screening {symbol}: {str(e)}")
+                        continue
+                    yield symbol, result
 
-            if len(hist) < 50:
-                return None
+                # Give up on symbols stuck past their timeout; the clock starts
+                # once a worker picks the symbol up, not while it is queued
+                now = time.monotonic()
+                for future in list(pending):
+                    symbol = futures[future]
+                    if symbol in started and now - started[symbol] > self.symbol_timeout:
+                        pending.discard(future)
+                        future.cancel()
+                        print(f"Timed out screening {symbol} after {self.symbol_timeout:.0f}s")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_task(self, task: Callable, symbol: str, args: tuple, started: Dict):
+        """Worker task: wait for a rate-limit token, then run"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        started[symbol] = time.monotonic()
+        return task(symbol, *args)
+
+    def _analyze_stock(self, symbol: str, config: ScreenerConfig,
+                       floor: Optional[Callable[[], float]] = None) -> Optional[Dict]:
+        """Analyze a single stock; with floor, skip it unless it can score above floor()"""
+        with self.profiler.span('analyze_stock', symbol):
+            try:
+                with self.profiler.span('fetch') as fetch_span:
+                    hist = self.data_source(symbol)
+                    fetch_span.annotate(fetched=hist)
+
+                if self.snapshots is not None:
+                    self.snapshots.update_from_history(symbol, hist)
+
+                if len(hist) < 50:
+                    return None
+
+                current_price = hist['Close'].iloc[-1]
+                avg_volume = hist['Volume'].mean()
+
+                # Basic filters. Volume and volatility are measured like
+                # SnapshotStore, so a symbol its prefilter drops fails here too
+                lookback = self._lookback()
+                if (current_price < config.min_price or
+                        current_price > config.max_price or
+                        average_volume(hist['Volume'].to_numpy(), lookback) < config.min_volume):
+                    return None
+                if (config.min_volatility > 0 and
+                        ewm_volatility(hist['Close'].to_numpy(), lookback) < config.min_volatility):
+                    return None
+                if self.fundamentals is not None:
+                    market_cap = self.fundamentals.market_caps([symbol], [current_price]).iloc[0]
+                    # An unknown market cap is let through, as in prefilter
+                    if market_cap < config.min_market_cap:
+                        return None
+                if floor is not None and self._score_bound(hist) <= floor():
+                    return None
+
+                # Calculate indicators
+                with self.profiler.span('indicators') as indicator_span:
+                    close, high, low = hist['Close'], hist['High'], hist['Low']
+                    hist['RSI'] = indicator_cache.get_or_compute(
+                        close, 'rsi_wilder', (14,),
+                        lambda: ta.momentum.RSIIndicator(close).rsi())
+                    hist['MACD'] = indicator_cache.get_or_compute(
+                        close, 'macd_diff', (12, 26, 9),
+                        lambda: ta.trend.MACD(close).macd_diff())
+                    hist['ATR'] = indicator_cache.get_or_compute(
+                        (high, low, close), 'atr', (14,),
+                        lambda: ta.volatility.AverageTrueRange(high, low, close).average_true_range())
+                    indicator_span.annotate(frame=hist)
+
+                latest = hist.iloc[-1]
 
-            current_price = hist['Close'].iloc[-1]
-            avg_volume = hist['Volume'].mean()
+                # Calculate score
+                score = self._calculate_score(hist)
+                recommendation = self._get_recommendation(score)
 
-            # Basic filters
-            if (current_price < config.min_price or
-                    current_price > config.max_price or
-                    avg_volume < config.min_volume):
+                result = {
+                    'symbol': symbol,
+                    'price': current_price,
+                    'score': score,
+                    'momentum': (current_price / hist['Close'].iloc[-5] - 1) * 100,
+                    'volume_trend': 1 if avg_volume > hist['Volume'].mean() else -1,
+                    'rsi': latest['RSI'],
+                    'recommendation': recommendation
+                }
+                if self.fundamentals is not None:
+                    result['market_cap'] = market_cap
+                    result['sector'] = self.fundamentals.column('sector', [symbol]).iloc[0]
+                return result
+
+            except Exception as e:
+                print(f"Error analyzing {symbol}: {str(e)}")
                 return None
 
-            # Calculate indicators
-            hist['RSI'] = ta.momentum.RSIIndicator(hist['Close']).rsi()
-            hist['MACD'] = ta.trend.MACD(hist['Close']).macd_diff()
-            hist['ATR'] = ta.volatility.AverageTrueRange(hist['High'], hist['Low'], hist['Close']).average_true_range()
+    def _get_history(self, symbol: str) -> pd.DataFrame:
+        """Fetch daily history for the screening lookback period"""
+        if self.cache is None:
+            return self.provider.get_history(symbol, period=self.history_period)
 
-            latest = hist.iloc[-1]
+        # Express the period as a date range so the cache can serve it
+        start, end = period_to_range(self.history_period)
 
-            # Calculate score
-            score = self._calculate_score(hist)
-            recommendation = self._get_recommendation(score)
-
-            return {
-                'symbol': symbol,
-                'price': current_price,
-                'score': score,
-                'momentum': (current_price / hist['Close'].iloc[-5] - 1) * 100,
-                'volume_trend': 1 if avg_volume > hist['Volume'].mean() else -1,
-                'rsi': latest['RSI'],
-                'recommendation': recommendation
-            }
+        def fetch(fetch_start, fetch_end):
+            return self.provider.get_history(symbol, fetch_start, fetch_end, '1d')
 
-        except Exception as e:
-            print(f"Error analyzing {symbol}: {str(e)}")
-            return None
+        return self.cache.get_history(symbol, start, end, '1d', fetch)
 
     def _calculate_score(self, hist: pd.DataFrame) -> float:
         """Calculate opportunity score"""
-        score = 50  # Base score
-        latest = hist.iloc[-1]
+        with self.profiler.span('calculate_score'):
+            score = self._base_score(hist)
+            latest = hist.iloc[-1]
 
-        # RSI Component
-        rsi = latest['RSI']
-        if rsi < 30:  # Oversold
-            score += 20
-        elif rsi > 70:  # Overbought
-            score -= 20
+            # RSI Component
+            rsi = latest['RSI']
+            if rsi < 30:  # Oversold
+                score += 20
+            elif rsi > 70:  # Overbought
+                score -= 20
+
+            return min(max(score, 0), 100)
+
+    def _base_score(self, hist: pd.DataFrame) -> float:
+        """The score components that need no indicators"""
+        score = 50  # Base score
 
         # Trend Component
         if hist['Close'].iloc[-1] > hist['Close'].mean():
@@ -154,7 +391,15 @@ class StockScreener:
         if hist['Volume'].iloc[-1] > hist['Volume'].mean():
             score += 10
 
-        return min(max(score, 0), 100)
+        return score
+
+    def _lookback(self) -> int:
+        """Span of the volume and volatility averages, the SnapshotStore's if there is one"""
+        return self.snapshots.lookback if self.snapshots is not None else 20
+
+    def _score_bound(self, hist: pd.DataFrame) -> float:
+        """Highest score _calculate_score can give, whatever the RSI turns out to be"""
+        return min(self._base_score(hist) + 20, 100)
 
     def _get_recommendation(self, score: float) -> str:
         """Generate trading recommendation based on score"""
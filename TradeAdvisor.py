@@ -18,12 +18,11 @@ class TradeAdvisor:
         rsi = analysis_results['technical']['rsi'].iloc[-1]
 
         volatility = analysis_results['risk']['volatility']
-        var_95 = analysis_results['risk']['var_95']
+        var_95 = self.current_var(analysis_results['risk'])
 
         max_position = portfolio_value * self.position_sizes[self.risk_tolerance]
 
-        stop_loss = current_price * (1 + var_95)
-        target_price = current_price + (current_price - stop_loss) * 2
+        stop_loss, target_price = self.calculate_exit_levels(current_price, var_95)
 
         signal = self.generate_signal(rsi, analysis_results)
 
@@ -42,6 +41,23 @@ class TradeAdvisor:
             'alerts': self.generate_alerts(analysis_results)
         }
 
+    @staticmethod
+    def current_var(risk: Dict, key: str = 'var_95') -> float:
+        """Latest rolling VaR when RiskAnalyzer computed one, else the whole-history VaR"""
+        rolling = risk.get('rolling')
+        if rolling is not None and key in rolling:
+            latest = rolling[key].iloc[-1]
+            if not np.isnan(latest):
+                return latest
+        return risk[key]
+
+    @staticmethod
+    def calculate_exit_levels(current_price: float, var_95: float):
+        """Stop loss at the 95% VaR move and a target at twice the risk"""
+        stop_loss = current_price * (1 + var_95)
+        target_price = current_price + (current_price - stop_loss) * 2
+        return stop_loss, target_price
+
     def generate_signal(self, rsi: float, analysis_results: Dict) -> Dict:
         confidence = 0
         reasons = []
@@ -53,47 +69,63 @@ class TradeAdvisor:
             confidence -= 2
             reasons.append("RSI indicates overbought condition")
 
-            if 'moving_average_signal' in analysis_results.get('technical', {}):
-                if analysis_results['technical']['moving_average_signal'] == 'bullish':
-                    confidence += 1
-                    reasons.append("Moving averages show bullish trend")
-                elif analysis_results['technical']['moving_average_signal'] == 'bearish':
-                    confidence -= 1
-                    reasons.append("Moving averages show bearish trend")
-
-            if confidence >= 2:
-                action = "BUY"
-            elif confidence <= -2:
-                action = "SELL"
-            else:
-                action = "HOLD"
-
-            confidence_pct = min(abs(confidence) * 25, 100)
-
-            return {
-                'action': action,
-                'confidence': confidence_pct,
-                'reasoning': reasons
-            }
+        if 'moving_average_signal' in analysis_results.get('technical', {}):
+            if analysis_results['technical']['moving_average_signal'] == 'bullish':
+                confidence += 1
+                reasons.append("Moving averages show bullish trend")
+            elif analysis_results['technical']['moving_average_signal'] == 'bearish':
+                confidence -= 1
+                reasons.append("Moving averages show bearish trend")
+
+        if confidence >= 2:
+            action = "BUY"
+        elif confidence <= -2:
+            action = "SELL"
+        else:
+            action = "HOLD"
 
-    def generate_alerts(self, analysis_results: Dict) -> List[str]:
-        alerts = []
+        confidence_pct = min(abs(confidence) * 25, 100)
+
+        return {
+            'action': action,
+            'confidence': confidence_pct,
+            'reasoning': reasons
+        }
 
-        if analysis_results['risk']['volatility'] > 0.4:
-            alerts.append("⚠️ High volatility - consider smaller position size")
+    # Messages generate_alerts produces, keyed by alert rule
+    ALERT_MESSAGES = {
+        'high_volatility': "⚠️ High volatility - consider smaller position size",
+        'rsi_oversold': "💡 Extremely oversold - strong buy signal but high risk",
+        'rsi_overbought': "💡 Extremely overbought - consider taking profits",
+        'high_volume': "📈 High volume detected - increased signal strength"
+    }
+
+    @staticmethod
+    def alert_rules(volatility: float, rsi: float, high_volume: bool) -> List[str]:
+        """Keys of the alert rules these readings trigger, in generate_alerts order"""
+        rules = []
+
+        if volatility > 0.4:
+            rules.append('high_volatility')
 
-        rsi = analysis_results['technical']['rsi'].iloc[-1]
         if rsi < 20:
-            alerts.append("💡 Extremely oversold - strong buy signal but high risk")
+            rules.append('rsi_oversold')
         elif rsi > 80:
-            alerts.append("💡 Extremely overbought - consider taking profits")
+            rules.append('rsi_overbought')
+
+        if high_volume:
+            rules.append('high_volume')
 
-        if 'volume' in analysis_results:
-            if 'high_volume_days' in analysis_results['volume']:
-                if analysis_results['volume']['high_volume_days']:
-                    alerts.append("📈 High volume detected - increased signal strength")
+        return rules
+
+    def generate_alerts(self, analysis_results: Dict) -> List[str]:
+        volatility = analysis_results['risk']['volatility']
+        rsi = analysis_results['technical']['rsi'].iloc[-1]
+        volume = analysis_results.get('volume', {})
+        high_volume = 'high_volume_days' in volume and bool(volume['high_volume_days'])
 
-        return alerts
+        return [self.ALERT_MESSAGES[rule]
+                for rule in self.alert_rules(volatility, rsi, high_volume)]
 
     def get_holding_advice(self,
                            current_price: float,
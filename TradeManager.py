@@ -0,0 +1,224 @@
+import heapq
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from TradeAdvisor import TradeAdvisor
+
+STOP = 'stop'
+TARGET = 'target'
+
+
+@dataclass
+class Position:
+    """An open long position with its exit levels"""
+    position_id: int
+    symbol: str
+    entry_price: float
+    stop_loss: float
+    target_price: float
+    shares: int = 0
+    triggered: bool = False
+
+
+@dataclass
+class Trigger:
+    """A position whose stop or target was crossed by a price update"""
+    position: Position
+    price: float
+    kind: str  # STOP or TARGET
+    message: str
+
+
+class PositionBook:
+    """Open positions indexed by their stop and target levels.
+
+    Each symbol keeps a max-heap of stops and a min-heap of targets, so a
+    price update only pops the positions it actually crossed; everything
+    else is never looked at. The best stop and target of every symbol are
+    also kept in arrays, which lets update_prices screen a whole universe of
+    prices with one vectorized comparison.
+
+    A position fires once: after its stop or target is hit it stays in the
+    book, marked triggered, until it is closed or re-armed with new levels.
+    Messages are the ones TradeAdvisor.get_holding_advice produces.
+    """
+
+    def __init__(self, advisor: Optional[TradeAdvisor] = None):
+        self.advisor = advisor or TradeAdvisor()
+        self.positions: Dict[int, Position] = {}
+        self._next_id = 1
+
+        # Per symbol: heaps of (-stop, id) and (target, id), possibly holding
+        # stale entries for closed, triggered or re-levelled positions
+        self._stops: Dict[str, List] = {}
+        self._targets: Dict[str, List] = {}
+        self._live: Dict[str, int] = {}
+
+        # Symbol slots for the vectorized screen in update_prices
+        self._slots: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        self._top_stop = np.empty(0)
+        self._top_target = np.empty(0)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def open(self, symbol: str, entry_price: float, stop_loss: float,
+             target_price: float, shares: int = 0) -> Position:
+        """Adds a position and indexes its exit levels"""
+        if stop_loss >= target_price:
+            raise ValueError(f"Stop loss {stop_loss} must be below target {target_price}")
+        position = Position(self._next_id, symbol, entry_price, stop_loss, target_price, shares)
+        self._next_id += 1
+        self.positions[position.position_id] = position
+
+        self._slot(symbol)
+        self._live[symbol] = self._live.get(symbol, 0) + 1
+        self._index(position)
+        return position
+
+    def open_many(self, rows: Iterable[Mapping]) -> List[Position]:
+        """Opens one position per mapping of open()'s arguments (e.g. DataFrame records)"""
+        return [self.open(row['symbol'], row['entry_price'], row['stop_loss'],
+                          row['target_price'], row.get('shares', 0)) for row in rows]
+
+    def close(self, position_id: int) -> Position:
+        """Removes a position; its heap entries are dropped lazily"""
+        position = self.positions.pop(position_id)
+        if not position.triggered:
+            self._live[position.symbol] -= 1
+        self._compact(position.symbol)
+        return position
+
+    def set_levels(self, position_id: int, stop_loss: Optional[float] = None,
+                   target_price: Optional[float] = None) -> Position:
+        """Moves a position's stop and/or target, re-arming it if it had triggered"""
+        position = self.positions[position_id]
+        stop_loss = position.stop_loss if stop_loss is None else stop_loss
+        target_price = position.target_price if target_price is None else target_price
+        if stop_loss >= target_price:
+            raise ValueError(f"Stop loss {stop_loss} must be below target {target_price}")
+
+        position.stop_loss = stop_loss
+        position.target_price = target_price
+        if position.triggered:
+            position.triggered = False
+            self._live[position.symbol] += 1
+        self._index(position)
+        self._compact(position.symbol)
+        return position
+
+    def on_price(self, symbol: str, price: float) -> List[Trigger]:
+        """Positions in symbol whose stop or target this price crossed"""
+        triggers = []
+        stops = self._stops.get(symbol)
+        if not stops:
+            return triggers
+
+        # Stops first, matching the order of checks in get_holding_advice
+        while stops and -stops[0][0] >= price:
+            level, position_id = heapq.heappop(stops)
+            position = self._active(position_id, stop_loss=-level)
+            if position is not None:
+                triggers.append(self._fire(position, price, STOP))
+
+        targets = self._targets[symbol]
+        while targets and targets[0][0] <= price:
+            level, position_id = heapq.heappop(targets)
+            position = self._active(position_id, target_price=level)
+            if position is not None:
+                triggers.append(self._fire(position, price, TARGET))
+
+        if triggers:
+            self._compact(symbol)
+        self._refresh(symbol)
+        return triggers
+
+    def update_prices(self, prices: Union[Mapping[str, float], pd.Series]) -> List[Trigger]:
+        """Applies a snapshot of prices for many symbols at once.
+
+        Symbols without positions are ignored. Only symbols whose best stop
+        or target was crossed are visited.
+        """
+        if not self._symbols:
+            return []
+        if not isinstance(prices, pd.Series):
+            prices = pd.Series(prices, dtype=float)
+        current = prices.reindex(self._symbols).to_numpy(dtype=float)
+
+        crossed = np.flatnonzero((current <= self._top_stop) | (current >= self._top_target))
+        triggers = []
+        for slot in crossed.tolist():
+            triggers.extend(self.on_price(self._symbols[slot], current[slot]))
+        return triggers
+
+    def holding_advice(self, symbol: str, price: float) -> Dict[int, str]:
+        """get_holding_advice for every position in symbol, keyed by position id.
+
+        Unlike on_price this visits each of the symbol's positions.
+        """
+        return {position.position_id: self.advisor.get_holding_advice(
+                    price, position.entry_price, position.stop_loss, position.target_price)
+                for position in self.positions.values() if position.symbol == symbol}
+
+    def _fire(self, position: Position, price: float, kind: str) -> Trigger:
+        position.triggered = True
+        self._live[position.symbol] -= 1
+        message = self.advisor.get_holding_advice(price, position.entry_price,
+                                                  position.stop_loss, position.target_price)
+        return Trigger(position, price, kind, message)
+
+    def _active(self, position_id: int, stop_loss: Optional[float] = None,
+                target_price: Optional[float] = None) -> Optional[Position]:
+        """The position a heap entry refers to, or None if the entry is stale"""
+        position = self.positions.get(position_id)
+        if position is None or position.triggered:
+            return None
+        if stop_loss is not None and position.stop_loss != stop_loss:
+            return None
+        if target_price is not None and position.target_price != target_price:
+            return None
+        return position
+
+    def _index(self, position: Position):
+        symbol = position.symbol
+        heapq.heappush(self._stops.setdefault(symbol, []), (-position.stop_loss, position.position_id))
+        heapq.heappush(self._targets.setdefault(symbol, []), (position.target_price, position.position_id))
+        self._refresh(symbol)
+
+    def _slot(self, symbol: str) -> int:
+        slot = self._slots.get(symbol)
+        if slot is None:
+            slot = self._slots[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+            self._top_stop = np.append(self._top_stop, -np.inf)
+            self._top_target = np.append(self._top_target, np.inf)
+        return slot
+
+    def _refresh(self, symbol: str):
+        """Drops stale entries from the top of the symbol's heaps and records the best levels"""
+        stops, targets = self._stops[symbol], self._targets[symbol]
+        while stops and self._active(stops[0][1], stop_loss=-stops[0][0]) is None:
+            heapq.heappop(stops)
+        while targets and self._active(targets[0][1], target_price=targets[0][0]) is None:
+            heapq.heappop(targets)
+
+        slot = self._slots[symbol]
+        self._top_stop[slot] = -stops[0][0] if stops else -np.inf
+        self._top_target[slot] = targets[0][0] if targets else np.inf
+
+    def _compact(self, symbol: str):
+        """Rebuilds the symbol's heaps once stale entries outnumber live positions"""
+        live = self._live[symbol]
+        stops, targets = self._stops[symbol], self._targets[symbol]
+        if len(stops) + len(targets) > 4 * live + 64:
+            self._stops[symbol] = [entry for entry in stops
+                                   if self._active(entry[1], stop_loss=-entry[0])]
+            self._targets[symbol] = [entry for entry in targets
+                                     if self._active(entry[1], target_price=entry[0])]
+            heapq.heapify(self._stops[symbol])
+            heapq.heapify(self._targets[symbol])
+        self._refresh(symbol)
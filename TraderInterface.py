@@ -1,7 +1,37 @@
+import time
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 from StockScreener import StockScreener
+from fundamentals import FundamentalsStore
+from shared_cache import SingleFlightCache, is_market_open
+
+
+@st.cache_resource
+def get_shared_cache() -> SingleFlightCache:
+    """One cache per server process, shared by every session"""
+    return SingleFlightCache()
+
+
+@st.cache_resource
+def get_screener() -> StockScreener:
+    """Shared screener whose downloads go through the process-wide cache"""
+    cache = get_shared_cache()
+    # Market caps come from a local table refreshed once a day
+    screener = StockScreener(
+        fundamentals=FundamentalsStore('.marketpulse_cache/fundamentals.parquet'))
+    fetch = screener.data_source
+
+    def cached_history(symbol):
+        # A failed download comes back empty; don't keep it until the next open
+        bars = cache.get_or_compute(('bars', symbol, screener.history_period),
+                                    lambda: fetch(symbol),
+                                    cache_if=lambda data: data is not None and not data.empty)
+        # Each caller gets its own frame, since _analyze_stock adds indicator columns
+        return bars.copy() if bars is not None else bars
+
+    screener.data_source = cached_history
+    return screener
 
 class BeginnerTraderInterface:
     def __init__(self):
@@ -58,8 +88,25 @@ class BeginnerTraderInterface:
         if st.button("🔍 Find Trading Opportunities"):
             with st.spinner("Scanning market for opportunities..."):
                 try:
-                    screener = StockScreener()
-                    opportunities = screener.quick_screen(filter_type, limit=num_results)
+                    screener = get_screener()
+                    progress = st.empty()
+
+                    def scan():
+                        # Show the provisional leaders while the scan runs
+                        top, shown = [], 0.0
+                        for top in screener.quick_screen_iter(filter_type, limit=num_results):
+                            if time.monotonic() - shown > 0.5:
+                                shown = time.monotonic()
+                                with progress.container():
+                                    st.caption(f"Scanning... best {len(top)} so far")
+                                    for opp in top:
+                                        self.display_opportunity(opp)
+                        return top
+
+                    # Empty screens are not cached, so a failed scan is retried
+                    opportunities = get_shared_cache().get_or_compute(
+                        ('screen', filter_type, num_results), scan, cache_if=bool)
+                    progress.empty()
 
                     if opportunities:
                         st.markdown("### Top Trading Opportunities")
@@ -115,6 +162,9 @@ class BeginnerTraderInterface:
                 step=0.1
             )
 
+            st.markdown("---")
+            self.show_cache_status()
+
             st.markdown("---")
             st.header("📚 Learning Resources")
 
@@ -143,6 +193,22 @@ class BeginnerTraderInterface:
                 5. Keep a trading journal
                 """)
 
+    def show_cache_status(self):
+        """Shared data cache statistics for this server process"""
+        cache = get_shared_cache()
+        stats = cache.stats()
+
+        st.header("⚡ Data Cache")
+        col1, col2 = st.columns(2)
+        col1.metric("Cached Results", stats['fresh_entries'])
+        col2.metric("Hit Rate", f"{stats['hit_rate']:.0%}")
+        col1.metric("Shared In-Flight", stats['coalesced'])
+        col2.metric("Running Now", stats['in_flight'])
+        st.caption("Market open" if is_market_open() else "Market closed - results kept until next open")
+
+        if st.button("Clear Cache"):
+            cache.clear()
+
     def show_quick_start_guide(self):
         st.markdown("""
         #### 🎯 Trading Checklist:
@@ -207,8 +273,14 @@ class BeginnerTraderInterface:
 
     def analyze_stock(self, symbol):
         try:
-            screener = StockScreener()
-            result = screener._analyze_stock(symbol, screener.filter_presets['High Volume'])
+            screener = get_screener()
+            config = screener.config_from_preset('High Volume')
+            result = get_shared_cache().get_or_compute(
+                ('analysis', symbol),
+                lambda: screener._analyze_stock(symbol, config),
+                # _analyze_stock returns None on errors too; retry those next time
+                cache_if=lambda result: result is not None
+            )
 
             if result:
                 st.markdown("### 📈 Analysis Results")
@@ -0,0 +1,271 @@
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Bars per bucket of the finest precomputed level; finer zooms read raw bars
+BASE_BUCKET = 64
+
+
+def _segment_best(keys: np.ndarray, starts: np.ndarray, reduce) -> Tuple[np.ndarray, np.ndarray]:
+    """Best key (np.minimum or np.maximum) of each segment of keys beginning at starts, and its first position"""
+    counts = np.diff(np.append(starts, len(keys)))
+    segment = np.repeat(np.arange(len(starts)), counts)
+    best = reduce.reduceat(keys, starts)
+    hits = np.flatnonzero(keys == best[segment])
+    return best, hits[np.r_[True, segment[hits][1:] != segment[hits][:-1]]]
+
+
+def _keys(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # NaN never wins a minimum or maximum; an all-NaN segment reports its first bar
+    missing = np.isnan(values)
+    return np.where(missing, np.inf, values), np.where(missing, -np.inf, values)
+
+
+def _position(index: pd.Index, when, side: str) -> int:
+    if isinstance(index, pd.DatetimeIndex):
+        when = pd.Timestamp(when)
+        if index.tz is not None and when.tzinfo is None:
+            when = when.tz_localize(index.tz)
+    return int(index.searchsorted(when, side))
+
+
+class SeriesLevels:
+    """Min/max pyramid of one series for drawing any zoom range at pixel resolution.
+
+    Level k holds, for every run of BASE_BUCKET * 2**k bars, the lowest and
+    highest value and where they occur. Built once in O(n); a query then
+    touches about as many entries as the output has pixels, whatever the
+    range, plus at most two partial buckets of raw bars at its edges.
+    """
+
+    def __init__(self, values: np.ndarray):
+        self.values = np.asarray(values, dtype=float)
+        self.levels = []
+
+        size = BASE_BUCKET
+        units = len(self.values) // size
+        if units:
+            low_keys, high_keys = _keys(self.values[:units * size])
+            starts = np.arange(0, units * size, size)
+            low, low_at = _segment_best(low_keys, starts, np.minimum)
+            high, high_at = _segment_best(high_keys, starts, np.maximum)
+            level = (low, low_at, high, high_at)
+            while True:
+                self.levels.append((size, level))
+                units //= 2
+                if units < 2:
+                    break
+                size *= 2
+                level = self._halve(level, units)
+
+    @staticmethod
+    def _halve(level, units: int):
+        low, low_at, high, high_at = (part[:units * 2] for part in level)
+        left_low = low[0::2] <= low[1::2]
+        left_high = high[0::2] >= high[1::2]
+        return (np.where(left_low, low[0::2], low[1::2]),
+                np.where(left_low, low_at[0::2], low_at[1::2]),
+                np.where(left_high, high[0::2], high[1::2]),
+                np.where(left_high, high_at[0::2], high_at[1::2]))
+
+    def _units(self, start: int, stop: int, bucket: float):
+        """Extremes covering [start, stop) in units no wider than bucket bars"""
+        chosen = None
+        for size, level in self.levels:
+            if size <= bucket:
+                chosen = (size, level)
+
+        if chosen is None:
+            low, high = _keys(self.values[start:stop])
+            positions = np.arange(start, stop)
+            return low, positions, high, positions
+
+        size, (low, low_at, high, high_at) = chosen
+        first, last = -(-start // size), stop // size
+        pieces = [self._units(start, min(stop, first * size), 1)] if start < first * size else []
+        if first < last:
+            pieces.append((low[first:last], low_at[first:last], high[first:last], high_at[first:last]))
+        if max(start, last * size) < stop and last >= first:
+            pieces.append(self._units(max(start, last * size), stop, 1))
+        return tuple(np.concatenate([piece[i] for piece in pieces]) for i in range(4))
+
+    def indices(self, start: int, stop: int, buckets: int) -> np.ndarray:
+        """Positions of the lowest and highest value in each of `buckets` slices of [start, stop)"""
+        if stop - start <= 2 * buckets:
+            return np.arange(start, stop)
+
+        low, low_at, high, high_at = self._units(start, stop, (stop - start) / buckets)
+        starts = np.unique(np.linspace(0, len(low), buckets, endpoint=False).astype(np.int64))
+        _, lowest = _segment_best(low, starts, np.minimum)
+        _, highest = _segment_best(high, starts, np.maximum)
+        return np.unique(np.concatenate([low_at[lowest], high_at[highest], [start, stop - 1]]))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: `threshold` positions that keep the line's shape"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    chosen = np.empty(threshold, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean() if next_hi > hi else x[-1]
+        avg_y = np.nanmean(y[hi:next_hi]) if next_hi > hi else y[-1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.nanargmax(area)) if not np.isnan(area).all() else lo
+        chosen[i + 1] = a
+    return chosen
+
+
+class Visualizer:
+    """Headless charts of long bar series, downsampled to the pixel budget.
+
+    Lines are reduced to the lowest and highest point per horizontal pixel
+    (method='minmax', which keeps every spike) or by LTTB (method='lttb').
+    Min/max pyramids are kept per series and the downsampled points per zoom
+    range, so redrawing or zooming the same data is cheap. Figures render
+    through the Agg canvas, never pyplot, so nothing blocks or needs a
+    display; the output format follows the file extension (PNG, SVG, ...).
+    """
+
+    def __init__(self, width: int = 1500, height: int = 1000, dpi: int = 100,
+                 method: str = 'minmax', cache_size: int = 64):
+        if method not in ('minmax', 'lttb'):
+            raise ValueError(f"Unknown downsampling method {method!r}")
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.method = method
+        self.cache_size = cache_size
+        self._levels: Dict[int, Tuple[weakref.ref, SeriesLevels]] = {}
+        self._ranges: OrderedDict = OrderedDict()
+
+    @property
+    def buckets(self) -> int:
+        # Roughly the horizontal pixels of the plot area
+        return max(2, int(self.width * 0.8))
+
+    def downsample(self, series: pd.Series, start=None, end=None,
+                   method: Optional[str] = None) -> pd.Series:
+        """The points of series within [start, end] that get drawn at this width"""
+        method = method or self.method
+        index = series.index
+        i0 = 0 if start is None else _position(index, start, 'left')
+        i1 = len(series) if end is None else _position(index, end, 'right')
+
+        key = (id(series), i0, i1, self.buckets, method)
+        cached = self._ranges.get(key)
+        if cached is not None and cached[0]() is series:
+            self._ranges.move_to_end(key)
+            return cached[1]
+
+        if method == 'lttb':
+            x = index[i0:i1].asi8 if isinstance(index, pd.DatetimeIndex) else np.arange(i0, i1)
+            positions = i0 + lttb_indices(x, series.to_numpy(dtype=float)[i0:i1], self.buckets)
+        else:
+            positions = self._pyramid(series).indices(i0, i1, self.buckets) if i1 > i0 else np.arange(0)
+        points = series.iloc[positions]
+
+        self._ranges[key] = (weakref.ref(series), points)
+        while len(self._ranges) > self.cache_size:
+            self._ranges.popitem(last=False)
+        return points
+
+    def _pyramid(self, series: pd.Series) -> SeriesLevels:
+        entry = self._levels.get(id(series))
+        if entry is None or entry[0]() is not series:
+            ref = weakref.ref(series, lambda _, key=id(series): self._levels.pop(key, None))
+            entry = self._levels[id(series)] = (ref, SeriesLevels(series.to_numpy(dtype=float)))
+        return entry[1]
+
+    def _figure(self) -> Figure:
+        figure = Figure(figsize=(self.width / self.dpi, self.height / self.dpi), dpi=self.dpi)
+        FigureCanvasAgg(figure)
+        return figure
+
+    @staticmethod
+    def _x(points: pd.Series):
+        index = points.index
+        return index.tz_localize(None) if getattr(index, 'tz', None) is not None else index
+
+    def _line(self, ax, series: pd.Series, start, end, **style):
+        points = self.downsample(series, start, end)
+        return ax.plot(self._x(points), points.to_numpy(dtype=float), **style)
+
+    def _volume(self, ax, volume: pd.Series, start, end):
+        # Bars wider than a pixel are meaningless, so draw the per-pixel peak as a filled step
+        points = self.downsample(volume, start, end, method='minmax')
+        ax.fill_between(self._x(points), 0, points.to_numpy(dtype=float), step='mid',
+                        alpha=0.5, linewidth=0)
+        ax.set_ylabel('Volume')
+
+    def draw_market(self, figure: Figure, data: pd.DataFrame, symbol: str,
+                    overlays: Optional[Dict[str, pd.Series]] = None, show_volume: bool = True,
+                    start=None, end=None):
+        """Price, overlay lines and volume of one symbol onto figure, as MarketAnalyzer.plot_data lays them out"""
+        grid = figure.add_gridspec(3, 1)
+        ax1 = figure.add_subplot(grid[0:2, 0] if show_volume else grid[:, 0])
+        self._line(ax1, data['Close'], start, end, label=f'{symbol} Price')
+        for label, series in (overlays or {}).items():
+            self._line(ax1, series, start, end, label=label, linestyle='--')
+        ax1.legend()
+
+        if show_volume:
+            ax2 = figure.add_subplot(grid[2, 0], sharex=ax1)
+            self._volume(ax2, data['Volume'], start, end)
+        figure.tight_layout()
+        return figure
+
+    def plot_market(self, data: pd.DataFrame, symbol: str, output_path: str,
+                    overlays: Optional[Dict[str, pd.Series]] = None, show_volume: bool = True,
+                    start=None, end=None) -> str:
+        """Renders draw_market headless to output_path"""
+        figure = self._figure()
+        self.draw_market(figure, data, symbol, overlays, show_volume, start, end)
+        figure.savefig(output_path)
+        return output_path
+
+    def plot_comparison(self, frames: Dict[str, pd.DataFrame], output_path: str,
+                        start=None, end=None, moving_averages=('20_avg', '50_avg')) -> str:
+        """Two symbols' prices and moving averages on twin axes, like stock_comparison.png"""
+        if len(frames) != 2:
+            raise ValueError("plot_comparison draws exactly two symbols")
+        (symbol1, data1), (symbol2, data2) = frames.items()
+
+        figure = self._figure()
+        ax1 = figure.add_subplot(111)
+        ax2 = ax1.twinx()
+        lines = []
+        colors = iter(['C0', 'C1', 'C2', 'C3', 'C4', 'C5'])
+        for ax, symbol, data in ((ax1, symbol1, data1), (ax2, symbol2, data2)):
+            lines += self._line(ax, data['Close'], start, end, label=f'{symbol} Price',
+                                linewidth=2, color=next(colors))
+            for column in moving_averages:
+                if column in data.columns:
+                    lines += self._line(ax, data[column], start, end, linestyle='--',
+                                        label=f"{symbol} {column.split('_')[0]}-day MA",
+                                        color=next(colors))
+            ax.set_ylabel(f'{symbol} Price ($)')
+
+        period_start = start or data1.index[0].strftime('%Y-%m-%d')
+        period_end = end or data1.index[-1].strftime('%Y-%m-%d')
+        ax1.set_title(f'{symbol1} vs {symbol2} Comparison\nPeriod: {period_start} to {period_end}')
+        ax1.set_xlabel('Date')
+        ax1.grid(True, alpha=0.3)
+        figure.legend(lines, [line.get_label() for line in lines], loc='center left',
+                      bbox_to_anchor=(1.0, 0.5))
+        figure.savefig(output_path, bbox_inches='tight')
+        return output_path
@@ -0,0 +1,260 @@
+import asyncio
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from TradeAdvisor import TradeAdvisor
+from streaming_indicators import IncrementalIndicators
+
+
+@dataclass
+class Bar:
+    """One bar of a live or replayed feed"""
+    symbol: str
+    timestamp: pd.Timestamp
+    close: float
+    volume: float
+
+
+@dataclass
+class Alert:
+    """A TradeAdvisor alert raised for one symbol on one bar"""
+    symbol: str
+    rule: str
+    message: str
+    timestamp: pd.Timestamp
+    price: float
+    latency: float  # seconds from receiving the bar to raising the alert
+
+
+class BarFeed(ABC):
+    """Source of bars for a watchlist"""
+
+    @abstractmethod
+    def stream(self, symbols: List[str]) -> AsyncIterator[Bar]:
+        pass
+
+
+class ReplayFeed(BarFeed):
+    """Replays stored bar frames as a live feed, in timestamp order across symbols.
+
+    With speed=None bars are delivered as fast as the consumer takes them;
+    otherwise the gaps between timestamps are slept, divided by speed
+    (speed=60 plays an hour of 1-minute bars in a minute).
+    """
+
+    def __init__(self, histories: Dict[str, pd.DataFrame], speed: Optional[float] = None,
+                 yield_every: int = 256):
+        self.histories = histories
+        self.speed = speed
+        # Bars delivered between forced yields to the event loop when not sleeping
+        self.yield_every = yield_every
+
+    async def stream(self, symbols: List[str]) -> AsyncIterator[Bar]:
+        frames = [(symbol, self.histories[symbol]) for symbol in symbols
+                  if symbol in self.histories and not self.histories[symbol].empty]
+        if not frames:
+            return
+
+        times = np.concatenate([frame.index.asi8 for _, frame in frames])
+        owners = np.concatenate([np.full(len(frame), i) for i, (_, frame) in enumerate(frames)])
+        closes = np.concatenate([frame['Close'].to_numpy(dtype=float) for _, frame in frames])
+        volumes = np.concatenate([frame['Volume'].to_numpy(dtype=float) for _, frame in frames])
+        order = np.argsort(times, kind='stable')
+        tz = frames[0][1].index.tz
+
+        previous = None
+        for count, i in enumerate(order.tolist()):
+            if self.speed and previous is not None and times[i] > previous:
+                await asyncio.sleep((times[i] - previous) / 1e9 / self.speed)
+            elif count % self.yield_every == 0:
+                await asyncio.sleep(0)
+            previous = times[i]
+            yield Bar(frames[owners[i]][0], pd.Timestamp(times[i], tz=tz),
+                      closes[i], volumes[i])
+
+
+class _Running:
+    """Count, mean and sum of squared deviations of everything pushed so far"""
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+
+class _SymbolState:
+    """Incremental inputs to the alert rules for one symbol"""
+    __slots__ = ('indicators', 'returns', 'volumes', 'prev_close', 'streaks', 'active', 'last_sent')
+
+    def __init__(self):
+        self.indicators = IncrementalIndicators()
+        self.returns = _Running()
+        self.volumes = _Running()
+        self.prev_close: Optional[float] = None
+        self.streaks: Dict[str, int] = {}
+        self.active: Dict[str, bool] = {}
+        self.last_sent: Dict[str, pd.Timestamp] = {}
+
+    def update(self, close: float, volume: float):
+        """Adds one bar; returns (volatility, rsi, high_volume) as generate_alerts sees them"""
+        rsi = self.indicators.update(close, volume)['rsi']
+        if self.prev_close is not None:
+            self.returns.push(close / self.prev_close - 1)
+        self.prev_close = close
+        self.volumes.push(volume)
+
+        # Same readings as RiskAnalyzer.calculate_volatility and, for the
+        # newest bar, VolumeAnalyzer.detect_high_volume_days over all bars seen
+        volatility = self.returns.std() * math.sqrt(252)
+        high_volume = volume > self.volumes.mean + 2 * self.volumes.std()
+        return volatility, rsi, high_volume
+
+
+class AlertEngine:
+    """Evaluates TradeAdvisor's alert rules on every bar of a watchlist feed.
+
+    Each symbol keeps constant-size indicator state, so a bar costs the same
+    however long the engine has been running. A rule has to hold for
+    debounce_bars consecutive bars before it fires, fires once while it stays
+    true, and after clearing only fires again once cooldown has passed since
+    its last alert (measured in bar time, so replays behave like live runs).
+
+    Alerts are pushed to every subscriber queue; a subscriber that falls
+    behind by queue_size alerts loses its oldest ones rather than stalling
+    the engine.
+    """
+
+    def __init__(self, feed: BarFeed, watchlist: Iterable[str], debounce_bars: int = 1,
+                 cooldown: Optional[pd.Timedelta] = None, advisor: Optional[TradeAdvisor] = None,
+                 latency_samples: int = 10_000):
+        self.feed = feed
+        self.watchlist = list(dict.fromkeys(watchlist))
+        self.debounce_bars = max(1, debounce_bars)
+        self.cooldown = pd.Timedelta(cooldown) if cooldown is not None else None
+        self.advisor = advisor or TradeAdvisor()
+        self.states = {symbol: _SymbolState() for symbol in self.watchlist}
+        self.subscribers: List[asyncio.Queue] = []
+        self.bars = 0
+        self.alerts = 0
+        self.dropped = 0
+        self.latencies = deque(maxlen=latency_samples)
+
+    def subscribe(self, queue_size: int = 10_000) -> asyncio.Queue:
+        """Queue that receives every Alert published from now on"""
+        queue = asyncio.Queue(maxsize=queue_size)
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.remove(queue)
+
+    def warm_up(self, histories: Dict[str, pd.DataFrame]):
+        """Seeds symbol state from stored bars without raising alerts"""
+        for symbol, data in histories.items():
+            state = self.states.get(symbol)
+            if state is None:
+                continue
+            for close, volume in zip(data['Close'].to_numpy(dtype=float),
+                                     data['Volume'].to_numpy(dtype=float)):
+                state.update(close, volume)
+
+    async def run(self, max_bars: Optional[int] = None):
+        """Consumes the feed until it ends (or max_bars), publishing alerts as bars arrive"""
+        async for bar in self.feed.stream(self.watchlist):
+            received = time.perf_counter()
+            alerts = self.process_bar(bar, received)
+            self._publish(alerts)
+            self.latencies.append(time.perf_counter() - received)
+            if max_bars is not None and self.bars >= max_bars:
+                break
+
+    def process_bar(self, bar: Bar, received: Optional[float] = None) -> List[Alert]:
+        """Updates the bar's symbol and returns the alerts it raises"""
+        state = self.states.get(bar.symbol)
+        if state is None:
+            return []
+        self.bars += 1
+        received = time.perf_counter() if received is None else received
+
+        firing = set(self.advisor.alert_rules(*state.update(bar.close, bar.volume)))
+        alerts = []
+        for rule in self.advisor.ALERT_MESSAGES:
+            if rule not in firing:
+                state.streaks[rule] = 0
+                state.active[rule] = False
+                continue
+
+            state.streaks[rule] = state.streaks.get(rule, 0) + 1
+            if state.active.get(rule) or state.streaks[rule] < self.debounce_bars:
+                continue
+            state.active[rule] = True
+
+            last = state.last_sent.get(rule)
+            if self.cooldown is not None and last is not None and bar.timestamp - last < self.cooldown:
+                continue
+            state.last_sent[rule] = bar.timestamp
+            alerts.append(Alert(bar.symbol, rule, self.advisor.ALERT_MESSAGES[rule],
+                                bar.timestamp, bar.close, time.perf_counter() - received))
+        return alerts
+
+    def _publish(self, alerts: List[Alert]):
+        for alert in alerts:
+            self.alerts += 1
+            for queue in self.subscribers:
+                if queue.full():
+                    queue.get_nowait()
+                    self.dropped += 1
+                queue.put_nowait(alert)
+
+    def latency_stats(self) -> Dict[str, float]:
+        """Per-bar processing latency in milliseconds over the recent bars"""
+        if not self.latencies:
+            return {}
+        values = np.array(self.latencies) * 1000
+        return {'bars': self.bars, 'p50_ms': float(np.percentile(values, 50)),
+                'p99_ms': float(np.percentile(values, 99)), 'max_ms': float(values.max())}
+
+
+if __name__ == "__main__":
+    from data_providers import SyntheticProvider
+
+    async def main():
+        provider = SyntheticProvider(seed=1)
+        watchlist = [f"SYM{i:03d}" for i in range(300)]
+        histories = {symbol: provider.generate_bars(symbol, 390, '1m', end='2024-06-28')
+                     for symbol in watchlist}
+
+        engine = AlertEngine(ReplayFeed(histories), watchlist, debounce_bars=2,
+                             cooldown=pd.Timedelta(minutes=30))
+        alerts = engine.subscribe()
+
+        async def printer():
+            while True:
+                alert = await alerts.get()
+                print(f"{alert.timestamp} {alert.symbol}: {alert.message}")
+
+        consumer = asyncio.create_task(printer())
+        await engine.run()
+        while not alerts.empty():
+            await asyncio.sleep(0)
+        consumer.cancel()
+        print(f"\n{engine.alerts} alerts over {engine.bars} bars; latency {engine.latency_stats()}")
+
+    asyncio.run(main())
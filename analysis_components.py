@@ -1,7 +1,14 @@
 from abc import ABC, abstractmethod
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
+from indicator_cache import indicator_cache, rolling_mean, rolling_std, ewm_mean, pct_change
+from compact_frames import LazyResults, to_float32
+from rolling_risk import rolling_risk
+
+# Type codes used by compact volume-price divergence results
+DIVERGENCE_BEARISH = -1
+DIVERGENCE_BULLISH = 1
 
 
 class AnalysisComponent(ABC):
@@ -10,53 +17,90 @@ class AnalysisComponent(ABC):
         pass
 
 class VolumeAnalyzer(AnalysisComponent):
-    def analyze(self, data: pd.DataFrame) -> Dict:
-        analysis = {}
+    def __init__(self, compact: bool = False):
+        # In compact mode 'volume_ma' and 'vpt' are returned as float32 results
+        # instead of being added to the data, and everything is computed lazily
+        self.compact = compact
 
-        data['volume_ma'] = data['Volume'].rolling(window=20).mean()
+    def analyze(self, data: pd.DataFrame) -> Dict:
+        if self.compact:
+            return LazyResults({
+                'volume_ma': lambda: to_float32(rolling_mean(data['Volume'], 20)),
+                'vpt': lambda: to_float32(self.calculate_vpt(data)),
+                'high_volume_days': lambda: self.detect_high_volume_days(data),
+                'volume_price_divergence': lambda: self.detect_volume_price_divergence(data)
+            })
 
-        data['vpt'] = (data['Close'] - data['Close'].shift(1)) / \
-                      data['Close'].shift(1) * data['Volume']
+        analysis = {}
 
-        data['vpt'] = data['vpt'].cumsum()
+        data['volume_ma'] = rolling_mean(data['Volume'], 20)
+        data['vpt'] = self.calculate_vpt(data)
 
         analysis['high_volume_days'] = self.detect_high_volume_days(data)
         analysis['volume_price_divergence'] = self.detect_volume_price_divergence(data)
 
         return analysis
 
+    def calculate_vpt(self, data: pd.DataFrame) -> pd.Series:
+        vpt = (data['Close'] - data['Close'].shift(1)) / \
+              data['Close'].shift(1) * data['Volume']
+        return vpt.cumsum()
+
     def detect_high_volume_days(self, data: pd.DataFrame) -> List[str]:
         volume_mean = data['Volume'].mean()
         volume_std = data['Volume'].std()
         high_volume_days = data[data['Volume'] > volume_mean + 2 * volume_std].index
         return high_volume_days.tolist()
 
-    def detect_volume_price_divergence(self, data: pd.DataFrame) -> List[Dict]:
-        divergences = []
-
-        price_trend = data['Close'].rolling(window=5).mean().diff()
-        volume_trend = data['Volume'].rolling(window=5).mean().diff()
-
-        for i in range(len(data) - 1):
-            if price_trend.iloc[i] > 0 and volume_trend.iloc[i] < 0:
-                divergences.append({
-                    'date': data.index[i],
-                    'type': 'bearish',
-                    'price': data['Close'].iloc[i],
-                    'volume': data['Volume'].iloc[i]
-                })
-            elif price_trend.iloc[i] < 0 and volume_trend.iloc[i] > 0:
-                divergences.append({
-                    'date': data.index[i],
-                    'type': 'bullish',
-                    'price': data['Close'].iloc[i],
-                    'volume': data['Volume'].iloc[i]
-                })
-        return divergences
+    def detect_volume_price_divergence(self, data: pd.DataFrame,
+                                       compact: bool = False) -> Union[List[Dict], Dict]:
+        """Finds bars where the 5-bar price and volume trends move in opposite directions.
+
+        With compact=True the result is a dict of parallel arrays ('date', 'type',
+        'price', 'volume') where 'type' holds DIVERGENCE_BEARISH/DIVERGENCE_BULLISH
+        codes, instead of one dict per divergence.
+        """
+        price_trend = rolling_mean(data['Close'], 5).diff().to_numpy()
+        volume_trend = rolling_mean(data['Volume'], 5).diff().to_numpy()
+
+        # NaN compares False, matching the warm-up bars of the rolling means.
+        # The last bar is excluded, as in the original loop.
+        bearish = (price_trend > 0) & (volume_trend < 0)
+        bullish = (price_trend < 0) & (volume_trend > 0)
+        bearish[-1:] = False
+        bullish[-1:] = False
+
+        positions = np.flatnonzero(bearish | bullish)
+        codes = np.where(bearish[positions], DIVERGENCE_BEARISH, DIVERGENCE_BULLISH).astype(np.int8)
+        dates = data.index[positions]
+        prices = data['Close'].to_numpy()[positions]
+        volumes = data['Volume'].to_numpy()[positions]
+
+        if compact:
+            return {'date': dates, 'type': codes, 'price': prices, 'volume': volumes}
+
+        return [{
+            'date': date,
+            'type': 'bearish' if code == DIVERGENCE_BEARISH else 'bullish',
+            'price': price,
+            'volume': volume
+        } for date, code, price, volume in zip(dates.tolist(), codes.tolist(),
+                                               prices.tolist(), volumes.tolist())]
 
 
 class TechnicalAnalyzer(AnalysisComponent):
+    def __init__(self, compact: bool = False):
+        # In compact mode indicators are computed on first access and kept as float32
+        self.compact = compact
+
     def analyze(self, data: pd.DataFrame) -> Dict:
+        if self.compact:
+            return LazyResults({
+                'rsi': lambda: to_float32(self.calculate_rsi(data)),
+                'bollinger_bands': lambda: to_float32(self.calculate_bollinger_bands(data)),
+                'macd': lambda: to_float32(self.calculate_macd(data))
+            })
+
         analysis = {}
 
         analysis['rsi'] = self.calculate_rsi(data)
@@ -68,34 +112,50 @@ class TechnicalAnalyzer(AnalysisComponent):
         return analysis
 
     def calculate_rsi(self, data: pd.DataFrame, period: int = 14) -> pd.Series:
-        delta = data['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
+        close = data['Close']
+
+        def compute():
+            delta = close.diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+            rs = gain / loss
+            return 100 - (100 / (1 + rs))
+
+        # Simple-average RSI; the screener's ta RSI uses Wilder smoothing and
+        # is cached under its own name
+        return indicator_cache.get_or_compute(close, 'rsi_sma', (period,), compute)
 
     def calculate_bollinger_bands(self, data: pd.DataFrame, period: int = 20) -> Dict:
-        sma = data['Close'].rolling(window=period).mean()
-        std = data['Close'].rolling(window=period).std()
+        sma = rolling_mean(data['Close'], period)
+        std = rolling_std(data['Close'], period)
         return {
             'upper': sma + (std * 2),
             'middle': sma,
             'lower': sma - (std * 2)
         }
 
-    def calculate_macd(self, data: pd.DataFrame) -> Dict:
-        exp1 = data['Close'].ewm(span=12, adjust=False).mean()
-        exp2 = data['Close'].ewm(span=26, adjust=False).mean()
+    def calculate_macd(self, data: pd.DataFrame, fast: int = 12, slow: int = 26,
+                       signal: int = 9) -> Dict:
+        exp1 = ewm_mean(data['Close'], fast)
+        exp2 = ewm_mean(data['Close'], slow)
         macd = exp1 - exp2
-        signal = macd.ewm(span=9, adjust=False).mean()
+        signal_line = ewm_mean(macd, signal)
         return {
             'macd': macd,
-            'signal': signal,
-            'histogram': macd - signal
+            'signal': signal_line,
+            'histogram': macd - signal_line
         }
 
 
 class RiskAnalyzer(AnalysisComponent):
+    def __init__(self, rolling_window: Optional[int] = None, volatility_window: int = 20,
+                 confidences=(0.95, 0.99)):
+        # With rolling_window set, analyze() also returns 'rolling': per-bar
+        # volatility, VaR/CVaR and max drawdown over that many trailing bars
+        self.rolling_window = rolling_window
+        self.volatility_window = volatility_window
+        self.confidences = tuple(confidences)
+
     def analyze(self, data: pd.DataFrame) -> Dict:
         analysis = {}
 
@@ -106,14 +166,25 @@ class RiskAnalyzer(AnalysisComponent):
 
         analysis['max_drawdown'] = self.calculate_max_drawdown(data)
 
+        if self.rolling_window:
+            analysis['rolling'] = self.calculate_rolling_risk(data)
+
         return analysis
 
-    def calculate_volatility(self, data: pd.DataFrame, window: int = 20) -> float:
-        returns = data['Close'].pct_change()
+    def calculate_volatility(self, data: pd.DataFrame, window: Optional[int] = None) -> float:
+        """Annualized volatility of the whole history, or of the last `window` returns"""
+        returns = pct_change(data['Close'])
+        if window is not None:
+            returns = returns.iloc[-window:]
         return returns.std() * np.sqrt(252)
 
+    def calculate_rolling_risk(self, data: pd.DataFrame) -> Dict[str, pd.Series]:
+        """Risk metrics as of every bar, keyed like analyze() ('volatility', 'var_95', 'cvar_95', ...)"""
+        return rolling_risk(data['Close'], self.rolling_window or 252,
+                            self.volatility_window, self.confidences)
+
     def calculate_var(self, data: pd.DataFrame, confidence: float) -> float:
-        returns = data['Close'].pct_change().dropna()
+        returns = pct_change(data['Close']).dropna()
         return np.percentile(returns, (1 - confidence) * 100)
 
     def calculate_max_drawdown(self, data: pd.DataFrame) -> float:
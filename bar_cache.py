@@ -0,0 +1,224 @@
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+EXCHANGE_TZ = 'America/New_York'
+
+# Seconds before bars from the current session are considered stale
+DEFAULT_LIVE_TTLS = {
+    '1m': 60,
+    '2m': 120,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '60m': 1800,
+    '90m': 1800,
+    '1h': 1800,
+    '1d': 900,
+    '5d': 3600,
+    '1wk': 3600,
+    '1mo': 3600,
+    '3mo': 3600,
+}
+
+
+class BarCache:
+    """Persistent on-disk OHLCV cache keyed by (symbol, interval).
+
+    Bars are stored as one Parquet file per key next to a small JSON sidecar
+    recording the covered [start, end) range and when the live tail was last
+    fetched. Requests are served from disk and only the missing head or tail
+    of the range is downloaded.
+    """
+
+    def __init__(self, cache_dir: str = '.marketpulse_cache',
+                 live_ttls: Optional[Dict[str, int]] = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.live_ttls = dict(DEFAULT_LIVE_TTLS)
+        if live_ttls:
+            self.live_ttls.update(live_ttls)
+
+        self._guard = threading.Lock()
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def get_history(self, symbol: str, start, end, interval: str,
+                    fetch: Callable[[pd.Timestamp, pd.Timestamp], pd.DataFrame]) -> pd.DataFrame:
+        """Returns bars for [start, end), fetching only ranges not already on disk.
+
+        fetch(start, end) must download bars for the half-open range, the same
+        way yf.Ticker(symbol).history(start=..., end=..., interval=...) does.
+        """
+        start = _to_exchange_time(start)
+        end = _to_exchange_time(end)
+        if start >= end:
+            raise ValueError(f"Invalid range for {symbol}: {start} >= {end}")
+
+        with self._lock_for(symbol, interval):
+            meta = self._load_meta(symbol, interval)
+            bars = self._load_bars(symbol, interval) if meta else None
+
+            if meta is None or bars is None:
+                bars = self._fetch(fetch, start, end)
+                if bars.empty:
+                    # Don't record coverage for what may be a transient failure
+                    return bars
+                meta = {'start': start, 'end': end, 'fetched_at': time.time()}
+                self._save(symbol, interval, bars, meta)
+                return _slice(bars, start, end)
+
+            missing = self._missing_ranges(meta, start, end, interval)
+            if missing:
+                pieces = [bars]
+                for piece_start, piece_end, is_tail in missing:
+                    fetched = self._fetch(fetch, piece_start, piece_end)
+                    # Refetched ranges replace whatever was stored for them
+                    pieces[0] = _drop_range(pieces[0], piece_start, piece_end)
+                    pieces.append(fetched)
+                    if is_tail:
+                        meta['fetched_at'] = time.time()
+
+                bars = _merge(pieces)
+                meta['start'] = min(meta['start'], start)
+                meta['end'] = max(meta['end'], end)
+                self._save(symbol, interval, bars, meta)
+
+            return _slice(bars, start, end)
+
+    def invalidate(self, symbol: str, interval: Optional[str] = None):
+        """Removes cached bars for a symbol (all intervals if none given)"""
+        # Matched exactly: a glob on '<symbol>_*' would also catch e.g. BRK/B's files for BRK
+        interval_pattern = re.escape(_safe_name(interval)) if interval else '[^_]+'
+        pattern = re.compile(rf"{re.escape(_safe_name(symbol))}_{interval_pattern}\.(parquet|json)(\.tmp)?")
+        for path in self.cache_dir.iterdir():
+            if pattern.fullmatch(path.name):
+                path.unlink(missing_ok=True)
+
+    def _missing_ranges(self, meta: Dict, start: pd.Timestamp, end: pd.Timestamp,
+                        interval: str) -> List[Tuple[pd.Timestamp, pd.Timestamp, bool]]:
+        """Works out which head/tail ranges need downloading"""
+        missing = []
+        cov_start, cov_end = meta['start'], meta['end']
+
+        if start < cov_start:
+            missing.append((start, cov_start, False))
+
+        # Bars before the day of the last tail fetch are final; anything after
+        # that may still change while the session is open.
+        fetched_day = _to_exchange_time(pd.Timestamp(meta['fetched_at'], unit='s', tz='UTC')).normalize()
+        settled_end = min(cov_end, fetched_day)
+
+        if end > settled_end:
+            age = time.time() - meta['fetched_at']
+            fresh = age < self.live_ttls.get(interval, 60)
+            if end > cov_end or not fresh:
+                # Start at settled_end even if the request starts later, so the
+                # stored range never has holes in it
+                missing.append((settled_end, max(end, cov_end), True))
+
+        return missing
+
+    def _fetch(self, fetch: Callable, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        data = fetch(start, end)
+        if data is None:
+            return pd.DataFrame()
+        return data
+
+    def _lock_for(self, symbol: str, interval: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault((symbol, interval), threading.Lock())
+
+    def _paths(self, symbol: str, interval: str) -> Tuple[Path, Path]:
+        stem = f"{_safe_name(symbol)}_{_safe_name(interval)}"
+        return self.cache_dir / f"{stem}.parquet", self.cache_dir / f"{stem}.json"
+
+    def _load_meta(self, symbol: str, interval: str) -> Optional[Dict]:
+        _, meta_path = self._paths(symbol, interval)
+        try:
+            with open(meta_path) as f:
+                raw = json.load(f)
+            return {
+                'start': pd.Timestamp(raw['start']),
+                'end': pd.Timestamp(raw['end']),
+                'fetched_at': float(raw['fetched_at'])
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _load_bars(self, symbol: str, interval: str) -> Optional[pd.DataFrame]:
+        bars_path, _ = self._paths(symbol, interval)
+        try:
+            return pd.read_parquet(bars_path)
+        except Exception as e:
+            print(f"Discarding unreadable cache file {bars_path}: {str(e)}")
+            return None
+
+    def _save(self, symbol: str, interval: str, bars: pd.DataFrame, meta: Dict):
+        bars_path, meta_path = self._paths(symbol, interval)
+        write_parquet(bars, bars_path)
+
+        tmp_meta = meta_path.with_suffix('.json.tmp')
+        with open(tmp_meta, 'w') as f:
+            json.dump({
+                'start': meta['start'].isoformat(),
+                'end': meta['end'].isoformat(),
+                'fetched_at': meta['fetched_at']
+            }, f)
+        os.replace(tmp_meta, meta_path)
+
+
+def write_parquet(data: pd.DataFrame, path: Path):
+    """Writes data to path through a temp file, so readers never see a half-written file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    data.to_parquet(tmp)
+    os.replace(tmp, path)
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r'[^A-Za-z0-9._-]', '_', value)
+
+
+def _to_exchange_time(value) -> pd.Timestamp:
+    """Converts a date-like value to a naive timestamp in exchange local time"""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(EXCHANGE_TZ).tz_localize(None)
+    return ts
+
+
+def _index_bounds(data: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp):
+    tz = getattr(data.index, 'tz', None)
+    if tz is not None:
+        start = start.tz_localize(EXCHANGE_TZ).tz_convert(tz)
+        end = end.tz_localize(EXCHANGE_TZ).tz_convert(tz)
+    return start, end
+
+
+def _slice(data: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    if data.empty:
+        return data.copy()
+    lo, hi = _index_bounds(data, start, end)
+    return data[(data.index >= lo) & (data.index < hi)].copy()
+
+
+def _drop_range(data: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    if data.empty:
+        return data
+    lo, hi = _index_bounds(data, start, end)
+    return data[(data.index < lo) | (data.index >= hi)]
+
+
+def _merge(pieces: List[pd.DataFrame]) -> pd.DataFrame:
+    pieces = [p for p in pieces if not p.empty]
+    if not pieces:
+        return pd.DataFrame()
+    merged = pd.concat(pieces)
+    merged = merged[~merged.index.duplicated(keep='last')]
+    return merged.sort_index()
@@ -0,0 +1,85 @@
+"""Memory of MarketAnalyzer in its default and compact modes.
+
+Runs get_data, analyze_all, get_trading_signals and get_trade_advice-style
+reads on synthetic 1-minute bars for several symbols and reports, per
+symbol, the tracemalloc peak and the bytes the analyzer still holds
+afterwards, plus how far the compact results drift from the default ones.
+
+Usage: python benchmarks/bench_compact_memory.py [--bars 500000] [--symbols 3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MarketAnalyzer import MarketAnalyzer
+from data_providers import SyntheticProvider
+from indicator_cache import indicator_cache
+
+END = '2024-12-31'
+
+
+def run(symbol: str, provider: SyntheticProvider, start, end, compact: bool):
+    """Analyze one symbol; returns (analyzer, seconds, peak bytes)"""
+    indicator_cache.clear()
+    tracemalloc.start()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer = MarketAnalyzer(symbol, start, end, '1m', provider=provider, compact=compact)
+        analyzer.get_data()
+        results = analyzer.analyze_all()
+        # What TradeAdvisor and get_trading_signals read
+        results['technical']['rsi'].iloc[-1]
+        analyzer.get_trading_signals()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    indicator_cache.clear()
+    return analyzer, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bars', type=int, default=500_000, help='1-minute bars per symbol')
+    parser.add_argument('--symbols', type=int, default=3)
+    args = parser.parse_args()
+
+    provider = SyntheticProvider(seed=11, origin='1900-01-01')
+    mb = 2 ** 20
+    print(f"{'symbol':<8} {'mode':<8} {'seconds':>8} {'peak MB':>9} {'held MB':>9} "
+          f"{'data MB':>9} {'var_95 diff':>12} {'last rsi diff':>14}")
+
+    for i in range(args.symbols):
+        symbol = f"SYM{i}"
+        bars = provider.generate_bars(symbol, args.bars, '1m', end=END)
+        start = bars.index[0].tz_localize(None)
+        end = bars.index[-1].tz_localize(None) + np.timedelta64(1, 'm')
+        del bars
+
+        default, default_seconds, default_peak = run(symbol, provider, start, end, compact=False)
+        compact, compact_seconds, compact_peak = run(symbol, provider, start, end, compact=True)
+
+        var_diff = abs(compact.analysis_results['risk']['var_95'] -
+                       default.analysis_results['risk']['var_95'])
+        rsi_diff = abs(float(compact.analysis_results['technical']['rsi'].iloc[-1]) -
+                       float(default.analysis_results['technical']['rsi'].iloc[-1]))
+
+        for mode, analyzer, seconds, peak in (('default', default, default_seconds, default_peak),
+                                              ('compact', compact, compact_seconds, compact_peak)):
+            usage = analyzer.memory_usage()
+            diffs = (f"{'':>12} {'':>14}" if mode == 'default'
+                     else f"{var_diff:>12.2e} {rsi_diff:>14.2e}")
+            print(f"{symbol:<8} {mode:<8} {seconds:>8.2f} {peak / mb:>9.1f} "
+                  f"{usage['total'] / mb:>9.1f} {usage['data'] / mb:>9.1f} {diffs}")
+        del default, compact
+
+
+if __name__ == '__main__':
+    main()
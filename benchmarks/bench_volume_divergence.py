@@ -0,0 +1,89 @@
+"""Benchmark for VolumeAnalyzer.detect_volume_price_divergence.
+
+Compares the vectorized implementation against the original per-bar loop at
+10k, 100k and 1M bars and checks both return the same divergences.
+
+Usage: python benchmarks/bench_volume_divergence.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_components import VolumeAnalyzer
+
+
+def legacy_divergence(data: pd.DataFrame) -> List[Dict]:
+    """The original iloc loop, kept as the reference implementation"""
+    divergences = []
+
+    price_trend = data['Close'].rolling(window=5).mean().diff()
+    volume_trend = data['Volume'].rolling(window=5).mean().diff()
+
+    for i in range(len(data) - 1):
+        if price_trend.iloc[i] > 0 and volume_trend.iloc[i] < 0:
+            divergences.append({
+                'date': data.index[i],
+                'type': 'bearish',
+                'price': data['Close'].iloc[i],
+                'volume': data['Volume'].iloc[i]
+            })
+        elif price_trend.iloc[i] < 0 and volume_trend.iloc[i] > 0:
+            divergences.append({
+                'date': data.index[i],
+                'type': 'bullish',
+                'price': data['Close'].iloc[i],
+                'volume': data['Volume'].iloc[i]
+            })
+    return divergences
+
+
+def make_bars(n: int, seed: int = 42) -> pd.DataFrame:
+    """Random-walk 1-minute bars"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    volume = rng.integers(1_000, 100_000, n)
+    index = pd.date_range('2020-01-01 09:30', periods=n, freq='min')
+    return pd.DataFrame({'Close': close, 'Volume': volume}, index=index)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help='only time the vectorized implementation')
+    args = parser.parse_args()
+
+    analyzer = VolumeAnalyzer()
+    print(f"{'bars':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'compact (s)':>12} {'speedup':>9}")
+
+    for n in args.sizes:
+        data = make_bars(n)
+        fast, fast_time = timed(analyzer.detect_volume_price_divergence, data)
+        _, compact_time = timed(analyzer.detect_volume_price_divergence, data, compact=True)
+
+        if args.skip_legacy:
+            print(f"{n:>10} {'-':>12} {fast_time:>15.4f} {compact_time:>12.4f} {'-':>9}")
+            continue
+
+        slow, slow_time = timed(legacy_divergence, data)
+        if slow != fast:
+            raise AssertionError(f"Vectorized result differs from legacy loop at {n} bars")
+        print(f"{n:>10} {slow_time:>12.4f} {fast_time:>15.4f} {compact_time:>12.4f} "
+              f"{slow_time / fast_time:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
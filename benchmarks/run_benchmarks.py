@@ -0,0 +1,320 @@
+"""Benchmark suite for the analysis hot paths on seeded synthetic data.
+
+Times MarketAnalyzer.analyze_all, VolumeAnalyzer.detect_volume_price_divergence,
+PatternDetector.ma_crossover, RiskAnalyzer.analyze (plain and rolling),
+StockScreener screening, the multi-pair SMT divergence scan, Monte Carlo
+portfolio VaR and the screener figures over daily and 1-minute bars and over
+universes of many symbols. Each case
+records the best wall time of --repeat runs, the tracemalloc peak of one extra
+run and throughput in bars/sec, plus any case-specific figures such as the
+serialized size of the screener charts, and the results are written as JSON.
+
+Given --baseline, results are compared against a previous run and the script
+exits with status 1 if any case slowed down by more than --tolerance.
+
+Usage:
+    python benchmarks/run_benchmarks.py --profile quick --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --profile quick --baseline benchmarks/baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MarketAnalyzer import MarketAnalyzer
+from PatternDetector import PatternDetector
+from ScreenerVisualization import ScreenerVisualization
+from StockScreener import ScreenerConfig, StockScreener
+from analysis_components import RiskAnalyzer, VolumeAnalyzer
+from data_providers import SyntheticProvider
+from indicator_cache import indicator_cache, rolling_mean
+from panel_analysis import build_panel, screen_panel
+from portfolio_risk import PortfolioRiskEngine
+from rolling_risk import rolling_risk
+from signal_engine import smt_pairs
+
+SEED = 7
+# Far enough back for 10M one-minute bars
+ORIGIN = '1900-01-01'
+END = '2024-12-31'
+HISTORY_BARS = 63
+
+# (interval, bar counts) per profile for the single-symbol cases
+BAR_SIZES = {
+    'quick': [('1d', 1_000), ('1d', 10_000), ('1m', 100_000)],
+    'full': [('1d', 1_000), ('1d', 10_000), ('1m', 1_000), ('1m', 100_000),
+             ('1m', 1_000_000), ('1m', 10_000_000)],
+}
+UNIVERSE_SIZES = {
+    'quick': [10, 100],
+    'full': [10, 100, 1_000, 5_000],
+}
+
+
+@dataclass
+class Case:
+    """One benchmarked code path"""
+    name: str
+    kind: str  # 'bars' or 'universe'
+    run: Callable
+    max_size: Optional[int] = None
+    # Turns the generated data into the case's input, outside the timed runs
+    prepare: Optional[Callable] = None
+    # Extra result fields computed from the output of the last run
+    report: Optional[Callable] = None
+
+
+def _analyze_all(data: pd.DataFrame):
+    analyzer = MarketAnalyzer('SYN', None, None, '1d')
+    analyzer.data = data.copy()
+    return analyzer.analyze_all()
+
+
+def _divergence(data: pd.DataFrame):
+    return VolumeAnalyzer().detect_volume_price_divergence(data)
+
+
+def _divergence_compact(data: pd.DataFrame):
+    return VolumeAnalyzer().detect_volume_price_divergence(data, compact=True)
+
+
+def _ma_crossover(data: pd.DataFrame):
+    # Includes the 20/50 averages MarketAnalyzer.moving_averages adds first
+    data = data.copy()
+    data['20_avg'] = rolling_mean(data['Close'], 20)
+    data['50_avg'] = rolling_mean(data['Close'], 50)
+    return PatternDetector(data).ma_crossover()
+
+
+def _risk(data: pd.DataFrame):
+    return RiskAnalyzer().analyze(data)
+
+
+def _rolling_risk(data: pd.DataFrame):
+    return RiskAnalyzer(rolling_window=252).analyze(data)
+
+
+def _rolling_risk_panel(histories: Dict[str, pd.DataFrame]):
+    return rolling_risk(build_panel(histories, fields=['Close'])['Close'], window=20)
+
+
+def _portfolio_var(histories: Dict[str, pd.DataFrame]):
+    engine = PortfolioRiskEngine.from_histories(histories, seed=SEED, max_workers=1)
+    return engine.simulate({symbol: 10_000 for symbol in histories}, paths=100_000)
+
+
+def _screener(histories: Dict[str, pd.DataFrame]) -> StockScreener:
+    # Copies because _analyze_stock adds indicator columns to the frame it gets
+    return StockScreener(data_source=lambda symbol: histories[symbol].copy(),
+                         max_workers=8)
+
+
+def _screen_stocks(histories: Dict[str, pd.DataFrame]):
+    screener = _screener(histories)
+    results = list(screener.screen_stocks_iter(ScreenerConfig(), list(histories)))
+    return sorted(results, key=lambda x: x['score'], reverse=True)
+
+
+def _screen_panel(histories: Dict[str, pd.DataFrame]):
+    return _screener(histories).screen_panel(ScreenerConfig(), list(histories))
+
+
+def _smt_scan(histories: Dict[str, pd.DataFrame]):
+    # The last four symbols stand in for the SPY/QQQ/IWM/DIA benchmarks
+    symbols = list(histories)
+    closes = build_panel(histories, fields=['Close'])['Close']
+    return PatternDetector.scan_smt_divergence(closes, smt_pairs(symbols, symbols[-4:]))
+
+
+def _screen_result(histories: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    # No filters, so every symbol of the universe reaches the charts
+    return screen_panel(build_panel(histories), 0, float('inf'), 0)
+
+
+def _screener_figures(result: pd.DataFrame):
+    return [ScreenerVisualization.plot_opportunities(result),
+            ScreenerVisualization.create_indicator_heatmap(result),
+            ScreenerVisualization.plot_score_distribution(result)]
+
+
+def _figure_payload(figures) -> Dict:
+    # What Streamlit ships to the browser for each chart
+    return {'payload_kb': sum(len(figure.to_json()) for figure in figures) / 1024}
+
+
+CASES = [
+    # The list-of-dicts outputs grow with the bar count, so the full-object
+    # paths stop at 1M bars; the array paths run to 10M
+    Case('analyze_all', 'bars', _analyze_all, max_size=1_000_000),
+    Case('volume_divergence', 'bars', _divergence, max_size=1_000_000),
+    Case('volume_divergence_compact', 'bars', _divergence_compact),
+    Case('ma_crossover', 'bars', _ma_crossover),
+    Case('risk_analyze', 'bars', _risk),
+    Case('rolling_risk', 'bars', _rolling_risk),
+    Case('screen_stocks', 'universe', _screen_stocks),
+    Case('screen_panel', 'universe', _screen_panel),
+    Case('smt_scan', 'universe', _smt_scan),
+    Case('rolling_risk_panel', 'universe', _rolling_risk_panel),
+    Case('portfolio_var', 'universe', _portfolio_var),
+    Case('screener_figures', 'universe', _screener_figures,
+         prepare=_screen_result, report=_figure_payload),
+]
+
+
+def measure(func: Callable, arg, repeat: int) -> Tuple[float, float, object]:
+    """Best wall time over `repeat` runs, the peak traced memory in MB and the last output.
+
+    The indicator cache is cleared before every run so each one computes
+    from scratch, and the chatty print output of the analysis code is dropped.
+    """
+    sink = io.StringIO()
+    best = float('inf')
+    for _ in range(repeat):
+        indicator_cache.clear()
+        with contextlib.redirect_stdout(sink):
+            start = time.perf_counter()
+            func(arg)
+            best = min(best, time.perf_counter() - start)
+        sink.seek(0)
+        sink.truncate()
+
+    indicator_cache.clear()
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(sink):
+            output = func(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 2 ** 20, output
+
+
+def run_suite(profile: str, names: Optional[List[str]], repeat: int) -> List[Dict]:
+    provider = SyntheticProvider(seed=SEED, origin=ORIGIN)
+    cases = [case for case in CASES if names is None or case.name in names]
+    results = []
+
+    def record(case, interval, size, bars, arg):
+        if case.prepare is not None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                arg = case.prepare(arg)
+        seconds, peak_mb, output = measure(case.run, arg, repeat)
+        extra = case.report(output) if case.report is not None else {}
+        results.append({
+            'case': case.name,
+            'interval': interval,
+            'size': size,
+            'bars': bars,
+            'seconds': seconds,
+            'peak_mb': peak_mb,
+            'bars_per_sec': bars / seconds if seconds > 0 else float('inf'),
+            **extra
+        })
+        details = ''.join(f"  {key}={value:,.1f}" for key, value in extra.items())
+        print(f"{case.name:<26} {interval:>4} {size:>10,} {seconds:>10.4f} "
+              f"{peak_mb:>10.1f} {results[-1]['bars_per_sec']:>14,.0f}{details}")
+
+    print(f"{'case':<26} {'ivl':>4} {'size':>10} {'seconds':>10} {'peak MB':>10} {'bars/sec':>14}")
+
+    bar_cases = [case for case in cases if case.kind == 'bars']
+    for interval, size in BAR_SIZES[profile]:
+        todo = [case for case in bar_cases if case.max_size is None or size <= case.max_size]
+        if not todo:
+            continue
+        data = provider.generate_bars('SYN', size, interval, end=END)
+        for case in todo:
+            record(case, interval, size, len(data), data)
+        del data
+
+    universe_cases = [case for case in cases if case.kind == 'universe']
+    for size in UNIVERSE_SIZES[profile] if universe_cases else []:
+        histories = {f"S{i:04d}": provider.generate_bars(f"S{i:04d}", HISTORY_BARS, '1d', end=END)
+                     for i in range(size)}
+        bars = sum(len(hist) for hist in histories.values())
+        for case in universe_cases:
+            record(case, '1d', size, bars, histories)
+
+    return results
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float, min_delta: float) -> List[Dict]:
+    """Cases slower than the baseline by more than tolerance (and min_delta seconds)"""
+    previous = {(r['case'], r['interval'], r['size']): r for r in baseline['results']}
+    regressions = []
+
+    print(f"\n{'case':<26} {'ivl':>4} {'size':>10} {'baseline':>10} {'now':>10} {'change':>8}")
+    for result in results:
+        old = previous.get((result['case'], result['interval'], result['size']))
+        if old is None:
+            continue
+        change = result['seconds'] / old['seconds'] - 1 if old['seconds'] > 0 else 0.0
+        regressed = (change > tolerance and result['seconds'] - old['seconds'] > min_delta)
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{result['case']:<26} {result['interval']:>4} {result['size']:>10,} "
+              f"{old['seconds']:>10.4f} {result['seconds']:>10.4f} {change:>+7.0%}{flag}")
+        if regressed:
+            regressions.append({**result, 'baseline_seconds': old['seconds'], 'change': change})
+    return regressions
+
+
+def environment() -> Dict:
+    return {
+        'timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', choices=sorted(BAR_SIZES), default='quick',
+                        help='data sizes to run (full goes up to 10M bars and 5,000 symbols)')
+    parser.add_argument('--cases', nargs='+', choices=[case.name for case in CASES],
+                        help='only run these cases')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case (best is kept)')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='where to write this run')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--save-baseline', help='also write this run as a baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown before a case counts as a regression')
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help='ignore slowdowns smaller than this many seconds')
+    args = parser.parse_args()
+
+    results = run_suite(args.profile, args.cases, args.repeat)
+    report = {'profile': args.profile, 'environment': environment(), 'results': results}
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,419 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis_components import DIVERGENCE_BEARISH, DIVERGENCE_BULLISH
+from rolling_risk import percentile_lerp
+
+# Bars of history the widest rolling window (the 50-bar average) needs
+OVERLAP = 50
+
+# Top bits of the order-preserving float key used to bucket returns for VaR
+QUANTILE_BITS = 20
+
+
+def rechunk(frames: Iterable[pd.DataFrame], size: int) -> Iterator[pd.DataFrame]:
+    """Regroups a stream of bar frames into blocks of exactly `size` rows (the last may be short)"""
+    buffer, buffered = [], 0
+    for frame in frames:
+        while len(frame):
+            piece = frame.iloc[:size - buffered]
+            buffer.append(piece)
+            buffered += len(piece)
+            frame = frame.iloc[len(piece):]
+            if buffered == size:
+                yield buffer[0] if len(buffer) == 1 else pd.concat(buffer)
+                buffer, buffered = [], 0
+    if buffer:
+        yield buffer[0] if len(buffer) == 1 else pd.concat(buffer)
+
+
+class _Moments:
+    """Count, mean and sum of squared deviations merged block by block (Chan et al.)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        count = len(values)
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def std(self) -> float:
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+
+def _sort_keys(values: np.ndarray) -> np.ndarray:
+    """uint64 keys that sort in the same order as the float64 values"""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    return np.where(bits >> np.uint64(63), ~bits, bits | np.uint64(1 << 63))
+
+
+class _ExactQuantiles:
+    """Exact percentiles of a stream in two passes with bounded memory.
+
+    Pass one counts values per bucket of their order-preserving key; pass
+    two keeps only the values in the buckets that hold the needed ranks.
+    Results equal np.percentile(values, q) with the default linear method.
+    """
+
+    def __init__(self, percentiles: List[float]):
+        self.percentiles = percentiles
+        self.counts = np.zeros(1 << QUANTILE_BITS, dtype=np.int64)
+        self.shift = np.uint64(64 - QUANTILE_BITS)
+        self._ranks: Dict[float, tuple] = {}
+        self._kept: Dict[int, List[np.ndarray]] = {}
+
+    def count(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        self.counts += np.bincount((_sort_keys(values) >> self.shift).astype(np.int64),
+                                   minlength=len(self.counts))
+
+    def plan(self):
+        """Works out which buckets pass two has to keep"""
+        n = int(self.counts.sum())
+        if n == 0:
+            return
+        cumulative = np.cumsum(self.counts)
+        for percentile in self.percentiles:
+            q = np.true_divide(percentile, 100)
+            virtual = (n - 1) * q
+            below = np.floor(virtual)
+            gamma = virtual - below
+            ranks = (int(np.clip(below, 0, n - 1)), int(np.clip(below + 1, 0, n - 1)))
+            self._ranks[percentile] = (ranks, gamma)
+            for rank in ranks:
+                self._kept.setdefault(int(np.searchsorted(cumulative, rank, side='right')), [])
+        self._cumulative = cumulative
+
+    def collect(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        buckets = (_sort_keys(values) >> self.shift).astype(np.int64)
+        for bucket, kept in self._kept.items():
+            kept.append(values[buckets == bucket])
+
+    def result(self, percentile: float) -> float:
+        if percentile not in self._ranks:
+            return np.nan
+        (low, high), gamma = self._ranks[percentile]
+        values = []
+        for rank in (low, high):
+            bucket = int(np.searchsorted(self._cumulative, rank, side='right'))
+            first = self._cumulative[bucket - 1] if bucket else 0
+            values.append(np.sort(np.concatenate(self._kept[bucket]))[rank - first])
+        return percentile_lerp(values[0], values[1], gamma)
+
+
+def _ewm_continue(values: pd.Series, span: int, previous: Optional[float]) -> np.ndarray:
+    """ewm(span, adjust=False).mean() picking up from the previous block's last average"""
+    if previous is None:
+        return values.ewm(span=span, adjust=False).mean().to_numpy()
+    seeded = pd.concat([pd.Series([previous]), values], ignore_index=True)
+    return seeded.ewm(span=span, adjust=False).mean().to_numpy()[1:]
+
+
+@dataclass
+class ChunkedResult:
+    """Output of a chunked run; analysis_results is shaped like MarketAnalyzer.analyze_all's.
+
+    events holds the divergence and RSI signal bars as compact arrays;
+    trading_signals() expands them into get_trading_signals' dicts.
+    """
+    analysis_results: Dict
+    events: Dict[str, Dict[str, np.ndarray]]
+    derived: Optional[pd.DataFrame]
+    last_block: pd.DataFrame
+    bars: int = 0
+    chunks: int = 0
+    stats: Dict = field(default_factory=dict)
+
+    def trading_signals(self) -> List[Dict]:
+        divergence = self.events['divergence']
+        signals = [{'date': date,
+                    'type': f"Volume-Price {'bearish' if code == DIVERGENCE_BEARISH else 'bullish'} divergence",
+                    'price': price}
+                   for date, code, price in zip(divergence['date'].tolist(), divergence['type'].tolist(),
+                                                divergence['price'].tolist())]
+        for key, label in (('overbought', 'RSI Overbought'), ('oversold', 'RSI Oversold')):
+            events = self.events[key]
+            signals.extend({'date': date, 'type': label, 'price': price}
+                           for date, price in zip(events['date'], events['price'].tolist()))
+        return signals
+
+
+class ChunkedAnalysis:
+    """Runs the analysis components over a history streamed in fixed-size blocks.
+
+    Each block is processed together with the last OVERLAP bars of the one
+    before, so rolling windows continue across block edges; EWMs, VPT and the
+    running drawdown peak are carried as state. Risk statistics are merged
+    across blocks and VaR is exact (two passes over the source).
+
+    With collect=True the full indicator series are assembled at the end so
+    analysis_results matches analyze_all; with collect=False they cover only
+    the last block and working memory stays bounded by the block size no
+    matter how long the history is. Event lists (divergences, high volume
+    days, signals) are always kept in full.
+    """
+
+    def __init__(self, chunk_size: int = 100_000, collect: bool = True,
+                 compact_divergence: bool = False):
+        if chunk_size < OVERLAP:
+            raise ValueError(f"chunk_size must be at least {OVERLAP}")
+        self.chunk_size = chunk_size
+        self.collect = collect
+        self.compact_divergence = compact_divergence
+
+    def run(self, source: Callable[[], Iterable[pd.DataFrame]]) -> ChunkedResult:
+        """source() must return a fresh iterable of bar frames on each call; it is read twice"""
+        state = _FirstPass(self)
+        for block in rechunk(source(), self.chunk_size):
+            state.process(block)
+        if state.bars == 0:
+            raise ValueError("No data to analyze")
+        state.finish()
+
+        # Second pass: needs the overall volume mean/std and return quantiles
+        threshold = state.volume.mean + 2 * state.volume.std()
+        state.quantiles.plan()
+        high_volume_days = []
+        previous_close = None
+        for block in rechunk(source(), self.chunk_size):
+            close = block['Close'].to_numpy(dtype=float)
+            returns = _returns(close, previous_close)
+            previous_close = close[-1]
+            state.quantiles.collect(returns)
+            volume = block['Volume'].to_numpy(dtype=float)
+            high_volume_days.extend(block.index[volume > threshold].tolist())
+
+        return state.result(high_volume_days)
+
+
+def _returns(close: np.ndarray, previous_close: Optional[float]) -> np.ndarray:
+    """close.pct_change() for one block, continuing from the previous block's last close"""
+    before = np.empty(len(close))
+    before[0] = np.nan if previous_close is None else previous_close
+    before[1:] = close[:-1]
+    return close / before - 1
+
+
+class _FirstPass:
+    """State carried from block to block on the first pass"""
+
+    def __init__(self, options: ChunkedAnalysis):
+        self.options = options
+        self.tail: Optional[pd.DataFrame] = None
+        self.ema_fast = self.ema_slow = self.ema_signal = None
+        self.vpt = None
+        self.peak = -np.inf
+        self.max_drawdown = np.inf
+        self.volume = _Moments()
+        self.returns = _Moments()
+        # Same percentile arguments RiskAnalyzer.calculate_var passes
+        self.quantiles = _ExactQuantiles([(1 - 0.95) * 100, (1 - 0.99) * 100])
+        self.bars = 0
+        self.chunks = 0
+
+        self.pending_divergence = None
+        self.divergences: Dict[str, list] = {'date': [], 'type': [], 'price': [], 'volume': []}
+        self.rsi_events: Dict[str, Dict[str, list]] = {
+            'overbought': {'date': [], 'price': []},
+            'oversold': {'date': [], 'price': []}
+        }
+        self.series: Dict[str, List[np.ndarray]] = {}
+        self.indexes: List[pd.Index] = []
+        self.last_block = None
+
+    def process(self, block: pd.DataFrame):
+        frame = block if self.tail is None else pd.concat([self.tail, block])
+        k = len(frame) - len(block)
+        close = frame['Close'].astype(float)
+        volume = frame['Volume'].astype(float)
+        index = block.index
+
+        # Rolling windows, computed over tail + block like analyze_all computes them over everything
+        sma20 = close.rolling(window=20).mean()
+        std20 = close.rolling(window=20).std()
+        delta = close.diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+        rsi = (100 - (100 / (1 + gain / loss))).to_numpy()[k:]
+
+        outputs = {
+            '20_avg': sma20.to_numpy()[k:],
+            '50_avg': close.rolling(window=50).mean().to_numpy()[k:],
+            'volume_ma': volume.rolling(window=20).mean().to_numpy()[k:],
+            'rsi': rsi,
+            'bb_upper': (sma20 + (std20 * 2)).to_numpy()[k:],
+            'bb_middle': sma20.to_numpy()[k:],
+            'bb_lower': (sma20 - (std20 * 2)).to_numpy()[k:],
+        }
+
+        # EWMs carry their last value into the next block
+        block_close = close.iloc[k:].reset_index(drop=True)
+        fast = _ewm_continue(block_close, 12, self.ema_fast)
+        slow = _ewm_continue(block_close, 26, self.ema_slow)
+        macd = fast - slow
+        signal = _ewm_continue(pd.Series(macd), 9, self.ema_signal)
+        self.ema_fast, self.ema_slow, self.ema_signal = fast[-1], slow[-1], signal[-1]
+        outputs.update({'macd': macd, 'macd_signal': signal, 'macd_histogram': macd - signal})
+
+        # VPT is a running sum; seed it with the previous block's total
+        closes = close.to_numpy()
+        vpt_terms = (np.diff(closes, prepend=np.nan) / np.concatenate([[np.nan], closes[:-1]]) *
+                     volume.to_numpy())[k:]
+        if self.vpt is None:
+            vpt = pd.Series(vpt_terms).cumsum().to_numpy()
+        else:
+            vpt = pd.Series(np.concatenate([[self.vpt], vpt_terms])).cumsum().to_numpy()[1:]
+        self.vpt = vpt[-1]
+        outputs['vpt'] = vpt
+
+        # Risk statistics
+        block_closes = closes[k:]
+        returns = _returns(block_closes, closes[k - 1] if k else None)
+        self.returns.add(returns)
+        self.quantiles.count(returns)
+        self.volume.add(volume.to_numpy()[k:])
+        running_peak = np.fmax.accumulate(np.concatenate([[self.peak], block_closes]))[1:]
+        self.peak = running_peak[-1]
+        self.max_drawdown = min(self.max_drawdown, np.nanmin(block_closes / running_peak - 1))
+
+        self._divergences(close, volume, k, index, block)
+        self._rsi_events(rsi, index, block_closes)
+
+        self.bars += len(block)
+        self.chunks += 1
+        self.tail = block.iloc[-OVERLAP:]
+        if self.options.collect:
+            self.indexes.append(index)
+            for name, values in outputs.items():
+                self.series.setdefault(name, []).append(values)
+        self.last_block = block.assign(**{name: outputs[name] for name in
+                                          ('20_avg', '50_avg', 'volume_ma', 'vpt')})
+        self.last_outputs = outputs
+
+    def _divergences(self, close, volume, k, index, block):
+        price_trend = close.rolling(window=5).mean().diff().to_numpy()[k:]
+        volume_trend = volume.rolling(window=5).mean().diff().to_numpy()[k:]
+        bearish = (price_trend > 0) & (volume_trend < 0)
+        bullish = (price_trend < 0) & (volume_trend > 0)
+
+        # The series' final bar never counts, so each block's last bar waits
+        # until the next block shows it was not the final one
+        if self.pending_divergence is not None:
+            for key, value in self.pending_divergence.items():
+                self.divergences[key].append(value)
+
+        positions = np.flatnonzero(bearish | bullish)
+        last = len(block) - 1
+        self.pending_divergence = None
+        if len(positions) and positions[-1] == last:
+            self.pending_divergence = {
+                'date': index[last:],
+                'type': np.where(bearish[last:], DIVERGENCE_BEARISH, DIVERGENCE_BULLISH).astype(np.int8),
+                'price': block['Close'].to_numpy()[last:],
+                'volume': block['Volume'].to_numpy()[last:]
+            }
+            positions = positions[:-1]
+
+        self.divergences['date'].append(index[positions])
+        self.divergences['type'].append(
+            np.where(bearish[positions], DIVERGENCE_BEARISH, DIVERGENCE_BULLISH).astype(np.int8))
+        self.divergences['price'].append(block['Close'].to_numpy()[positions])
+        self.divergences['volume'].append(block['Volume'].to_numpy()[positions])
+
+    def _rsi_events(self, rsi, index, closes):
+        for key, mask in (('overbought', rsi > 70), ('oversold', rsi < 30)):
+            positions = np.flatnonzero(mask)
+            self.rsi_events[key]['date'].append(index[positions])
+            self.rsi_events[key]['price'].append(closes[positions])
+
+    def finish(self):
+        """Drops the held-back last bar: it is the final bar of the series"""
+        self.pending_divergence = None
+
+    def _series(self, name: str, index: pd.Index) -> pd.Series:
+        if self.options.collect:
+            values = np.concatenate(self.series[name])
+        else:
+            values = self.last_outputs[name]
+        return pd.Series(values, index=index, name=name)
+
+    def result(self, high_volume_days: List) -> ChunkedResult:
+        if self.options.collect:
+            index = self.indexes[0].append(self.indexes[1:]) if len(self.indexes) > 1 else self.indexes[0]
+        else:
+            index = self.last_block.index
+
+        first_index = self.divergences['date'][0]
+        dates = first_index.append(self.divergences['date'][1:])
+        codes = np.concatenate(self.divergences['type'])
+        prices = np.concatenate(self.divergences['price'])
+        volumes = np.concatenate(self.divergences['volume'])
+        if self.options.compact_divergence:
+            divergence = {'date': dates, 'type': codes, 'price': prices, 'volume': volumes}
+        else:
+            divergence = [{
+                'date': date,
+                'type': 'bearish' if code == DIVERGENCE_BEARISH else 'bullish',
+                'price': price,
+                'volume': volume
+            } for date, code, price, volume in zip(dates.tolist(), codes.tolist(),
+                                                   prices.tolist(), volumes.tolist())]
+
+        analysis_results = {
+            'volume': {
+                'high_volume_days': high_volume_days,
+                'volume_price_divergence': divergence
+            },
+            'technical': {
+                'rsi': self._series('rsi', index),
+                'bollinger_bands': {
+                    'upper': self._series('bb_upper', index),
+                    'middle': self._series('bb_middle', index),
+                    'lower': self._series('bb_lower', index)
+                },
+                'macd': {
+                    'macd': self._series('macd', index),
+                    'signal': self._series('macd_signal', index),
+                    'histogram': self._series('macd_histogram', index)
+                }
+            },
+            'risk': {
+                'volatility': self.returns.std() * np.sqrt(252),
+                'var_95': self.quantiles.result((1 - 0.95) * 100),
+                'var_99': self.quantiles.result((1 - 0.99) * 100),
+                'max_drawdown': self.max_drawdown
+            }
+        }
+
+        events = {'divergence': {'date': dates, 'type': codes, 'price': prices, 'volume': volumes}}
+        for key, found in self.rsi_events.items():
+            events[key] = {'date': found['date'][0].append(found['date'][1:]),
+                           'price': np.concatenate(found['price'])}
+
+        derived = None
+        if self.options.collect:
+            derived = pd.DataFrame({name: np.concatenate(self.series[name])
+                                    for name in ('20_avg', '50_avg', 'volume_ma', 'vpt')}, index=index)
+
+        return ChunkedResult(analysis_results=analysis_results, events=events, derived=derived,
+                             last_block=self.last_block, bars=self.bars, chunks=self.chunks,
+                             stats={'chunk_size': self.options.chunk_size,
+                                    'var_bucket_values': sum(len(v) for kept in
+                                                             self.quantiles._kept.values()
+                                                             for v in kept)})
@@ -0,0 +1,82 @@
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+UINT32_MAX = np.iinfo(np.uint32).max
+
+
+def downcast_ohlcv(data: pd.DataFrame, rtol: float = 1e-6) -> pd.DataFrame:
+    """Copy of a bar frame stored in the narrowest dtypes that keep its values.
+
+    Float columns become float32 when every value round-trips within rtol
+    (prices have far fewer significant digits than float32 keeps). Volume
+    becomes uint32 when it is whole, non-negative and small enough, and
+    float32 otherwise if the tolerance allows. Anything else is left alone.
+    """
+    columns = {}
+    for name in data.columns:
+        values = data[name].to_numpy()
+        columns[name] = values
+
+        if not np.issubdtype(values.dtype, np.number) or values.dtype.itemsize <= 4:
+            continue
+
+        if name == 'Volume' and len(values) and not np.isnan(values).any():
+            if values.min() >= 0 and values.max() <= UINT32_MAX and \
+                    np.array_equal(values, np.round(values)):
+                columns[name] = values.astype(np.uint32)
+                continue
+
+        narrow = values.astype(np.float32)
+        with np.errstate(invalid='ignore'):
+            if np.allclose(narrow, values, rtol=rtol, atol=0, equal_nan=True):
+                columns[name] = narrow
+
+    return pd.DataFrame(columns, index=data.index)
+
+
+def to_float32(value):
+    """Series (or dict of Series) as float32; other values are returned unchanged"""
+    if isinstance(value, pd.Series) and np.issubdtype(value.dtype, np.floating):
+        return value.astype(np.float32, copy=False)
+    if isinstance(value, dict):
+        return {key: to_float32(item) for key, item in value.items()}
+    return value
+
+
+class LazyResults(Mapping):
+    """Read-only mapping whose values are computed on first access and then kept.
+
+    Behaves like the plain dicts the analysis components return, so callers
+    indexing results['rsi'] only pay for the indicators they actually read.
+    """
+
+    def __init__(self, factories: Dict[str, Callable[[], object]],
+                 values: Optional[Dict[str, object]] = None):
+        self._factories = dict(factories)
+        self._values = dict(values or {})
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            self._values[key] = self._factories[key]()
+        return self._values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._values
+        yield from (key for key in self._factories if key not in self._values)
+
+    def __len__(self) -> int:
+        return len(self._factories.keys() | self._values.keys())
+
+    def __contains__(self, key) -> bool:
+        return key in self._values or key in self._factories
+
+    def materialized(self) -> Dict[str, object]:
+        """The values computed so far"""
+        return dict(self._values)
+
+    def __repr__(self):
+        pending = [key for key in self._factories if key not in self._values]
+        return f"LazyResults(computed={list(self._values)}, pending={pending})"
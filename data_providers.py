@@ -0,0 +1,378 @@
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from bar_cache import EXCHANGE_TZ
+
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Bars per regular session for intraday intervals
+INTRADAY_MINUTES = {'1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30,
+                    '60m': 60, '90m': 90, '1h': 60}
+SESSION_MINUTES = 390
+
+
+def exchange_now() -> pd.Timestamp:
+    """Current time as a naive timestamp in exchange local time"""
+    return pd.Timestamp.now(tz=EXCHANGE_TZ).tz_localize(None)
+
+
+def period_to_range(period: str, now: Optional[pd.Timestamp] = None) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """Turns a yfinance-style period ('5d', '3mo', '1y', 'ytd', 'max') into [start, end)"""
+    now = exchange_now() if now is None else pd.Timestamp(now)
+    end = now.normalize() + pd.Timedelta(days=1)
+    today = now.normalize()
+
+    if period == 'max':
+        return pd.Timestamp('1970-01-01'), end
+    if period == 'ytd':
+        return pd.Timestamp(year=today.year, month=1, day=1), end
+
+    for suffix, offset in (('mo', lambda n: pd.DateOffset(months=n)),
+                           ('wk', lambda n: pd.DateOffset(weeks=n)),
+                           ('y', lambda n: pd.DateOffset(years=n)),
+                           ('d', lambda n: pd.DateOffset(days=n))):
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return today - offset(int(period[:-len(suffix)])), end
+
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def slice_bars(data: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+    """Bars in [start, end); naive bounds are read as exchange local time"""
+    if data.empty:
+        return data
+    mask = np.ones(len(data), dtype=bool)
+    tz = getattr(data.index, 'tz', None)
+    for bound, is_start in ((start, True), (end, False)):
+        if bound is None:
+            continue
+        bound = pd.Timestamp(bound)
+        if tz is not None:
+            bound = bound.tz_localize(EXCHANGE_TZ) if bound.tzinfo is None else bound
+            bound = bound.tz_convert(tz)
+        elif bound.tzinfo is not None:
+            bound = bound.tz_convert(EXCHANGE_TZ).tz_localize(None)
+        mask &= (data.index >= bound) if is_start else (data.index < bound)
+    return data[mask]
+
+
+class DataProvider(ABC):
+    """Source of OHLCV bars shaped like yf.Ticker(...).history() output"""
+
+    @abstractmethod
+    def get_history(self, symbol: str, start=None, end=None, interval: str = '1d',
+                    period: Optional[str] = None) -> pd.DataFrame:
+        """Bars for [start, end), or for `period` when no range is given"""
+
+    def get_bulk_history(self, symbols: List[str], start=None, end=None, interval: str = '1d',
+                         period: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+        """Bars for many symbols; symbols with no data are left out"""
+        histories = {}
+        for symbol in symbols:
+            data = self.get_history(symbol, start, end, interval, period)
+            if data is not None and not data.empty:
+                histories[symbol] = data
+        return histories
+
+    def iter_history(self, symbol: str, start=None, end=None, interval: str = '1d',
+                     window_days: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Bars for [start, end) as consecutive calendar windows, oldest first.
+
+        Lets long intraday histories be processed without holding them in
+        memory at once. Intraday intervals default to 7-day windows (the
+        most Yahoo serves per 1-minute request), daily ones to 10 years.
+        """
+        if start is None:
+            raise ValueError("iter_history needs a start date")
+        window = pd.Timedelta(days=window_days or (7 if interval in INTRADAY_MINUTES else 3650))
+        start = _naive(pd.Timestamp(start))
+        end = exchange_now().normalize() + pd.Timedelta(days=1) if end is None else _naive(pd.Timestamp(end))
+
+        while start < end:
+            stop = min(start + window, end)
+            data = self.get_history(symbol, start, stop, interval)
+            if data is not None and not data.empty:
+                yield data
+            start = stop
+
+
+class YFinanceProvider(DataProvider):
+    """Yahoo Finance through yfinance"""
+
+    def __init__(self, timeout: float = 10, max_workers: int = 8):
+        self.timeout = timeout
+        self.max_workers = max_workers
+
+    def get_history(self, symbol, start=None, end=None, interval='1d', period=None):
+        ticker = yf.Ticker(symbol)
+        if start is None and end is None:
+            return ticker.history(period=period or '1mo', interval=interval, timeout=self.timeout)
+        return ticker.history(start=start, end=end, interval=interval, timeout=self.timeout)
+
+    def get_bulk_history(self, symbols, start=None, end=None, interval='1d', period=None):
+        """One yf.download call for the whole list"""
+        if not symbols:
+            return {}
+        kwargs = {'interval': interval, 'group_by': 'ticker', 'auto_adjust': True,
+                  'ignore_tz': False, 'threads': self.max_workers, 'progress': False,
+                  'timeout': self.timeout}
+        if start is None and end is None:
+            kwargs['period'] = period or '1mo'
+        else:
+            kwargs['start'], kwargs['end'] = start, end
+
+        raw = yf.download(list(symbols), **kwargs)
+        if raw.empty:
+            return {}
+
+        histories = {}
+        for symbol in symbols:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if symbol not in raw.columns.get_level_values(0):
+                    continue
+                data = raw[symbol]
+            else:
+                data = raw
+            data = data.dropna(how='all')
+            if not data.empty:
+                histories[symbol] = data
+        return histories
+
+
+class FileArchiveProvider(DataProvider):
+    """Replays bars from a local archive of Parquet or CSV files.
+
+    Files are looked up as <root>/<interval>/<SYMBOL>.parquet (or .csv),
+    falling back to <root>/<SYMBOL>.parquet. Periods are measured back from
+    the last bar in the file so replayed archives behave the same any day.
+    """
+
+    def __init__(self, root: str, max_workers: int = 8):
+        self.root = Path(root)
+        self.max_workers = max_workers
+
+    def _path(self, symbol: str, interval: str) -> Optional[Path]:
+        for folder in (self.root / interval, self.root):
+            for ext in ('.parquet', '.csv'):
+                path = folder / f"{symbol}{ext}"
+                if path.exists():
+                    return path
+        return None
+
+    def _read(self, path: Path) -> pd.DataFrame:
+        if path.suffix == '.parquet':
+            return pd.read_parquet(path)
+        data = pd.read_csv(path, index_col=0)
+        data.index = pd.to_datetime(data.index, utc=True).tz_convert(EXCHANGE_TZ)
+        return data
+
+    def get_history(self, symbol, start=None, end=None, interval='1d', period=None):
+        path = self._path(symbol, interval)
+        if path is None:
+            return pd.DataFrame(columns=OHLCV)
+
+        data = self._read(path).sort_index()
+        if start is None and end is None and period and not data.empty:
+            last = data.index[-1]
+            last = last.tz_convert(EXCHANGE_TZ).tz_localize(None) if last.tzinfo else last
+            start, end = period_to_range(period, now=last)
+        return slice_bars(data, start, end)
+
+    def get_bulk_history(self, symbols, start=None, end=None, interval='1d', period=None):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            frames = executor.map(lambda s: self.get_history(s, start, end, interval, period), symbols)
+            return {symbol: data for symbol, data in zip(symbols, frames) if not data.empty}
+
+    def iter_history(self, symbol, start=None, end=None, interval='1d', window_days=None,
+                     batch_rows: int = 100_000):
+        """Streams the archive file in row batches instead of loading it whole"""
+        path = self._path(symbol, interval)
+        if path is None:
+            return
+
+        if path.suffix == '.parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            parquet = pq.ParquetFile(path)
+            schema = parquet.schema_arrow
+            batches = (pa.Table.from_batches([batch], schema=schema).to_pandas()
+                       for batch in parquet.iter_batches(batch_size=batch_rows))
+        else:
+            batches = pd.read_csv(path, index_col=0, chunksize=batch_rows)
+
+        for batch in batches:
+            if path.suffix != '.parquet':
+                batch.index = pd.to_datetime(batch.index, utc=True).tz_convert(EXCHANGE_TZ)
+            data = slice_bars(batch, start, end)
+            if not data.empty:
+                yield data
+
+    def save(self, symbol: str, data: pd.DataFrame, interval: str = '1d'):
+        """Writes bars into the archive layout this provider reads"""
+        folder = self.root / interval
+        folder.mkdir(parents=True, exist_ok=True)
+        data.to_parquet(folder / f"{symbol}.parquet")
+
+
+class SyntheticProvider(DataProvider):
+    """Seeded random-walk OHLCV bars for offline runs and load tests.
+
+    Bars are a pure function of (seed, symbol, interval, timestamp), so any
+    two overlapping requests agree on the bars they share. Daily closes follow
+    a slowly mean-reverting log random walk from a fixed origin date, which
+    keeps prices in a realistic range over long spans; intraday bars are a
+    Brownian bridge between consecutive daily closes, generated day by day.
+    """
+
+    def __init__(self, seed: int = 0, origin: str = '1990-01-01',
+                 annual_volatility: float = 0.30, reversion_years: float = 5.0):
+        self.seed = seed
+        self.origin = pd.Timestamp(origin)
+        self.daily_volatility = annual_volatility / np.sqrt(252)
+        self.reversion = 1 / (reversion_years * 252)
+
+    def _rng(self, symbol: str, *stream: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, zlib.crc32(symbol.encode()), *stream])
+
+    def _daily_path(self, symbol: str, last_day: pd.Timestamp):
+        """Business days from the origin to last_day with their OHLCV arrays.
+
+        Every array comes from its own random stream, so the first k values
+        do not depend on how far the path is extended.
+        """
+        days = _business_days(self.origin, last_day)
+        n = len(days)
+
+        levels = self._rng(symbol, 0, 0).random(2)
+        base = 10 + levels[0] * 190
+        volume_level = 10 ** (5 + levels[1] * 2.5)
+        shocks = self._rng(symbol, 0, 1).normal(0, self.daily_volatility, n)
+        gaps = self._rng(symbol, 0, 2).normal(0, self.daily_volatility / 4, n)
+        wicks = np.abs(self._rng(symbol, 0, 3).normal(0, self.daily_volatility / 2, (n, 2)))
+        volume = volume_level * self._rng(symbol, 0, 4).lognormal(0, 0.4, n)
+
+        # AR(1) log deviation from the base level: x_t = (1 - k) x_{t-1} + e_t,
+        # which is exactly an adjust=False EWM of e / k
+        deviation = pd.Series(shocks / self.reversion).ewm(alpha=self.reversion, adjust=False).mean()
+        close = base * np.exp(deviation.to_numpy())
+
+        open_ = np.empty(n)
+        open_[0] = base
+        open_[1:] = close[:-1]
+        open_ *= np.exp(gaps)
+        high = np.maximum(open_, close) * np.exp(wicks[:, 0])
+        low = np.minimum(open_, close) * np.exp(-wicks[:, 1])
+        return days, open_, high, low, close, volume
+
+    def get_history(self, symbol, start=None, end=None, interval='1d', period=None):
+        if start is None and end is None:
+            start, end = period_to_range(period or '1mo')
+        start = self.origin if start is None else pd.Timestamp(start)
+        end = exchange_now() if end is None else pd.Timestamp(end)
+        if start.tzinfo is not None:
+            start = start.tz_convert(EXCHANGE_TZ).tz_localize(None)
+        if end.tzinfo is not None:
+            end = end.tz_convert(EXCHANGE_TZ).tz_localize(None)
+        start = max(start, self.origin)
+        if end <= start:
+            return pd.DataFrame(columns=OHLCV)
+
+        days, open_, high, low, close, volume = self._daily_path(symbol, end.normalize())
+        if interval in INTRADAY_MINUTES:
+            data = self._intraday(symbol, days, open_, close, volume, interval, start, end)
+        else:
+            data = pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close,
+                                 'Volume': volume.round()},
+                                index=days.tz_localize(EXCHANGE_TZ))
+            if interval not in ('1d', '5d'):
+                data = _resample(data, interval)
+        data.index.name = 'Date' if interval not in INTRADAY_MINUTES else 'Datetime'
+        return slice_bars(data, start, end)
+
+    def generate_bars(self, symbol: str, n_bars: int, interval: str = '1d',
+                      end: Optional[str] = None) -> pd.DataFrame:
+        """Exactly n_bars bars ending before `end` (default: today)"""
+        end = exchange_now().normalize() if end is None else pd.Timestamp(end)
+        per_day = SESSION_MINUTES // INTRADAY_MINUTES[interval] if interval in INTRADAY_MINUTES else 1
+        days_needed = -(-n_bars // per_day) + 1
+        start = end - pd.offsets.BDay(days_needed - 1) if days_needed > 1 else end
+        if start < self.origin:
+            raise ValueError(f"{n_bars} {interval} bars reach back past the origin "
+                             f"{self.origin.date()}; use an earlier origin")
+        return self.get_history(symbol, start, end, interval).iloc[-n_bars:]
+
+    def _intraday(self, symbol, days, open_, close, volume, interval, start, end):
+        step = INTRADAY_MINUTES[interval]
+        per_day = SESSION_MINUTES // step
+        offsets = pd.to_timedelta(9 * 60 + 30 + step * np.arange(per_day), unit='min')
+
+        first = max(0, days.searchsorted(start.normalize()))
+        last = days.searchsorted(end.normalize(), side='right')
+        day_positions = np.arange(first, last)
+        if len(day_positions) == 0:
+            return pd.DataFrame(columns=OHLCV)
+
+        # Volume follows the usual U-shape across the session
+        shape = 1 + 1.5 * ((np.arange(per_day) - per_day / 2) / (per_day / 2)) ** 2
+        shape /= shape.sum()
+
+        prices = np.empty((len(day_positions), per_day + 1))
+        noise = np.empty((len(day_positions), per_day, 3))
+        for row, day in enumerate(day_positions):
+            rng = self._rng(symbol, 1, int(day))
+            steps = rng.normal(0, 1, per_day)
+            walk = np.concatenate([[0.0], np.cumsum(steps)])
+            # Bridge the walk so it runs from the open to the daily close
+            bridge = walk - np.linspace(0, 1, per_day + 1) * walk[-1]
+            scale = self.daily_volatility / np.sqrt(per_day)
+            log_path = np.log(open_[day]) + np.linspace(0, 1, per_day + 1) * np.log(close[day] / open_[day])
+            prices[row] = np.exp(log_path + bridge * scale)
+            noise[row] = rng.random((per_day, 3))
+
+        bar_open = prices[:, :-1]
+        bar_close = prices[:, 1:]
+        wick = self.daily_volatility / np.sqrt(per_day) * noise[..., :2]
+        bar_high = np.maximum(bar_open, bar_close) * np.exp(wick[..., 0])
+        bar_low = np.minimum(bar_open, bar_close) * np.exp(-wick[..., 1])
+        bar_volume = volume[day_positions, None] * shape[None, :] * (0.5 + noise[..., 2])
+
+        index = (days[day_positions].repeat(per_day) + np.tile(offsets, len(day_positions)))
+        return pd.DataFrame({
+            'Open': bar_open.ravel(),
+            'High': bar_high.ravel(),
+            'Low': bar_low.ravel(),
+            'Close': bar_close.ravel(),
+            'Volume': bar_volume.ravel().round()
+        }, index=index.tz_localize(EXCHANGE_TZ))
+
+    def get_bulk_history(self, symbols, start=None, end=None, interval='1d', period=None):
+        return {symbol: self.get_history(symbol, start, end, interval, period) for symbol in symbols}
+
+
+def _naive(timestamp: pd.Timestamp) -> pd.Timestamp:
+    if timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.tz_convert(EXCHANGE_TZ).tz_localize(None)
+
+
+def _business_days(start: pd.Timestamp, end: pd.Timestamp) -> pd.DatetimeIndex:
+    """Mon-Fri dates in [start, end]; much faster than pd.bdate_range for long spans"""
+    dates = np.arange(start.normalize().to_datetime64().astype('datetime64[D]'),
+                      end.normalize().to_datetime64().astype('datetime64[D]') + 1)
+    return pd.DatetimeIndex(dates[np.is_busday(dates)].astype('datetime64[ns]'))
+
+
+def _resample(data: pd.DataFrame, interval: str) -> pd.DataFrame:
+    rule = {'1wk': 'W-FRI', '1mo': 'MS', '3mo': 'QS'}.get(interval)
+    if rule is None:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return data.resample(rule).agg({'Open': 'first', 'High': 'max', 'Low': 'min',
+                                    'Close': 'last', 'Volume': 'sum'}).dropna()
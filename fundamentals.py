@@ -0,0 +1,219 @@
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from bar_cache import write_parquet
+from rate_limit import TokenBucket
+
+FUNDAMENTAL_COLUMNS = ['market_cap', 'shares_outstanding', 'sector', 'fetched_at']
+
+SECTORS = ['Technology', 'Healthcare', 'Financial Services', 'Consumer Cyclical',
+           'Communication Services', 'Industrials', 'Consumer Defensive', 'Energy',
+           'Utilities', 'Real Estate', 'Basic Materials']
+
+
+class FundamentalsSource(ABC):
+    """Source of slow-changing per-symbol metadata"""
+
+    @abstractmethod
+    def get_fundamentals(self, symbols: List[str],
+                         rate_limiter: Optional[TokenBucket] = None) -> pd.DataFrame:
+        """Frame indexed by symbol with market_cap, shares_outstanding and sector.
+
+        Values the source does not have are NaN. Symbols whose fetch failed
+        are left out, so the store asks for them again on its next refresh.
+        Requests to the upstream take a token from rate_limiter first.
+        """
+
+
+class YFinanceFundamentals(FundamentalsSource):
+    """Yahoo Finance metadata through yfinance.
+
+    yfinance has no multi-symbol metadata call, so this costs one request
+    per symbol: shares outstanding from Ticker.fast_info. Market cap is left
+    to FundamentalsStore.market_caps (shares times the current price), which
+    saves fast_info's extra price request. The sector needs the much slower
+    Ticker.info request, so it is only fetched with sectors=True.
+    """
+
+    def __init__(self, max_workers: int = 8, sectors: bool = False):
+        self.max_workers = max_workers
+        self.sectors = sectors
+
+    def _fetch(self, symbol: str, rate_limiter: Optional[TokenBucket]):
+        try:
+            ticker = yf.Ticker(symbol)
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            shares = ticker.fast_info.shares
+            sector = None
+            if self.sectors:
+                if rate_limiter is not None:
+                    rate_limiter.acquire()
+                sector = ticker.info.get('sector')
+            return np.nan, shares if shares is not None else np.nan, sector
+        except Exception as e:
+            print(f"Error fetching fundamentals for {symbol}: {str(e)}")
+            return None
+
+    def get_fundamentals(self, symbols, rate_limiter=None):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            rows = list(executor.map(lambda symbol: self._fetch(symbol, rate_limiter), symbols))
+        fetched = [(symbol, row) for symbol, row in zip(symbols, rows) if row is not None]
+        return pd.DataFrame([row for _, row in fetched],
+                            index=pd.Index([symbol for symbol, _ in fetched], name='symbol'),
+                            columns=['market_cap', 'shares_outstanding', 'sector'])
+
+
+class SyntheticFundamentals(FundamentalsSource):
+    """Seeded shares outstanding and sectors for offline runs.
+
+    Market cap is left to FundamentalsStore.market_caps, which multiplies
+    the shares by whatever prices the caller has (e.g. SyntheticProvider bars).
+    """
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+
+    def get_fundamentals(self, symbols, rate_limiter=None):
+        shares, sectors = [], []
+        for symbol in symbols:
+            rng = np.random.default_rng([self.seed, zlib.crc32(symbol.encode()), 1])
+            shares.append(round(10 ** (6.5 + rng.random() * 3.5)))
+            sectors.append(SECTORS[rng.integers(len(SECTORS))])
+        return pd.DataFrame({'market_cap': np.nan, 'shares_outstanding': shares,
+                             'sector': sectors}, index=pd.Index(symbols, name='symbol'))
+
+
+class FundamentalsStore:
+    """Local table of market cap, shares outstanding and sector per symbol.
+
+    Filled in batches from a FundamentalsSource and kept as a Parquet file.
+    Rows older than max_age (a day by default) are fetched again on the next
+    refresh; everything else is served from the table, so screening reads
+    these values as whole columns without any request. Symbols whose fetch
+    failed keep their previous row, or none, and are retried next refresh.
+    """
+
+    def __init__(self, path: Optional[str] = None, source: Optional[FundamentalsSource] = None,
+                 max_age: float = 86400, batch_size: int = 500,
+                 rate_limiter: Optional[TokenBucket] = None):
+        self.path = Path(path) if path else None
+        self.source = source or YFinanceFundamentals()
+        self.max_age = max_age
+        self.batch_size = batch_size
+        # Shared with the rest of the app's requests to the same upstream
+        self.rate_limiter = rate_limiter
+        self._lock = threading.Lock()
+        self._refreshing: Optional[threading.Thread] = None
+        self.table = self._load()
+
+    def __len__(self):
+        return len(self.table)
+
+    def _load(self) -> pd.DataFrame:
+        empty = pd.DataFrame({'market_cap': pd.Series(dtype=float),
+                              'shares_outstanding': pd.Series(dtype=float),
+                              'sector': pd.Series(dtype=object),
+                              'fetched_at': pd.Series(dtype=float)})
+        empty.index.name = 'symbol'
+        if self.path is None or not self.path.exists():
+            return empty
+        try:
+            return pd.read_parquet(self.path)
+        except Exception as e:
+            print(f"Discarding unreadable fundamentals file {self.path}: {str(e)}")
+            return empty
+
+    def save(self):
+        """Writes the table to its file, if it has one"""
+        if self.path is None:
+            return
+        with self._lock:
+            write_parquet(self.table, self.path)
+
+    def stale(self, symbols: Iterable[str], now: Optional[float] = None) -> List[str]:
+        """Symbols with no row or a row older than max_age"""
+        now = time.time() if now is None else now
+        fetched_at = self.table['fetched_at'].reindex(pd.Index(list(symbols)))
+        stale = fetched_at.isna() | (now - fetched_at > self.max_age)
+        return list(fetched_at.index[stale.to_numpy()])
+
+    def refresh(self, symbols: Iterable[str]) -> int:
+        """Fetches the stale rows of symbols in batches; returns how many were asked for"""
+        stale = self.stale(symbols)
+        for i in range(0, len(stale), self.batch_size):
+            batch = stale[i:i + self.batch_size]
+            fetched = self.source.get_fundamentals(batch, self.rate_limiter)
+            # Only rows the source returned are stamped; failed symbols stay stale
+            fetched = fetched[fetched.index.isin(batch)].copy()
+            fetched['fetched_at'] = time.time()
+            with self._lock:
+                kept = self.table[~self.table.index.isin(fetched.index)]
+                update = fetched.reindex(columns=FUNDAMENTAL_COLUMNS)
+                self.table = pd.concat([kept, update]) if len(kept) else update
+        if stale:
+            self.save()
+        return len(stale)
+
+    def refresh_for_screen(self, symbols: Iterable[str]) -> int:
+        """Refresh that keeps a screen waiting only for symbols it has no row for.
+
+        Those are fetched now, so their market caps can be enforced; rows
+        that merely aged past max_age are re-fetched on a background thread
+        while the screen uses their current values. Returns how many symbols
+        were fetched before returning.
+        """
+        symbols = list(symbols)
+        missing = [symbol for symbol in symbols if symbol not in self.table.index]
+        fetched = self.refresh(missing) if missing else 0
+
+        if self.stale(symbols) and (self._refreshing is None or not self._refreshing.is_alive()):
+            self._refreshing = threading.Thread(target=self._refresh_quietly, args=(symbols,),
+                                                daemon=True)
+            self._refreshing.start()
+        return fetched
+
+    def _refresh_quietly(self, symbols: List[str]):
+        try:
+            self.refresh(symbols)
+        except Exception as e:
+            print(f"Error refreshing fundamentals: {str(e)}")
+
+    def column(self, name: str, symbols: Iterable[str]) -> pd.Series:
+        """One column for symbols, in their order; unknown symbols are NaN"""
+        return self.table[name].reindex(pd.Index(list(symbols)))
+
+    def market_caps(self, symbols: Iterable[str], prices=None) -> pd.Series:
+        """Market cap of each symbol, NaN where unknown.
+
+        Given current prices (a Series by symbol, or an array aligned with
+        symbols), shares outstanding times price is used wherever both are
+        known, which keeps market caps current between refreshes; the stored
+        market cap fills the rest.
+        """
+        symbols = list(symbols)
+        stored = self.column('market_cap', symbols)
+        if prices is None:
+            return stored
+        if isinstance(prices, pd.Series):
+            prices = prices.reindex(stored.index)
+        current = self.column('shares_outstanding', symbols).to_numpy(dtype=float) * \
+            np.asarray(prices, dtype=float)
+        return pd.Series(np.where(np.isnan(current), stored.to_numpy(dtype=float), current),
+                         index=stored.index, name='market_cap')
+
+    def prefilter(self, symbols: Iterable[str], min_market_cap: float, prices=None) -> List[str]:
+        """Symbols whose market cap is at least min_market_cap or unknown, in the given order"""
+        symbols = list(symbols)
+        market_caps = self.market_caps(symbols, prices).to_numpy(dtype=float)
+        keep = ~(market_caps < min_market_cap)
+        return [symbol for symbol, passed in zip(symbols, keep) if passed]
@@ -0,0 +1,150 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+Data = Union[pd.Series, pd.DataFrame]
+
+
+def fingerprint(data: Data) -> str:
+    """Content hash of a Series/DataFrame's values and index"""
+    digest = hashlib.sha1(usedforsecurity=False)
+    values = np.ascontiguousarray(data.to_numpy())
+    if values.dtype == object:
+        digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    else:
+        digest.update(str(values.dtype).encode())
+        digest.update(values.view(np.uint8))
+
+    index = data.index
+    if isinstance(index, pd.RangeIndex):
+        digest.update(f"{index.start}:{index.stop}:{index.step}".encode())
+    elif isinstance(index, pd.DatetimeIndex):
+        digest.update(str(index.tz).encode())
+        digest.update(np.ascontiguousarray(index.asi8).view(np.uint8))
+    else:
+        digest.update(pd.util.hash_pandas_object(index).to_numpy().tobytes())
+
+    if isinstance(data, pd.DataFrame):
+        digest.update(repr(list(data.columns)).encode())
+    return digest.hexdigest()
+
+
+def _size_of(value) -> int:
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return int(np.sum(value.memory_usage(index=False)))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_size_of(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_size_of(v) for v in value)
+    return 64
+
+
+class IndicatorCache:
+    """Thread-safe memo of indicator results keyed by (data fingerprint, indicator, params).
+
+    Entries are evicted least-recently-used once either max_entries or
+    max_bytes is exceeded. Cached objects are shared between callers and
+    must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, Tuple[object, int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+
+    def get_or_compute(self, inputs: Union[Data, Tuple[Data, ...]], indicator: str,
+                       params: Tuple, compute: Callable[[], object]):
+        """Returns the cached result for these inputs, or computes and stores it"""
+        if not isinstance(inputs, tuple):
+            inputs = (inputs,)
+        key = (tuple(fingerprint(data) for data in inputs), indicator, params)
+
+        with self._lock:
+            counts = self._stats.setdefault(indicator, {'hits': 0, 'misses': 0})
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                counts['hits'] += 1
+                return self._entries[key][0]
+            counts['misses'] += 1
+
+        # Compute outside the lock; two threads racing on one key just both compute
+        value = compute()
+        size = _size_of(value)
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, size)
+                self._bytes += size
+                self._evict()
+        return value
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or
+                                 self._bytes > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {}
+            self.evictions = 0
+
+    def stats(self) -> Dict:
+        """Hit/miss counts overall and per indicator, plus current size"""
+        with self._lock:
+            per_indicator = {name: dict(counts) for name, counts in self._stats.items()}
+            hits = sum(c['hits'] for c in per_indicator.values())
+            misses = sum(c['misses'] for c in per_indicator.values())
+            return {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'evictions': self.evictions,
+                'indicators': per_indicator
+            }
+
+
+# Process-wide cache shared by the analysis components and the screener
+indicator_cache = IndicatorCache()
+
+
+def rolling_mean(series: pd.Series, window: int) -> pd.Series:
+    return indicator_cache.get_or_compute(
+        series, 'rolling_mean', (window,),
+        lambda: series.rolling(window=window).mean())
+
+
+def rolling_std(series: pd.Series, window: int) -> pd.Series:
+    return indicator_cache.get_or_compute(
+        series, 'rolling_std', (window,),
+        lambda: series.rolling(window=window).std())
+
+
+def ewm_mean(series: pd.Series, span: int) -> pd.Series:
+    return indicator_cache.get_or_compute(
+        series, 'ewm_mean', (span,),
+        lambda: series.ewm(span=span, adjust=False).mean())
+
+
+def pct_change(series: pd.Series, periods: int = 1) -> pd.Series:
+    return indicator_cache.get_or_compute(
+        series, 'pct_change', (periods,),
+        lambda: series.pct_change(periods))
@@ -0,0 +1,212 @@
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+PANEL_FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+SCREEN_COLUMNS = ['symbol', 'price', 'score', 'momentum', 'volume_trend',
+                  'rsi', 'recommendation', 'macd', 'atr', 'avg_volume']
+
+
+def build_panel(histories: Dict[str, pd.DataFrame],
+                fields: Iterable[str] = PANEL_FIELDS) -> Dict[str, pd.DataFrame]:
+    """Aligns per-symbol bars into one (time x symbol) frame per field.
+
+    Symbols are aligned on the union of their timestamps. Missing bars stay
+    NaN rather than being filled, so a symbol with a shorter history simply
+    starts later in the panel. Each frame is backed by a single float array.
+    """
+    histories = {symbol: hist for symbol, hist in histories.items()
+                 if hist is not None and not hist.empty}
+    symbols = list(histories)
+
+    if not symbols:
+        return {name: pd.DataFrame() for name in fields}
+
+    first = histories[symbols[0]].index
+    index = first.append([histories[s].index for s in symbols[1:]]).unique().sort_values()
+    rows = [index.get_indexer(histories[symbol].index) for symbol in symbols]
+
+    panel = {}
+    for name in fields:
+        values = np.full((len(index), len(symbols)), np.nan)
+        for column, symbol in enumerate(symbols):
+            hist = histories[symbol]
+            if name in hist:
+                values[rows[column], column] = hist[name].to_numpy(dtype=float)
+        panel[name] = pd.DataFrame(values, index=index, columns=symbols)
+    return panel
+
+
+def _ewm(values: np.ndarray, alpha: float, min_periods: int) -> np.ndarray:
+    """pandas ewm(alpha=..., adjust=False).mean() down the time axis of a 2-D array.
+
+    Loops over time and vectorizes across symbols. NaN bars leave the
+    average unchanged (leading NaNs match pandas exactly).
+    """
+    out = np.full(values.shape, np.nan)
+    state = np.full(values.shape[1], np.nan)
+    seen = np.zeros(values.shape[1], dtype=np.int64)
+
+    for t, row in enumerate(values):
+        valid = ~np.isnan(row)
+        started = valid & ~np.isnan(state)
+        state = np.where(started, (1 - alpha) * state + alpha * row, state)
+        state = np.where(valid & ~started, row, state)
+        seen += valid
+        out[t] = np.where(seen >= min_periods, state, np.nan)
+    return out
+
+
+def panel_rsi(close: np.ndarray, window: int = 14) -> np.ndarray:
+    """RSI for every column, computed like ta.momentum.RSIIndicator"""
+    diff = np.full(close.shape, np.nan)
+    diff[1:] = close[1:] - close[:-1]
+    valid = ~np.isnan(close)
+
+    # Like diff.where(diff > 0, 0.0): a missing change counts as zero
+    up = np.where(valid, np.where(diff > 0, diff, 0.0), np.nan)
+    down = np.where(valid, np.where(diff < 0, -diff, 0.0), np.nan)
+    ema_up = _ewm(up, 1 / window, window)
+    ema_down = _ewm(down, 1 / window, window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + ema_up / ema_down))
+    return np.where(ema_down == 0, 100.0, rsi)
+
+
+def panel_macd_diff(close: np.ndarray, fast: int = 12, slow: int = 26,
+                    signal: int = 9) -> np.ndarray:
+    """MACD histogram for every column, computed like ta.trend.MACD.macd_diff"""
+    ema_fast = _ewm(close, 2 / (fast + 1), fast)
+    ema_slow = _ewm(close, 2 / (slow + 1), slow)
+    macd = ema_fast - ema_slow
+    return macd - _ewm(macd, 2 / (signal + 1), signal)
+
+
+def panel_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+              window: int = 14) -> np.ndarray:
+    """ATR for every column, computed like ta.volatility.AverageTrueRange.
+
+    ta seeds Wilder's smoothing with the mean of the first `window` true
+    ranges and reports 0 before that; here each column is seeded from its
+    own first bars so shorter histories line up correctly.
+    """
+    prev_close = np.full(close.shape, np.nan)
+    prev_close[1:] = close[:-1]
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+    out = np.full(close.shape, np.nan)
+    atr = np.zeros(close.shape[1])
+    seen = np.zeros(close.shape[1], dtype=np.int64)
+
+    for t, tr in enumerate(true_range):
+        valid = ~np.isnan(close[t])
+        seen += valid
+        warming = valid & (seen <= window)
+        atr = np.where(warming, atr + np.nan_to_num(tr), atr)
+        atr = np.where(valid & (seen == window), atr / window, atr)
+        atr = np.where(valid & (seen > window), (atr * (window - 1) + tr) / window, atr)
+        out[t] = np.where(valid, np.where(seen < window, 0.0, atr), np.nan)
+    return out
+
+
+def panel_correlation(values: np.ndarray) -> np.ndarray:
+    """Pairwise Pearson correlation of the columns, each pair over the rows where both are present.
+
+    Same result as DataFrame.corr() on data with gaps, computed with a few
+    matrix products instead of a loop over pairs.
+    """
+    valid = (~np.isnan(values)).astype(float)
+    filled = np.where(valid > 0, values, 0.0)
+
+    counts = valid.T @ valid
+    sums = filled.T @ valid          # sums[i, j]: sum of column i where j is present too
+    squares = (filled ** 2).T @ valid
+    products = filled.T @ filled
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = products - sums * sums.T / counts
+        variance_i = squares - sums ** 2 / counts
+        variance_j = variance_i.T
+        corr = covariance / np.sqrt(variance_i * variance_j)
+    corr[counts < 2] = np.nan
+    return np.clip(corr, -1, 1)
+
+
+def _last_valid(values: np.ndarray, offset: int = 0) -> np.ndarray:
+    """Per column, the value `offset` valid rows before the last valid row"""
+    valid = ~np.isnan(values)
+    from_end = np.cumsum(valid[::-1], axis=0)[::-1]
+    hit = valid & (from_end == offset + 1)
+    rows = np.argmax(hit, axis=0)
+    return np.where(hit.any(axis=0), values[rows, np.arange(values.shape[1])], np.nan)
+
+
+def panel_scores(close: np.ndarray, volume: np.ndarray, rsi: np.ndarray) -> np.ndarray:
+    """Vectorized StockScreener._calculate_score for every column"""
+    latest_rsi = _last_valid(rsi)
+
+    score = np.full(close.shape[1], 50.0)
+    score += np.where(latest_rsi < 30, 20, 0)
+    score -= np.where(latest_rsi > 70, 20, 0)
+    score += np.where(_last_valid(close) > np.nanmean(close, axis=0), 10, 0)
+    score += np.where(_last_valid(volume) > np.nanmean(volume, axis=0), 10, 0)
+    return np.clip(score, 0, 100)
+
+
+def panel_recommendations(scores: np.ndarray) -> np.ndarray:
+    """Vectorized StockScreener._get_recommendation"""
+    return np.select(
+        [scores >= 80, scores >= 60, scores <= 20, scores <= 40],
+        ['STRONG BUY', 'BUY', 'STRONG SELL', 'SELL'],
+        default='HOLD'
+    )
+
+
+def screen_panel(panel: Dict[str, pd.DataFrame], min_price: float, max_price: float,
+                 min_volume: float, min_bars: int = 50) -> pd.DataFrame:
+    """Runs the screener's filters, indicators and scoring over a whole panel.
+
+    Returns one row per passing symbol with the same fields that
+    StockScreener._analyze_stock produces, plus 'macd', 'atr' and 'avg_volume',
+    sorted by score.
+    """
+    if panel['Close'].empty:
+        return pd.DataFrame(columns=SCREEN_COLUMNS)
+
+    close = panel['Close'].to_numpy()
+    volume = panel['Volume'].to_numpy()
+
+    with np.errstate(invalid='ignore'):
+        current_price = _last_valid(close)
+        avg_volume = np.nanmean(volume, axis=0)
+        keep = ((~np.isnan(close)).sum(axis=0) >= min_bars) & \
+               (current_price >= min_price) & (current_price <= max_price) & \
+               (avg_volume >= min_volume)
+
+    symbols = panel['Close'].columns[keep]
+    close, volume = close[:, keep], volume[:, keep]
+    high = panel['High'].to_numpy()[:, keep]
+    low = panel['Low'].to_numpy()[:, keep]
+    price = current_price[keep]
+    avg_volume = avg_volume[keep]
+
+    rsi = panel_rsi(close)
+    scores = panel_scores(close, volume, rsi)
+
+    result = pd.DataFrame({
+        'symbol': symbols,
+        'price': price,
+        'score': scores,
+        'momentum': (price / _last_valid(close, offset=4) - 1) * 100,
+        # Same comparison _analyze_stock makes
+        'volume_trend': np.where(avg_volume > np.nanmean(volume, axis=0), 1, -1),
+        'rsi': _last_valid(rsi),
+        'recommendation': panel_recommendations(scores),
+        'macd': _last_valid(panel_macd_diff(close)),
+        'atr': _last_valid(panel_atr(high, low, close)),
+        'avg_volume': avg_volume
+    }, columns=SCREEN_COLUMNS)
+    return result.sort_values('score', ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,229 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from panel_analysis import build_panel
+
+METHODS = ('normal', 'bootstrap')
+
+# Paths per chunk; each chunk has its own seed, so this fixes the random streams
+CHUNK_PATHS = 1 << 15
+
+
+@dataclass
+class PortfolioRisk:
+    """Output of PortfolioRiskEngine.simulate.
+
+    VaR and CVaR are P&L amounts in the currency of the position values, so
+    losses are negative (the sign convention RiskAnalyzer uses for returns).
+    contributions has one row per position: its value, and for each
+    confidence its Euler contribution to CVaR (the position's mean P&L on the
+    tail paths, summing to the portfolio CVaR) and its share of the total.
+    """
+    portfolio_value: float
+    var: Dict[str, float]
+    cvar: Dict[str, float]
+    contributions: pd.DataFrame
+    paths: int
+    method: str
+    stats: Dict[str, float] = field(default_factory=dict)
+
+
+class _NormalModel:
+    """Multivariate normal returns from the historical mean and covariance"""
+
+    def __init__(self, returns: np.ndarray, horizon: int):
+        self.mean = returns.mean(axis=0) * horizon
+        cov = np.atleast_2d(np.cov(returns, rowvar=False)) * horizon
+        try:
+            self.factor = np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            # Singular covariance (e.g. fewer bars than positions): use the
+            # eigendecomposition, dropping the tiny negative eigenvalues
+            eigenvalues, vectors = np.linalg.eigh(cov)
+            self.factor = vectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+    def bytes_per_path(self, positions: int) -> int:
+        return 8 * positions * 2
+
+    def sample(self, rng: np.random.Generator, paths: int) -> np.ndarray:
+        draws = rng.standard_normal((paths, len(self.mean)))
+        returns = draws @ self.factor.T
+        returns += self.mean
+        return returns
+
+
+class _BootstrapModel:
+    """Returns resampled from whole historical bars, keeping their cross-correlation"""
+
+    def __init__(self, returns: np.ndarray, horizon: int):
+        self.returns = returns
+        self.horizon = horizon
+
+    def bytes_per_path(self, positions: int) -> int:
+        return 8 * positions * (1 + self.horizon)
+
+    def sample(self, rng: np.random.Generator, paths: int) -> np.ndarray:
+        rows = rng.integers(0, len(self.returns), size=(paths, self.horizon))
+        if self.horizon == 1:
+            return self.returns[rows[:, 0]]
+        growth = np.prod(1 + self.returns[rows], axis=1)
+        growth -= 1
+        return growth
+
+
+def _simulate_chunk(task):
+    """Simulates one chunk of paths; returns its portfolio P&L and its worst paths per position"""
+    model, values, seed, paths, keep, threshold = task
+    rng = np.random.default_rng(seed)
+    position_pnl = model.sample(rng, paths)
+    position_pnl *= values
+    pnl = position_pnl.sum(axis=1)
+
+    if threshold is not None:
+        tail = np.flatnonzero(pnl <= threshold)
+    elif keep < paths:
+        tail = np.argpartition(pnl, keep - 1)[:keep]
+    else:
+        tail = np.arange(paths)
+    return pnl, pnl[tail], position_pnl[tail]
+
+
+class PortfolioRiskEngine:
+    """Monte Carlo and bootstrap VaR/CVaR for a portfolio of positions.
+
+    Built from a (time x symbol) frame of historical returns. 'normal'
+    draws correlated returns from the sample mean and covariance; 'bootstrap'
+    resamples whole historical bars, which keeps fat tails and the
+    cross-sectional correlation without assuming a distribution. Returns over
+    a horizon of several bars are compounded from resampled bars (bootstrap)
+    or scaled (normal).
+
+    Paths are simulated in chunks of CHUNK_PATHS spread across a process
+    pool, with no more workers than memory_budget_mb holds chunks at once
+    (chunks shrink only if the budget cannot hold one). Each chunk gets its
+    own child of one SeedSequence, so a given seed and path count reproduce
+    the same result for any number of workers.
+    """
+
+    def __init__(self, returns: pd.DataFrame, method: str = 'normal', horizon: int = 1,
+                 seed: Optional[int] = None, memory_budget_mb: float = 256,
+                 max_workers: Optional[int] = None):
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+        if horizon < 1:
+            raise ValueError("horizon must be at least one bar")
+
+        # Only bars where every symbol has a return, so correlations are consistent
+        self.returns = returns.dropna(how='any')
+        if len(self.returns) < 2:
+            raise ValueError("Need at least two bars of returns with every symbol present")
+        self.symbols = list(self.returns.columns)
+        self.method = method
+        self.horizon = horizon
+        self.seed = seed
+        self.memory_budget_mb = memory_budget_mb
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+        values = self.returns.to_numpy(dtype=float)
+        model = _NormalModel if method == 'normal' else _BootstrapModel
+        self.model = model(values, horizon)
+
+    @classmethod
+    def from_histories(cls, histories: Dict[str, pd.DataFrame], **kwargs) -> 'PortfolioRiskEngine':
+        """Engine over the close-to-close returns of per-symbol bar frames"""
+        close = build_panel(histories, fields=['Close'])['Close']
+        return cls(close / close.shift(1) - 1, **kwargs)
+
+    def simulate(self, positions: Union[Dict[str, float], pd.Series], paths: int = 1_000_000,
+                 confidences: Iterable[float] = (0.95, 0.99)) -> PortfolioRisk:
+        """Simulates portfolio P&L for positions given as {symbol: value held}.
+
+        Negative values are short positions. Symbols missing from the
+        return history raise a ValueError.
+        """
+        positions = pd.Series(positions, dtype=float)
+        missing = [symbol for symbol in positions.index if symbol not in self.symbols]
+        if missing:
+            raise ValueError(f"No return history for {missing}")
+        if paths < 1:
+            raise ValueError("paths must be positive")
+
+        columns = [self.symbols.index(symbol) for symbol in positions.index]
+        model = self._model_for(columns)
+        values = positions.to_numpy()
+        confidences = sorted(confidences)
+        alpha = 1 - confidences[0]
+
+        budget = self.memory_budget_mb * 2 ** 20
+        path_bytes = model.bytes_per_path(len(values))
+        chunk = int(min(CHUNK_PATHS, max(1_000, budget // path_bytes), paths))
+        sizes = [min(chunk, paths - start) for start in range(0, paths, chunk)]
+        workers = int(min(self.max_workers, max(1, budget // (chunk * path_bytes)), len(sizes)))
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+
+        # Each chunk keeps about twice its expected share of the widest tail,
+        # which almost always covers every path beyond the portfolio VaR;
+        # chunks that fall short are re-simulated from their seed below
+        keeps = [min(size, int(np.ceil(2 * alpha * size)) + 16) for size in sizes]
+        tasks = [(model, values, seed, size, keep, None)
+                 for seed, size, keep in zip(seeds, sizes, keeps)]
+        chunks = self._run(tasks, workers)
+
+        pnl = np.concatenate([chunk_pnl for chunk_pnl, _, _ in chunks])
+        var, cvar, contributions = {}, {}, {}
+        thresholds = {}
+        for confidence in confidences:
+            label = f"{confidence * 100:g}"
+            thresholds[label] = np.percentile(pnl, (1 - confidence) * 100)
+            var[f"var_{label}"] = float(thresholds[label])
+
+        widest = max(thresholds.values())
+        reruns = 0
+        for i, (chunk_pnl, tail_pnl, tail_positions) in enumerate(chunks):
+            if np.count_nonzero(chunk_pnl <= widest) > len(tail_pnl):
+                chunks[i] = _simulate_chunk(tasks[i][:5] + (widest,))
+                reruns += 1
+
+        for label, threshold in thresholds.items():
+            count, total, by_position = 0, 0.0, np.zeros(len(values))
+            for _, tail_pnl, tail_positions in chunks:
+                selected = tail_pnl <= threshold
+                count += np.count_nonzero(selected)
+                total += tail_pnl[selected].sum()
+                by_position += tail_positions[selected].sum(axis=0)
+            cvar[f"cvar_{label}"] = total / count
+            contributions[f"cvar_{label}"] = by_position / count
+            contributions[f"share_{label}"] = by_position / total if total else np.nan
+
+        table = pd.DataFrame({'value': values, **contributions}, index=positions.index)
+        return PortfolioRisk(
+            portfolio_value=float(values.sum()),
+            var=var,
+            cvar=cvar,
+            contributions=table,
+            paths=paths,
+            method=self.method,
+            stats={'chunks': len(sizes), 'chunk_paths': chunk, 'workers': workers,
+                   'reruns': reruns, 'mean_pnl': float(pnl.mean()),
+                   'std_pnl': float(pnl.std())}
+        )
+
+    def _model_for(self, columns: List[int]):
+        """The model restricted to the held symbols, in position order"""
+        if columns == list(range(len(self.symbols))):
+            return self.model
+        values = self.returns.to_numpy(dtype=float)[:, columns]
+        model = _NormalModel if self.method == 'normal' else _BootstrapModel
+        return model(values, self.horizon)
+
+    @staticmethod
+    def _run(tasks, workers: int):
+        if workers == 1 or len(tasks) == 1:
+            return [_simulate_chunk(task) for task in tasks]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_simulate_chunk, tasks))
@@ -0,0 +1,272 @@
+import json
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+
+def frame_bytes(data) -> int:
+    """Memory held by a DataFrame/Series, index included (object columns are not deep-sized)"""
+    if data is None:
+        return 0
+    usage = data.memory_usage(index=True, deep=False)
+    return int(usage.sum()) if isinstance(data, pd.DataFrame) else int(usage)
+
+
+class _NullSpan:
+    """Span handed out while profiling is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def annotate(self, fetched=None, frame=None):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'symbol', 'fetched', 'frame', 'start', 'outer')
+
+    def __init__(self, profiler: 'Profiler', name: str, symbol: Optional[str]):
+        self.profiler = profiler
+        self.name = name
+        self.symbol = symbol
+        self.fetched = 0
+        self.frame = 0
+
+    def __enter__(self):
+        self.outer = self.profiler._push(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.profiler._pop(self, elapsed, exc_type is not None)
+        return False
+
+    def annotate(self, fetched=None, frame=None):
+        """Attach bytes fetched (a byte count or the fetched DataFrame) and DataFrame memory"""
+        if fetched is not None:
+            self.fetched += fetched if isinstance(fetched, int) else frame_bytes(fetched)
+        if frame is not None:
+            self.frame = max(self.frame, frame_bytes(frame))
+
+
+class Profiler:
+    """Named timing spans with per-symbol breakdowns.
+
+    Spans nest; a span opened without a symbol inherits the symbol of the
+    span around it on the same thread. While disabled, span() returns a
+    shared no-op object, so instrumented code pays one attribute check.
+
+    With start_sampling(), a background thread periodically records the
+    Python stack of every thread that is inside a symbol span, so the
+    slowest symbols can be broken down by where their time went.
+    """
+
+    def __init__(self, enabled: bool = False, namespace: str = 'marketpulse'):
+        self.enabled = enabled
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._active: Dict[int, str] = {}
+        self._sampler: Optional[threading.Thread] = None
+        self._stop_sampling = threading.Event()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # name -> [calls, total, min, max, errors]
+            self._spans: Dict[str, List[float]] = {}
+            # symbol -> name -> [calls, total]
+            self._symbols: Dict[str, Dict[str, List[float]]] = defaultdict(dict)
+            self._wall: Counter = Counter()
+            self._fetched: Counter = Counter()
+            self._frame: Dict[str, int] = {}
+            self._samples: Dict[str, Counter] = defaultdict(Counter)
+
+    def span(self, name: str, symbol: Optional[str] = None):
+        """Context manager timing one stage; use as `with profiler.span('fetch', symbol) as s:`"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, symbol)
+
+    def _push(self, span: _Span) -> Optional[_Span]:
+        outer = getattr(self._local, 'span', None)
+        if span.symbol is None and outer is not None:
+            span.symbol = outer.symbol
+        self._local.span = span
+        if span.symbol is not None and self._sampler is not None:
+            self._active[threading.get_ident()] = span.symbol
+        return outer
+
+    def _pop(self, span: _Span, elapsed: float, failed: bool):
+        outer = span.outer
+        self._local.span = outer
+        if self._sampler is not None:
+            if outer is not None and outer.symbol is not None:
+                self._active[threading.get_ident()] = outer.symbol
+            else:
+                self._active.pop(threading.get_ident(), None)
+
+        with self._lock:
+            stats = self._spans.get(span.name)
+            if stats is None:
+                self._spans[span.name] = [1, elapsed, elapsed, elapsed, int(failed)]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = min(stats[2], elapsed)
+                stats[3] = max(stats[3], elapsed)
+                stats[4] += failed
+
+            symbol = span.symbol
+            if symbol is None:
+                return
+            per_symbol = self._symbols[symbol].setdefault(span.name, [0, 0.0])
+            per_symbol[0] += 1
+            per_symbol[1] += elapsed
+            if outer is None or outer.symbol != symbol:
+                self._wall[symbol] += elapsed
+            if span.fetched:
+                self._fetched[symbol] += span.fetched
+            if span.frame:
+                self._frame[symbol] = max(self._frame.get(symbol, 0), span.frame)
+
+    def start_sampling(self, interval: float = 0.005, max_depth: int = 40):
+        """Start sampling the stacks of threads busy in symbol spans"""
+        if self._sampler is not None:
+            return
+        self._stop_sampling.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, args=(interval, max_depth),
+                                         name='profiler-sampler', daemon=True)
+        self._sampler.start()
+
+    def stop_sampling(self):
+        if self._sampler is None:
+            return
+        self._stop_sampling.set()
+        self._sampler.join()
+        self._sampler = None
+        self._active.clear()
+
+    def _sample_loop(self, interval: float, max_depth: int):
+        own = threading.get_ident()
+        while not self._stop_sampling.wait(interval):
+            active = dict(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            stacks = []
+            for thread_id, symbol in active.items():
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                stacks.append((symbol, ';'.join(reversed(stack))))
+            del frames
+            with self._lock:
+                for symbol, stack in stacks:
+                    self._samples[symbol][stack] += 1
+
+    def slowest_symbols(self, n: int = 5) -> List[str]:
+        """Symbols with the most time in their outermost spans"""
+        with self._lock:
+            return [symbol for symbol, _ in self._wall.most_common(n)]
+
+    def hot_stacks(self, symbol: str, top: int = 10) -> List[Dict]:
+        """Most frequently sampled stacks for a symbol, in folded (flame graph) form"""
+        with self._lock:
+            samples = self._samples.get(symbol, Counter())
+            total = sum(samples.values())
+            return [{'stack': stack, 'samples': count, 'share': count / total}
+                    for stack, count in samples.most_common(top)]
+
+    def to_dict(self, slowest: int = 5) -> Dict:
+        """Span totals, per-symbol timings and memory, plus sampled stacks for the slowest symbols"""
+        with self._lock:
+            spans = {name: {'calls': int(calls), 'total_seconds': total,
+                            'mean_seconds': total / calls, 'min_seconds': low,
+                            'max_seconds': high, 'errors': int(errors)}
+                     for name, (calls, total, low, high, errors) in self._spans.items()}
+            symbols = {symbol: {'wall_seconds': self._wall.get(symbol, 0.0),
+                                'fetched_bytes': self._fetched.get(symbol, 0),
+                                'frame_bytes': self._frame.get(symbol, 0),
+                                'spans': {name: {'calls': calls, 'total_seconds': total}
+                                          for name, (calls, total) in names.items()}}
+                       for symbol, names in self._symbols.items()}
+
+        report = {'spans': spans, 'symbols': symbols}
+        slow = self.slowest_symbols(slowest)
+        report['slowest_symbols'] = slow
+        if any(self._samples.get(symbol) for symbol in slow):
+            report['hot_stacks'] = {symbol: self.hot_stacks(symbol) for symbol in slow}
+        return report
+
+    def to_json(self, path: Optional[str] = None, slowest: int = 5) -> str:
+        text = json.dumps(self.to_dict(slowest), indent=2)
+        if path:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+    def to_prometheus(self, path: Optional[str] = None) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        report = self.to_dict(slowest=0)
+        ns = self.namespace
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {ns}_{name} {help_text}")
+            lines.append(f"# TYPE {ns}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{ns}_{name}{{{label_text}}} {value}")
+
+        spans = report['spans']
+        metric('span_calls_total', 'counter', 'Times each span was entered',
+               [({'span': name}, s['calls']) for name, s in spans.items()])
+        metric('span_seconds_total', 'counter', 'Seconds spent in each span',
+               [({'span': name}, s['total_seconds']) for name, s in spans.items()])
+        metric('span_seconds_max', 'gauge', 'Slowest single call of each span',
+               [({'span': name}, s['max_seconds']) for name, s in spans.items()])
+        metric('span_errors_total', 'counter', 'Spans that exited with an exception',
+               [({'span': name}, s['errors']) for name, s in spans.items()])
+
+        symbols = report['symbols']
+        metric('symbol_span_seconds_total', 'counter', 'Seconds spent in each span per symbol',
+               [({'symbol': symbol, 'span': name}, s['total_seconds'])
+                for symbol, info in symbols.items() for name, s in info['spans'].items()])
+        metric('symbol_seconds_total', 'counter', 'Wall seconds per symbol',
+               [({'symbol': symbol}, info['wall_seconds']) for symbol, info in symbols.items()])
+        metric('symbol_fetched_bytes_total', 'counter', 'Bytes of bars fetched per symbol',
+               [({'symbol': symbol}, info['fetched_bytes']) for symbol, info in symbols.items()])
+        metric('symbol_frame_bytes', 'gauge', 'Largest DataFrame held per symbol',
+               [({'symbol': symbol}, info['frame_bytes']) for symbol, info in symbols.items()])
+
+        text = '\n'.join(lines) + '\n'
+        if path:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Process-wide profiler used by MarketAnalyzer and StockScreener; off by default
+profiler = Profiler()
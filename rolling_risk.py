@@ -0,0 +1,202 @@
+from typing import Dict, Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+Data = Union[pd.Series, pd.DataFrame]
+
+TRADING_DAYS = 252
+
+# Upper bound on (bars x symbols x order statistics) cells held per block of work
+BLOCK_CELLS = 1 << 22
+
+
+def rolling_volatility(close: Data, window: int = 20, periods_per_year: int = TRADING_DAYS) -> Data:
+    """Annualized standard deviation of the last `window` returns at every bar.
+
+    close is a Series, or a (time x symbol) DataFrame to do many symbols at once.
+    """
+    returns = _wrap(_returns(_values(close)), close)
+    return returns.rolling(window=window).std() * np.sqrt(periods_per_year)
+
+
+def rolling_var(close: Data, window: int = TRADING_DAYS,
+                confidences: Iterable[float] = (0.95, 0.99)) -> Dict[str, Data]:
+    """Historical VaR and CVaR of the last `window` returns at every bar.
+
+    Returns 'var_95'/'cvar_95' style keys per confidence. VaR matches
+    np.percentile(window_returns, (1 - confidence) * 100), as in
+    RiskAnalyzer.calculate_var; CVaR is the mean of the window returns at or
+    below it. Windows with a missing return are NaN.
+
+    Instead of sorting every window, the series is cut into blocks of
+    `window` bars and the few smallest returns of every block prefix and
+    suffix are tracked; each window is one block suffix plus the next block's
+    prefix, so its tail is a merge of two short sorted lists.
+    """
+    values = _returns(_values(close))
+    n = window
+    levels = []
+    for confidence in confidences:
+        virtual = (n - 1) * ((1 - confidence) * 100 / 100)
+        lower = int(np.floor(virtual))
+        levels.append((f"{confidence * 100:g}", lower, virtual - lower))
+    k = min(n, max(lower for _, lower, _ in levels) + 2)
+
+    missing = _missing_in_window(values, n)
+    results = {}
+    for label, _, _ in levels:
+        results[f"var_{label}"] = np.full(values.shape, np.nan)
+        results[f"cvar_{label}"] = np.full(values.shape, np.nan)
+
+    # Missing returns sort last as inf; the windows holding them are masked below
+    with np.errstate(invalid='ignore'):
+        for rows, columns, smallest in _window_smallest(values, n, k):
+            for label, lower, gamma in levels:
+                a = smallest[..., lower]
+                b = smallest[..., min(lower + 1, n - 1)]
+                results[f"var_{label}"][rows, columns] = percentile_lerp(a, b, gamma)
+                results[f"cvar_{label}"][rows, columns] = smallest[..., :lower + 1].mean(axis=-1)
+
+    for key, result in results.items():
+        result[missing] = np.nan
+        results[key] = _wrap(result, close)
+    return results
+
+
+def rolling_max_drawdown(close: Data, window: int = TRADING_DAYS) -> Data:
+    """Largest peak-to-trough fall within the last `window` closes at every bar.
+
+    Computed without a per-window loop: within blocks of `window` bars,
+    running extremes and drawdowns are accumulated forwards (prefixes) and
+    backwards (suffixes), and a window is one suffix plus the next prefix,
+    with the peak in the suffix and trough in the prefix as the cross term.
+    """
+    values = _values(close)
+    bars, columns = values.shape
+    blocks = -(-bars // window)
+    padded = np.full((blocks * window, columns), np.nan)
+    padded[:bars] = values
+    prices = padded.reshape(blocks, window, columns)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        prefix_peak = np.fmax.accumulate(prices, axis=1)
+        prefix_drawdown = np.fmin.accumulate(prices / prefix_peak - 1, axis=1)
+        prefix_low = np.fmin.accumulate(prices, axis=1)
+
+        backwards = prices[:, ::-1]
+        suffix_low = np.fmin.accumulate(backwards, axis=1)
+        suffix_drawdown = np.fmin.accumulate(suffix_low / backwards - 1, axis=1)[:, ::-1]
+        suffix_peak = np.fmax.accumulate(backwards, axis=1)[:, ::-1]
+
+        # Suffix starting one bar after each position of the previous block;
+        # the position past the end and the block before the first are empty
+        def shifted(suffix):
+            out = np.full_like(suffix, np.nan)
+            out[1:, :-1] = suffix[:-1, 1:]
+            return out
+
+        drawdown = np.fmin(np.fmin(prefix_drawdown, shifted(suffix_drawdown)),
+                           prefix_low / shifted(suffix_peak) - 1)
+
+    drawdown = drawdown.reshape(-1, columns)[:bars]
+    drawdown[_missing_in_window(values, window)] = np.nan
+    return _wrap(drawdown, close)
+
+
+def rolling_risk(close: Data, window: int = TRADING_DAYS, volatility_window: int = 20,
+                 confidences: Iterable[float] = (0.95, 0.99)) -> Dict[str, Data]:
+    """Rolling volatility, VaR/CVaR per confidence and max drawdown, keyed like RiskAnalyzer.analyze"""
+    risk = {'volatility': rolling_volatility(close, volatility_window)}
+    risk.update(rolling_var(close, window, confidences))
+    risk['max_drawdown'] = rolling_max_drawdown(close, window)
+    return risk
+
+
+def _values(close: Data) -> np.ndarray:
+    values = close.to_numpy(dtype=float)
+    return values.reshape(-1, 1) if values.ndim == 1 else values
+
+
+def _wrap(values: np.ndarray, like: Data) -> Data:
+    if isinstance(like, pd.Series):
+        return pd.Series(values[:, 0], index=like.index, name=like.name)
+    return pd.DataFrame(values, index=like.index, columns=like.columns)
+
+
+def _returns(values: np.ndarray) -> np.ndarray:
+    returns = np.full(values.shape, np.nan)
+    returns[1:] = values[1:] / values[:-1] - 1
+    return returns
+
+
+def _missing_in_window(values: np.ndarray, window: int) -> np.ndarray:
+    """True where the trailing window is incomplete or holds a NaN"""
+    missing = np.zeros((len(values) + 1, values.shape[1]), dtype=np.int64)
+    np.cumsum(np.isnan(values), axis=0, out=missing[1:])
+    counts = missing[1:].copy()
+    counts[window:] -= missing[1:-window]
+    counts[:window - 1] = 1
+    return counts > 0
+
+
+def percentile_lerp(a, b, t: float):
+    """Interpolates between neighbouring order statistics exactly as np.percentile does"""
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+
+def _insert(smallest: np.ndarray, value: np.ndarray, slots: np.ndarray) -> np.ndarray:
+    """Inserts value into each ascending row of smallest, dropping what falls off the end"""
+    position = (smallest <= value[..., None]).sum(axis=-1)[..., None]
+    shifted = np.concatenate([smallest[..., :1], smallest[..., :-1]], axis=-1)
+    return np.where(slots < position, smallest,
+                    np.where(slots == position, value[..., None], shifted))
+
+
+def _window_smallest(values: np.ndarray, window: int, k: int):
+    """Yields (rows, columns, smallest) with the k smallest values of each trailing window.
+
+    smallest has shape (rows, columns, k) and is ascending along the last axis;
+    NaN sorts last. Rows before the first full window are filled from a
+    partial window and must be masked by the caller.
+    """
+    bars, total_columns = values.shape
+    blocks = -(-bars // window)
+    padded = np.full((blocks * window, total_columns), np.inf)
+    padded[:bars] = np.where(np.isnan(values), np.inf, values)
+    padded = padded.reshape(blocks, window, total_columns)
+    slots = np.arange(k)
+
+    column_step = max(1, BLOCK_CELLS // (window * k))
+    for c0 in range(0, total_columns, column_step):
+        c1 = min(total_columns, c0 + column_step)
+        block_step = max(1, BLOCK_CELLS // (window * k * (c1 - c0)))
+        for b0 in range(0, blocks, block_step):
+            b1 = min(blocks, b0 + block_step)
+            current = padded[b0:b1, :, c0:c1]
+            previous = np.full_like(current, np.inf)
+            previous[1:] = current[:-1]
+            if b0 > 0:
+                previous[0] = padded[b0 - 1, :, c0:c1]
+
+            # suffix[:, i] holds the k smallest of previous[:, i:], with an
+            # empty suffix past the end of the block
+            state = np.full(current.shape[:1] + current.shape[2:] + (k,), np.inf)
+            suffix = np.empty((b1 - b0, window + 1, c1 - c0, k))
+            suffix[:, window] = state
+            for i in range(window - 1, -1, -1):
+                state = _insert(state, previous[:, i], slots)
+                suffix[:, i] = state
+
+            state = np.full_like(state, np.inf)
+            smallest = np.empty((b1 - b0, window, c1 - c0, k))
+            for i in range(window):
+                state = _insert(state, current[:, i], slots)
+                merged = np.concatenate([state, suffix[:, i + 1]], axis=-1)
+                merged.sort(axis=-1)
+                smallest[:, i] = merged[..., :k]
+
+            smallest = smallest.reshape(-1, c1 - c0, k)
+            rows = slice(b0 * window, min(bars, b1 * window))
+            yield rows, slice(c0, c1), smallest[:rows.stop - rows.start]
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Hashable, Optional
+
+import pytz
+
+EASTERN = pytz.timezone('US/Eastern')
+MARKET_OPEN = (9, 30)
+MARKET_CLOSE = (16, 0)
+
+
+def is_market_open(now: Optional[datetime] = None) -> bool:
+    """True during regular US trading hours (holidays are not accounted for)"""
+    now = now or datetime.now(EASTERN)
+    if now.weekday() > 4:
+        return False
+    minutes = now.hour * 60 + now.minute
+    return MARKET_OPEN[0] * 60 + MARKET_OPEN[1] <= minutes < MARKET_CLOSE[0] * 60 + MARKET_CLOSE[1]
+
+
+def market_hours_ttl(now: Optional[datetime] = None, open_ttl: float = 60) -> float:
+    """Seconds a result stays valid: short while the market trades, until the next open otherwise"""
+    now = now or datetime.now(EASTERN)
+    if is_market_open(now):
+        return open_ttl
+
+    next_open = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+    if next_open <= now:
+        next_open += timedelta(days=1)
+    while next_open.weekday() > 4:
+        next_open += timedelta(days=1)
+    return max(open_ttl, (next_open - now).total_seconds())
+
+
+class SingleFlightCache:
+    """Process-wide TTL cache that collapses concurrent identical requests.
+
+    The first caller for a key runs the computation; callers arriving while
+    it is in flight wait for and share its result. Failures are passed to
+    every waiter but are not cached, and neither are results rejected by
+    the optional cache_if predicate (e.g. empty results of a failed fetch).
+    """
+
+    def __init__(self, ttl: Callable[[], float] = market_hours_ttl, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object],
+                       ttl: Optional[float] = None,
+                       cache_if: Optional[Callable[[object], bool]] = None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if cache_if is None or cache_if(value):
+                expires = time.monotonic() + (ttl if ttl is not None else self.ttl())
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            del self._in_flight[key]
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'fresh_entries': sum(1 for _, expires in self._entries.values() if expires > now),
+                'in_flight': len(self._in_flight),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0
+            }
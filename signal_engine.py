@@ -0,0 +1,153 @@
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Event codes returned by detect_crossovers
+CROSS_UP = 1
+CROSS_DOWN = -1
+
+# Event codes returned by smt_divergence_codes
+SMT_BULLISH = 1
+SMT_BEARISH = -1
+
+# Index ETFs that single stocks are usually checked against for SMT divergence
+INDEX_BENCHMARKS = ('SPY', 'QQQ', 'IWM', 'DIA')
+
+# Upper bound on pair x bar cells handled at once by scan_smt_pairs
+SMT_BLOCK_CELLS = 1 << 24
+
+ArrayLike = Union[np.ndarray, pd.Series, float]
+
+
+def detect_crossovers(fast: ArrayLike, slow: ArrayLike) -> np.ndarray:
+    """Marks bars where `fast` crosses `slow`.
+
+    Either argument may be a scalar threshold. Inputs broadcast against each
+    other and time runs along the last axis, so a (pairs x bars) matrix is
+    handled in the same pass as a single series. Returns int8 codes: CROSS_UP
+    where fast moves from strictly below to strictly above slow, CROSS_DOWN for
+    the reverse, 0 elsewhere. Bars where either side is NaN never cross.
+    """
+    fast, slow = np.broadcast_arrays(np.asarray(fast, dtype=float),
+                                     np.asarray(slow, dtype=float))
+    if fast.ndim == 0:
+        raise ValueError("At least one input must be a series")
+
+    below = fast < slow
+    above = fast > slow
+
+    codes = np.zeros(fast.shape, dtype=np.int8)
+    codes[..., 1:][below[..., :-1] & above[..., 1:]] = CROSS_UP
+    codes[..., 1:][above[..., :-1] & below[..., 1:]] = CROSS_DOWN
+    return codes
+
+
+def crossover_events(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Splits a 1-D code array into positions of up and down crosses"""
+    return np.flatnonzero(codes == CROSS_UP), np.flatnonzero(codes == CROSS_DOWN)
+
+
+def rolling_means(close: ArrayLike, windows: Iterable[int]) -> Dict[int, np.ndarray]:
+    """Simple moving averages of `close` for each distinct window.
+
+    Uses the same pandas rolling mean as MarketAnalyzer.moving_averages so the
+    values match the '20_avg'/'50_avg' columns exactly.
+    """
+    series = pd.Series(np.asarray(close, dtype=float))
+    return {window: series.rolling(window=window).mean().to_numpy()
+            for window in sorted(set(windows))}
+
+
+def scan_ma_pairs(close: ArrayLike, pairs: List[Tuple[int, int]]) -> np.ndarray:
+    """Runs every (fast, slow) moving-average pair over one close series.
+
+    Each distinct window is computed once and shared across pairs. Returns a
+    (len(pairs) x bars) int8 matrix of crossover codes.
+    """
+    if not pairs:
+        return np.zeros((0, len(close)), dtype=np.int8)
+
+    means = rolling_means(close, [w for pair in pairs for w in pair])
+    fast = np.stack([means[f] for f, _ in pairs])
+    slow = np.stack([means[s] for _, s in pairs])
+    return detect_crossovers(fast, slow)
+
+
+def close_direction(close: ArrayLike) -> np.ndarray:
+    """Sign of each close's change from the previous bar, as int8.
+
+    Time runs along the last axis. The first bar, and any bar where either
+    close is NaN, gets 0.
+    """
+    close = np.asarray(close, dtype=float)
+    direction = np.zeros(close.shape, dtype=np.int8)
+    change = close[..., 1:] - close[..., :-1]
+    direction[..., 1:][change > 0] = 1
+    direction[..., 1:][change < 0] = -1
+    return direction
+
+
+def smt_divergence_codes(primary: ArrayLike, comparison: ArrayLike) -> np.ndarray:
+    """Marks bars where two assets' closes move in opposite directions.
+
+    SMT_BULLISH where the primary closes higher than the bar before while the
+    comparison closes lower, SMT_BEARISH for the reverse, 0 elsewhere. Inputs
+    broadcast against each other with time along the last axis.
+    """
+    primary, comparison = np.broadcast_arrays(np.asarray(primary, dtype=float),
+                                              np.asarray(comparison, dtype=float))
+    if primary.ndim == 0:
+        raise ValueError("Inputs must be series")
+    return _smt_codes(close_direction(primary), close_direction(comparison))
+
+
+def _smt_codes(primary: np.ndarray, comparison: np.ndarray) -> np.ndarray:
+    codes = np.zeros(primary.shape, dtype=np.int8)
+    codes[(primary > 0) & (comparison < 0)] = SMT_BULLISH
+    codes[(primary < 0) & (comparison > 0)] = SMT_BEARISH
+    return codes
+
+
+def smt_pairs(symbols: Iterable[str],
+              benchmarks: Iterable[str] = INDEX_BENCHMARKS) -> List[Tuple[str, str]]:
+    """(symbol, benchmark) pairs for every symbol that is not itself a benchmark"""
+    benchmarks = list(benchmarks)
+    return [(symbol, benchmark) for symbol in symbols if symbol not in benchmarks
+            for benchmark in benchmarks]
+
+
+def scan_smt_pairs(closes: ArrayLike, pairs: ArrayLike) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Finds SMT divergences for many (primary, comparison) pairs in one pass.
+
+    closes is a (symbols x bars) matrix and pairs an (n x 2) array of row
+    indexes into it. Each symbol's bar-to-bar direction is computed once and
+    shared by every pair it appears in; pairs are then compared in blocks of
+    at most SMT_BLOCK_CELLS cells so memory stays flat for large universes.
+
+    Returns parallel arrays (pair, position, code): the row in `pairs`, the bar
+    and the SMT_BULLISH/SMT_BEARISH code of every divergence, ordered by pair
+    and then by bar.
+    """
+    closes = np.asarray(closes, dtype=float)
+    if closes.ndim != 2:
+        raise ValueError("closes must be a (symbols x bars) matrix")
+    pairs = np.asarray(pairs, dtype=np.intp).reshape(-1, 2)
+
+    direction = close_direction(closes)
+    step = max(1, SMT_BLOCK_CELLS // max(1, closes.shape[1]))
+    found_pairs, found_positions, found_codes = [], [], []
+
+    for start in range(0, len(pairs), step):
+        block = pairs[start:start + step]
+        codes = _smt_codes(direction[block[:, 0]], direction[block[:, 1]])
+        rows, positions = np.nonzero(codes)
+        found_pairs.append((rows + start).astype(np.int32))
+        found_positions.append(positions.astype(np.int32))
+        found_codes.append(codes[rows, positions])
+
+    if not found_pairs:
+        return (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32),
+                np.zeros(0, dtype=np.int8))
+    return (np.concatenate(found_pairs), np.concatenate(found_positions),
+            np.concatenate(found_codes))
@@ -1,5 +1,12 @@
 from MarketAnalyzer import MarketAnalyzer
+from TradeAdvisor import TradeAdvisor
+from panel_analysis import build_panel, panel_correlation
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
 import pytz
 
 def get_latest_market_date():
@@ -14,24 +21,109 @@ def get_latest_market_date():
     # Format the date as string
     return current_time.strftime('%Y-%m-%d')
 
-def compare_stocks(symbol1, symbol2, start_date):
-    """Compare two stocks and generate trading advice for both"""
+@dataclass
+class Comparison:
+    """Result of compare_many"""
+    table: pd.DataFrame
+    correlation: pd.DataFrame
+    analyzers: Dict[str, MarketAnalyzer]
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+def analyze_symbols(symbols: List[str], start_date, end_date, provider=None,
+                    max_workers: int = 16, interval: str = '1d'):
+    """Fetch and analyze every symbol in parallel; returns (analyzers, errors) keyed by symbol"""
+    def analyze(symbol):
+        analyzer = MarketAnalyzer(symbol, start_date, end_date, interval, provider=provider)
+        analyzer.get_data()
+        analyzer.analyze_all()
+        return analyzer
+
+    analyzers, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols)))) as executor:
+        futures = {symbol: executor.submit(analyze, symbol) for symbol in symbols}
+        for symbol, future in futures.items():
+            try:
+                analyzers[symbol] = future.result()
+            except Exception as e:
+                errors[symbol] = str(e)
+                print(f"Skipping {symbol}: {str(e)}")
+    return analyzers, errors
+
+
+def _summary_row(analyzer: MarketAnalyzer, advisor: TradeAdvisor, portfolio_value: float) -> Dict:
+    results = analyzer.analysis_results
+    close = analyzer.data['Close']
+    price = close.iloc[-1]
+    technical, risk = results['technical'], results['risk']
+    bands = technical['bollinger_bands']
+    band_width = bands['upper'].iloc[-1] - bands['lower'].iloc[-1]
+    advice = advisor.analyze_trading_opportunity(results, price, portfolio_value)
+
+    return {
+        'price': price,
+        'period_return': price / close.iloc[0] - 1,
+        'volatility': risk['volatility'],
+        'var_95': risk['var_95'],
+        'var_99': risk['var_99'],
+        'max_drawdown': risk['max_drawdown'],
+        'rsi': technical['rsi'].iloc[-1],
+        'macd': technical['macd']['macd'].iloc[-1],
+        'macd_signal': technical['macd']['signal'].iloc[-1],
+        'macd_histogram': technical['macd']['histogram'].iloc[-1],
+        'bollinger_position': (price - bands['lower'].iloc[-1]) / band_width if band_width else np.nan,
+        'action': advice['action'],
+        'confidence': advice['confidence'],
+        'stop_loss': advice['stop_loss'],
+        'target_price': advice['target_price'],
+        'recommended_shares': advice['recommended_shares'],
+        'alerts': '; '.join(advice['alerts'])
+    }
+
+
+def compare_many(symbols: List[str], start_date, end_date: Optional[str] = None, provider=None,
+                 max_workers: int = 16, portfolio_value: float = 10000,
+                 risk_tolerance: str = 'moderate') -> Comparison:
+    """Analyze any number of stocks side by side.
+
+    Symbols are fetched and analyzed concurrently, so the wall time tracks
+    the slowest symbol rather than the sum. Returns a Comparison with one
+    row per symbol (risk metrics, latest indicators and TradeAdvisor advice)
+    and the correlation matrix of their daily returns.
+    """
+    end_date = end_date or get_latest_market_date()
+    symbols = list(dict.fromkeys(symbols))
+    analyzers, errors = analyze_symbols(symbols, start_date, end_date, provider, max_workers)
+
+    advisor = TradeAdvisor(risk_tolerance=risk_tolerance)
+    table = pd.DataFrame.from_dict(
+        {symbol: _summary_row(analyzer, advisor, portfolio_value)
+         for symbol, analyzer in analyzers.items()}, orient='index')
+
+    close = build_panel({symbol: analyzer.data for symbol, analyzer in analyzers.items()},
+                        fields=['Close'])['Close']
+    returns = close.to_numpy()[1:] / close.to_numpy()[:-1] - 1
+    correlation = pd.DataFrame(panel_correlation(returns), index=close.columns, columns=close.columns)
+
+    return Comparison(table=table, correlation=correlation, analyzers=analyzers, errors=errors)
+
+
+def compare_stocks(symbol1, symbol2, start_date, provider=None):
+    """Compare two stocks and generate trading advice for both.
+
+    provider is an optional DataProvider (e.g. SyntheticProvider for offline runs).
+    """
 
     # Get latest market date
     end_date = get_latest_market_date()
     print(f"\nAnalyzing from {start_date} to {end_date}")
 
-    # Analyze first stock
-    print(f"\nAnalyzing {symbol1}...")
-    analyzer1 = MarketAnalyzer(symbol1, start_date, end_date, '1d')
-    analyzer1.get_data()
-    results1 = analyzer1.analyze_all()
-
-    # Analyze second stock
-    print(f"\nAnalyzing {symbol2}...")
-    analyzer2 = MarketAnalyzer(symbol2, start_date, end_date, '1d')
-    analyzer2.get_data()
-    results2 = analyzer2.analyze_all()
+    # Analyze both stocks at once
+    print(f"\nAnalyzing {symbol1} and {symbol2}...")
+    analyzers, errors = analyze_symbols([symbol1, symbol2], start_date, end_date, provider)
+    if errors:
+        raise Exception(f"Comparison failed: {errors}")
+    analyzer1, analyzer2 = analyzers[symbol1], analyzers[symbol2]
 
     print(f"\n=== Comparing {symbol1} vs {symbol2} ===")
 
@@ -57,14 +149,19 @@ if __name__ == "__main__":
 
     print(f"Analysis Period: {start_date} to {end_date}")
 
-    # Compare semiconductor stocks
-    print("\n=== Semiconductor Comparison ===")
-    nvda, amd = compare_stocks('NVDA', 'AMD', start_date)
-
-    # Compare cloud computing stocks
-    print("\n=== Cloud Computing Comparison ===")
-    amzn, msft = compare_stocks('AMZN', 'MSFT', start_date)
-
-    # Compare EV stocks
-    print("\n=== EV Market Comparison ===")
-    tsla, f = compare_stocks('TSLA', 'F', start_date)
\ No newline at end of file
+    # Compare all three sectors in one parallel pass
+    sectors = {
+        'Semiconductor': ['NVDA', 'AMD'],
+        'Cloud Computing': ['AMZN', 'MSFT'],
+        'EV Market': ['TSLA', 'F']
+    }
+    comparison = compare_many([symbol for pair in sectors.values() for symbol in pair],
+                              start_date, end_date)
+
+    columns = ['price', 'period_return', 'volatility', 'var_95', 'rsi', 'action', 'confidence']
+    for sector, symbols in sectors.items():
+        print(f"\n=== {sector} Comparison ===")
+        print(comparison.table.reindex(symbols)[columns].to_string())
+
+    print("\n=== Return Correlation ===")
+    print(comparison.correlation.round(2).to_string())
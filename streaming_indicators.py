@@ -0,0 +1,271 @@
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis_components import TechnicalAnalyzer, VolumeAnalyzer
+from indicator_cache import rolling_mean
+
+NAN = float('nan')
+
+
+class RollingWindow:
+    """Fixed-size window keeping mean and variance up to date in O(1) per value.
+
+    Uses the same add/remove Welford updates as pandas' rolling mean/std, plus
+    two guards pandas also has: a window of identical values has exactly zero
+    variance, and a window with no non-zero values has exactly zero mean.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.nonzero = 0
+        self.same_run = 0
+
+    def push(self, value: float):
+        if self.values and value == self.values[-1]:
+            self.same_run += 1
+        else:
+            self.same_run = 1
+
+        self.values.append(value)
+        self.nonzero += value != 0
+        n = len(self.values)
+        delta = value - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (value - self.mean)
+
+        if n > self.size:
+            old = self.values.popleft()
+            self.nonzero -= old != 0
+            n -= 1
+            delta = old - self.mean
+            self.mean -= delta / n
+            self.m2 -= delta * (old - self.mean)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.size
+
+    def current_mean(self) -> float:
+        if not self.full:
+            return NAN
+        if self.nonzero == 0:
+            return 0.0
+        if self.same_run >= self.size:
+            return self.values[-1]
+        return self.mean
+
+    def current_std(self) -> float:
+        if not self.full or self.size < 2:
+            return NAN
+        if self.same_run >= self.size:
+            return 0.0
+        return float(np.sqrt(max(self.m2, 0.0) / (self.size - 1)))
+
+    def to_dict(self) -> Dict:
+        return {'size': self.size, 'values': list(self.values), 'mean': self.mean,
+                'm2': self.m2, 'nonzero': self.nonzero, 'same_run': self.same_run}
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> 'RollingWindow':
+        window = cls(state['size'])
+        window.values = deque(state['values'])
+        window.mean = state['mean']
+        window.m2 = state['m2']
+        window.nonzero = state['nonzero']
+        window.same_run = state['same_run']
+        return window
+
+
+class EWM:
+    """Exponential moving average matching pandas ewm(span=..., adjust=False)"""
+
+    def __init__(self, span: int):
+        self.span = span
+        self.alpha = 2 / (span + 1)
+        self.value: Optional[float] = None
+
+    def push(self, value: float) -> float:
+        if self.value is None:
+            self.value = value
+        else:
+            self.value = (1 - self.alpha) * self.value + self.alpha * value
+        return self.value
+
+    def to_dict(self) -> Dict:
+        return {'span': self.span, 'value': self.value}
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> 'EWM':
+        ewm = cls(state['span'])
+        ewm.value = state['value']
+        return ewm
+
+
+class IncrementalIndicators:
+    """Per-symbol indicator state updated one bar at a time.
+
+    Tracks the same RSI, Bollinger bands and MACD as TechnicalAnalyzer and the
+    volume MA and VPT as VolumeAnalyzer, at constant cost per bar regardless
+    of how much history has been seen. State round-trips through to_dict()/
+    from_dict() so it can be checkpointed between sessions.
+    """
+
+    OUTPUTS = ['rsi', 'bb_upper', 'bb_middle', 'bb_lower',
+               'macd', 'macd_signal', 'macd_histogram', 'volume_ma', 'vpt']
+
+    def __init__(self, rsi_period: int = 14, bb_period: int = 20,
+                 macd_fast: int = 12, macd_slow: int = 26, macd_signal: int = 9,
+                 volume_period: int = 20):
+        self.gains = RollingWindow(rsi_period)
+        self.losses = RollingWindow(rsi_period)
+        self.closes = RollingWindow(bb_period)
+        self.volumes = RollingWindow(volume_period)
+        self.ema_fast = EWM(macd_fast)
+        self.ema_slow = EWM(macd_slow)
+        self.ema_signal = EWM(macd_signal)
+        self.prev_close: Optional[float] = None
+        self.vpt: Optional[float] = None
+        self.bars = 0
+        self.latest: Dict[str, float] = {}
+
+    def update(self, close: float, volume: float) -> Dict[str, float]:
+        """Adds one bar and returns the latest value of every indicator"""
+        close = float(close)
+        volume = float(volume)
+
+        # RSI on simple rolling means of gains and losses; the first bar has no
+        # change and counts as zero, like delta.where(...) in calculate_rsi
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        gain, loss = self.gains.current_mean(), self.losses.current_mean()
+        if np.isnan(gain) or (gain == 0 and loss == 0):
+            rsi = NAN
+        elif loss == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - (100 / (1 + gain / loss))
+
+        # Bollinger bands
+        self.closes.push(close)
+        middle = self.closes.current_mean()
+        std = self.closes.current_std()
+
+        # MACD
+        macd = self.ema_fast.push(close) - self.ema_slow.push(close)
+        signal = self.ema_signal.push(macd)
+
+        # Volume MA and volume-price trend
+        self.volumes.push(volume)
+        if self.prev_close is not None:
+            term = (close - self.prev_close) / self.prev_close * volume
+            if not np.isnan(term):
+                self.vpt = term if self.vpt is None else self.vpt + term
+
+        self.prev_close = close
+        self.bars += 1
+        self.latest = {
+            'rsi': rsi,
+            'bb_upper': middle + std * 2,
+            'bb_middle': middle,
+            'bb_lower': middle - std * 2,
+            'macd': macd,
+            'macd_signal': signal,
+            'macd_histogram': macd - signal,
+            'volume_ma': self.volumes.current_mean(),
+            'vpt': NAN if self.vpt is None else self.vpt
+        }
+        return self.latest
+
+    def update_batch(self, data: pd.DataFrame) -> pd.DataFrame:
+        """Feeds a small batch of bars and returns one row of outputs per bar"""
+        rows = [self.update(close, volume)
+                for close, volume in zip(data['Close'].to_numpy(), data['Volume'].to_numpy())]
+        return pd.DataFrame(rows, index=data.index, columns=self.OUTPUTS)
+
+    def to_dict(self) -> Dict:
+        return {
+            'gains': self.gains.to_dict(),
+            'losses': self.losses.to_dict(),
+            'closes': self.closes.to_dict(),
+            'volumes': self.volumes.to_dict(),
+            'ema_fast': self.ema_fast.to_dict(),
+            'ema_slow': self.ema_slow.to_dict(),
+            'ema_signal': self.ema_signal.to_dict(),
+            'prev_close': self.prev_close,
+            'vpt': self.vpt,
+            'bars': self.bars,
+            'latest': dict(self.latest)
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> 'IncrementalIndicators':
+        indicators = cls()
+        indicators.gains = RollingWindow.from_dict(state['gains'])
+        indicators.losses = RollingWindow.from_dict(state['losses'])
+        indicators.closes = RollingWindow.from_dict(state['closes'])
+        indicators.volumes = RollingWindow.from_dict(state['volumes'])
+        indicators.ema_fast = EWM.from_dict(state['ema_fast'])
+        indicators.ema_slow = EWM.from_dict(state['ema_slow'])
+        indicators.ema_signal = EWM.from_dict(state['ema_signal'])
+        indicators.prev_close = state['prev_close']
+        indicators.vpt = state['vpt']
+        indicators.bars = state['bars']
+        indicators.latest = dict(state['latest'])
+        return indicators
+
+    @classmethod
+    def verify_against_batch(cls, data: pd.DataFrame, rtol: float = 1e-8,
+                             **params) -> Dict[str, float]:
+        """Streams `data` bar by bar and checks every output against the batch analyzers.
+
+        The batch side is computed with the same periods as the streamed
+        one, so `params` (the constructor's) can be checked as well as the
+        defaults. Returns the largest absolute difference per output and
+        raises ValueError if any output differs beyond rtol or has NaNs in
+        different places.
+        """
+        indicators = cls(**params)
+        streamed = indicators.update_batch(data)
+
+        technical = TechnicalAnalyzer()
+        rsi = technical.calculate_rsi(data, period=indicators.gains.size)
+        bands = technical.calculate_bollinger_bands(data, period=indicators.closes.size)
+        macd = technical.calculate_macd(data, fast=indicators.ema_fast.span,
+                                        slow=indicators.ema_slow.span,
+                                        signal=indicators.ema_signal.span)
+        batch = {
+            'rsi': rsi,
+            'bb_upper': bands['upper'],
+            'bb_middle': bands['middle'],
+            'bb_lower': bands['lower'],
+            'macd': macd['macd'],
+            'macd_signal': macd['signal'],
+            'macd_histogram': macd['histogram'],
+            'volume_ma': rolling_mean(data['Volume'], indicators.volumes.size),
+            'vpt': VolumeAnalyzer().calculate_vpt(data)
+        }
+
+        errors = {}
+        mismatched: List[str] = []
+        for name in cls.OUTPUTS:
+            expected = batch[name].to_numpy(dtype=float)
+            actual = streamed[name].to_numpy(dtype=float)
+            nan_mismatch = np.isnan(expected) != np.isnan(actual)
+            valid = ~np.isnan(expected) & ~np.isnan(actual)
+            diff = np.abs(expected[valid] - actual[valid])
+            errors[name] = float(diff.max()) if diff.size else 0.0
+
+            scale = np.maximum(np.abs(expected[valid]), 1.0)
+            if nan_mismatch.any() or (diff > rtol * scale).any():
+                mismatched.append(name)
+
+        if mismatched:
+            raise ValueError(f"Incremental output differs from batch analyze for: {', '.join(mismatched)}")
+        return errors
@@ -0,0 +1,308 @@
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import write_parquet
+from data_providers import DataProvider
+from panel_analysis import build_panel
+
+SNAPSHOT_COLUMNS = ['price', 'avg_volume', 'market_cap', 'volatility', 'as_of', 'checked']
+# Row state before its as_of bar, so a revised version of that bar can replace it
+PREVIOUS_COLUMNS = ['prev_price', 'prev_avg_volume', 'prev_volatility']
+
+
+def load_universe(path: str) -> pd.DataFrame:
+    """Symbols to screen from a file, indexed by symbol.
+
+    Text files hold one symbol per line ('#' starts a comment). CSV and
+    Parquet files need a 'symbol' column (any case) or have the symbols in
+    their first column; other columns, such as market_cap, are kept.
+    """
+    path = Path(path)
+    if path.suffix == '.parquet':
+        table = pd.read_parquet(path)
+    elif path.suffix == '.csv':
+        table = pd.read_csv(path)
+    else:
+        with open(path) as f:
+            lines = [line.split('#', 1)[0].strip() for line in f]
+        table = pd.DataFrame({'symbol': [line for line in lines if line]})
+
+    columns = {column.lower(): column for column in table.columns}
+    symbol_column = columns.get('symbol', table.columns[0])
+    table = table.rename(columns={symbol_column: 'symbol'})
+    table['symbol'] = table['symbol'].astype(str).str.strip().str.upper()
+    table = table[table['symbol'] != '']
+    return table.drop_duplicates('symbol').set_index('symbol')
+
+
+class SnapshotStore:
+    """One row of cheap screening statistics per symbol.
+
+    Holds the last price, an exponentially weighted average volume, the
+    exponentially weighted volatility of daily returns (a daily fraction,
+    0.03 = 3%), market cap when known, the time of the last bar seen
+    ('as_of') and of the last refresh ('checked').
+
+    The averages are EWMs with span `lookback`, so a new bar updates a row
+    in O(1) and the whole table in one vectorized step: rows are built once
+    from recent history and then only advanced by the bars published since.
+    Both paths give the same numbers. A bar with the same timestamp as a
+    row's last one (the final version of a daily bar first seen while its
+    session was open) replaces that bar instead of being counted twice or
+    dropped. With a path the table is kept as a Parquet file and survives
+    restarts.
+    """
+
+    def __init__(self, path: Optional[str] = None, lookback: int = 20,
+                 history_period: str = '3mo', max_age: float = 3600, batch_size: int = 500):
+        self.path = Path(path) if path else None
+        self.lookback = lookback
+        self.alpha = 2 / (lookback + 1)
+        # History used to build rows for symbols seen for the first time
+        self.history_period = history_period
+        # Seconds before a row is checked for new bars again
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.table = self._load()
+
+    def __len__(self):
+        return len(self.table)
+
+    def _load(self) -> pd.DataFrame:
+        empty = pd.DataFrame({column: pd.Series(dtype=float)
+                              for column in SNAPSHOT_COLUMNS + PREVIOUS_COLUMNS})
+        empty['as_of'] = pd.Series(dtype='datetime64[ns, UTC]')
+        empty.index.name = 'symbol'
+        if self.path is None or not self.path.exists():
+            return empty
+        try:
+            return pd.read_parquet(self.path).reindex(columns=empty.columns)
+        except Exception as e:
+            print(f"Discarding unreadable snapshot file {self.path}: {str(e)}")
+            return empty
+
+    def save(self):
+        """Writes the table to its file, if it has one"""
+        if self.path is None:
+            return
+        with self._lock:
+            write_parquet(self.table, self.path)
+
+    def update_from_history(self, symbol: str, hist: pd.DataFrame):
+        """Rebuilds a symbol's row from daily bars, oldest first"""
+        self.update_from_histories({symbol: hist})
+
+    def update_from_histories(self, histories: Dict[str, pd.DataFrame]):
+        """Rebuilds the rows of many symbols at once, keeping their market caps"""
+        rows = {}
+        for symbol, hist in histories.items():
+            if hist is None or hist.empty:
+                continue
+            close = hist['Close'].to_numpy(dtype=float)
+            volume = hist['Volume'].to_numpy(dtype=float)
+            present = np.flatnonzero(~np.isnan(close))
+            if not len(present):
+                continue
+            close = close[present]
+            volume = volume[present]
+            returns = close[1:] / close[:-1] - 1
+            rows[symbol] = (
+                close[-1], average_volume(volume, self.lookback),
+                ewm_volatility(close, self.lookback), hist.index[present[-1]],
+                close[-2] if len(close) > 1 else np.nan,
+                average_volume(volume[:-1], self.lookback),
+                np.sqrt(_ewm_last(returns[:-1] ** 2, self.alpha))
+            )
+        if not rows:
+            return
+
+        symbols = pd.Index(list(rows), name='symbol')
+        price, avg_volume, volatility, as_of, prev_price, prev_avg_volume, prev_volatility = \
+            zip(*rows.values())
+        with self._lock:
+            update = pd.DataFrame({
+                'price': price,
+                'avg_volume': avg_volume,
+                'market_cap': self.table['market_cap'].reindex(symbols).to_numpy(),
+                'volatility': volatility,
+                'as_of': [_utc(timestamp) for timestamp in as_of],
+                'checked': time.time(),
+                'prev_price': prev_price,
+                'prev_avg_volume': prev_avg_volume,
+                'prev_volatility': prev_volatility
+            }, index=symbols)
+            kept = self.table[~self.table.index.isin(symbols)]
+            self.table = pd.concat([kept, update]) if len(kept) else update
+
+    def apply_bars(self, close: pd.Series, volume: pd.Series, timestamp):
+        """Advances every row by one bar; symbols missing from close are left as they are"""
+        timestamp = _utc(timestamp)
+        with self._lock:
+            table = self.table
+            close = close.dropna()
+            close = close[close.index.isin(table.index)]
+            rows = table.index.get_indexer(close.index)
+            # Bars before a row's last one are skipped; a bar at its last
+            # timestamp is a revision and is applied to the state before it
+            as_of = table['as_of'].iloc[rows]
+            newer = (as_of < timestamp).to_numpy()
+            revised = (as_of == timestamp).to_numpy()
+            applied = newer | revised
+            rows, close, newer = rows[applied], close[applied], newer[applied]
+            if not len(rows):
+                return
+
+            current = table[['price', 'avg_volume', 'volatility']].to_numpy(dtype=float)[rows]
+            previous = table[PREVIOUS_COLUMNS].to_numpy(dtype=float)[rows]
+            base = np.where(newer[:, None], current, previous)
+            price, avg_volume, volatility = base.T
+
+            a = self.alpha
+            returns = close.to_numpy() / price - 1
+            # A row built from a single bar has no returns yet, like ewm's first
+            # NaN; one with no bar at all (a revised first bar) starts afresh
+            variance = np.where(np.isnan(volatility), returns ** 2,
+                                (1 - a) * volatility ** 2 + a * returns ** 2)
+            bar_volume = volume.reindex(close.index).to_numpy(dtype=float)
+            avg_volume = np.where(np.isnan(bar_volume), avg_volume,
+                                  np.where(np.isnan(avg_volume), bar_volume,
+                                           (1 - a) * avg_volume + a * bar_volume))
+
+            symbols = table.index[rows]
+            advanced = symbols[newer]
+            table.loc[advanced, PREVIOUS_COLUMNS] = current[newer]
+            table.loc[symbols, 'price'] = close.to_numpy()
+            table.loc[symbols, 'avg_volume'] = avg_volume
+            table.loc[symbols, 'volatility'] = np.sqrt(variance)
+            table.loc[symbols, 'as_of'] = timestamp
+
+    def set_market_caps(self, market_caps: pd.Series):
+        """Fills the market_cap column from a Series indexed by symbol"""
+        market_caps = market_caps.dropna().astype(float)
+        with self._lock:
+            # Symbols without a row get one holding only the market cap
+            table = self.table.reindex(self.table.index.union(market_caps.index))
+            table.loc[market_caps.index, 'market_cap'] = market_caps
+            self.table = table
+
+    def stale(self, symbols: Iterable[str], now: Optional[float] = None) -> List[str]:
+        """Symbols with no row, no bars yet, or not checked within max_age"""
+        now = time.time() if now is None else now
+        table = self.table.reindex(pd.Index(list(symbols)))
+        stale = table['checked'].isna() | table['as_of'].isna() | (now - table['checked'] > self.max_age)
+        return list(table.index[stale.to_numpy()])
+
+    def refresh(self, provider: DataProvider, symbols: Iterable[str]) -> int:
+        """Brings the rows of symbols up to date in bulk requests; returns how many were fetched.
+
+        Symbols without a row get history_period of bars. The rest only get
+        the bars from the day of their as_of on, grouped by that day so one
+        request covers every symbol last updated together (normally the whole
+        universe); bars a row has already seen are skipped, except its last
+        one, which is replaced by the version fetched now.
+        """
+        stale = self.stale(symbols)
+        if not stale:
+            return 0
+
+        as_of = self.table['as_of'].reindex(stale)
+        new = [symbol for symbol in stale if pd.isna(as_of[symbol])]
+        for batch in _batches(new, self.batch_size):
+            self.update_from_histories(provider.get_bulk_history(batch, period=self.history_period))
+
+        known = as_of.dropna()
+        for last, group in known.groupby(known.dt.normalize()):
+            for batch in _batches(list(group.index), self.batch_size):
+                histories = provider.get_bulk_history(batch, start=last.tz_convert(None))
+                self._apply_histories(histories)
+
+        with self._lock:
+            rows = self.table.index.intersection(stale)
+            self.table.loc[rows, 'checked'] = time.time()
+        self.save()
+        return len(stale)
+
+    def _apply_histories(self, histories: Dict[str, pd.DataFrame]):
+        panel = build_panel(histories, fields=['Close', 'Volume'])
+        for timestamp, close in panel['Close'].iterrows():
+            self.apply_bars(close, panel['Volume'].loc[timestamp], timestamp)
+
+    def prefilter(self, symbols: Iterable[str], min_price: float = 0.0,
+                  max_price: float = np.inf, min_volume: float = 0.0,
+                  min_market_cap: float = 0.0, min_volatility: float = 0.0) -> List[str]:
+        """Symbols whose snapshot passes the filters, in the given order.
+
+        A check is skipped for a value the table does not have (no row yet,
+        or an unknown market cap), so nothing is dropped for lack of data.
+        """
+        symbols = list(symbols)
+        table = self.table.reindex(pd.Index(symbols))
+        price = table['price'].to_numpy(dtype=float)
+        avg_volume = table['avg_volume'].to_numpy(dtype=float)
+        market_cap = table['market_cap'].to_numpy(dtype=float)
+        volatility = table['volatility'].to_numpy(dtype=float)
+
+        with np.errstate(invalid='ignore'):
+            keep = ~((price < min_price) | (price > max_price) | (avg_volume < min_volume) |
+                     (market_cap < min_market_cap) | (volatility < min_volatility))
+        return [symbol for symbol, passed in zip(symbols, keep) if passed]
+
+
+def ewm_volatility(close: np.ndarray, lookback: int = 20):
+    """Daily return volatility as SnapshotStore measures it: the EWM (span lookback) RMS of returns.
+
+    Takes one symbol's closes, or a (time x symbol) array and returns one
+    value per column. Missing bars are skipped, so a return spans the gap.
+    """
+    close = np.asarray(close, dtype=float)
+    filled = _ffill(close)
+    with np.errstate(invalid='ignore'):
+        returns = np.where(np.isnan(close[1:]), np.nan, filled[1:] / filled[:-1] - 1)
+    return np.sqrt(_ewm_last(returns ** 2, 2 / (lookback + 1)))
+
+
+def average_volume(volume: np.ndarray, lookback: int = 20):
+    """Average volume as SnapshotStore measures it: the EWM (span lookback) of volume.
+
+    Takes one symbol's volumes, or a (time x symbol) array and returns one
+    value per column. Missing bars are skipped.
+    """
+    return _ewm_last(np.asarray(volume, dtype=float), 2 / (lookback + 1))
+
+
+def _ewm_last(values: np.ndarray, alpha: float):
+    """Last value of pandas' ewm(alpha=alpha, adjust=False, ignore_na=True).mean() down axis 0"""
+    valid = ~np.isnan(values)
+    # Each value's weight decays with the number of valid values after it
+    after = np.cumsum(valid[::-1], axis=0)[::-1] - valid
+    first = valid & (np.cumsum(valid, axis=0) == 1)
+    weights = np.where(first, 1.0, alpha) * (1 - alpha) ** after
+    last = np.where(valid, weights * np.nan_to_num(values), 0.0).sum(axis=0)
+    last = np.where(valid.any(axis=0), last, np.nan)
+    return float(last) if last.ndim == 0 else last
+
+
+def _ffill(values: np.ndarray) -> np.ndarray:
+    """values with each NaN replaced by the last valid value before it down axis 0"""
+    if not len(values):
+        return values
+    shape = (-1,) + (1,) * (values.ndim - 1)
+    rows = np.where(np.isnan(values), 0, np.arange(len(values)).reshape(shape))
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return np.take_along_axis(values, rows, axis=0)
+
+
+def _utc(timestamp) -> pd.Timestamp:
+    timestamp = pd.Timestamp(timestamp)
+    return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+
+def _batches(items: List[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]